@@ -1,6 +1,6 @@
 from django.contrib.auth import login, authenticate, logout
 from django.shortcuts import render, redirect
-from logic.services import add_user_to_cart, add_user_to_wishlist
+from logic.services import add_user_to_cart
 from django.views import View
 from .forms import CustomUserCreationForm
 from django.contrib.auth.models import User
@@ -17,7 +17,6 @@ def login_view(request):
             user = form.get_user()
             login(request, user)
             add_user_to_cart(request, user.username)
-            add_user_to_wishlist(request, user.username)
             return redirect("/")
         return render(request, "login/login.html", context={"error": "Неверные данные"})
 
@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import weather_view
+from .views import weather_view, weather_batch_view, weather_metrics_view
 
 urlpatterns = [
     path('', weather_view),
-]
\ No newline at end of file
+    path('batch/', weather_batch_view),
+    path('metrics/', weather_metrics_view),
+]
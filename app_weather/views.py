@@ -1,15 +1,81 @@
-from django.shortcuts import render
+from django.core.handlers.asgi import ASGIRequest
 from django.http import JsonResponse
-from weather_api import current_weather
+from weather_api import WEATHER_SERVICE, WeatherProviderError, acurrent_weather, acurrent_weather_many
 
+WEATHER_BATCH_MAX_POINTS = 50  # Максимум точек в одном запросе /weather/batch/
+WEATHER_BATCH_CONCURRENCY = 10  # Максимум одновременных запросов к API погоды
 
-def weather_view(request):
+
+async def weather_view(request):
+    """
+    Погода в точке (асинхронное представление: пока ждём ответ API погоды,
+    воркер обслуживает другие запросы). Если API недоступен и в кэше нет данных - 503.
+    """
+    long_lived_loop = _long_lived_loop(request)
     if request.method == "GET":
         lat = request.GET.get('lat')  # данные придут в виде строки
         lon = request.GET.get('lon')  # данные придут в виде строки
         if lat and lon:
-            data = current_weather(lat=lat, lon=lon)
+            try:
+                data = await acurrent_weather(lat=lat, lon=lon, long_lived_loop=long_lived_loop)
+            except ValueError:
+                return JsonResponse({'error': 'Координаты должны быть числами'}, status=400,
+                                    json_dumps_params={'ensure_ascii': False})
+            except WeatherProviderError:
+                return _unavailable_response()
         else:
-            data = current_weather(59.93, 30.31)
+            try:
+                data = await acurrent_weather(59.93, 30.31, long_lived_loop=long_lived_loop)
+            except WeatherProviderError:
+                return _unavailable_response()
         return JsonResponse(data, json_dumps_params={'ensure_ascii': False,
                                                      'indent': 4})
+
+
+async def weather_batch_view(request):
+    """
+    Погода сразу в нескольких точках: /weather/batch/?points=59.93,30.31;55.75,37.62
+    Запросы к API выполняются одновременно (не больше WEATHER_BATCH_CONCURRENCY за раз).
+    В ответе результаты в порядке точек, для точек с ошибкой - {"error": ...}.
+    """
+    if request.method == "GET":
+        try:
+            points = [tuple(float(value) for value in point.split(','))
+                      for point in request.GET.get('points', '').split(';') if point]
+        except ValueError:
+            points = None
+        if not points or any(len(point) != 2 for point in points):
+            return JsonResponse({'error': 'Передайте точки в виде points=lat,lon;lat,lon'}, status=400,
+                                json_dumps_params={'ensure_ascii': False})
+        if len(points) > WEATHER_BATCH_MAX_POINTS:
+            return JsonResponse({'error': f'Не больше {WEATHER_BATCH_MAX_POINTS} точек за запрос'}, status=400,
+                                json_dumps_params={'ensure_ascii': False})
+
+        results = await acurrent_weather_many(points, concurrency=WEATHER_BATCH_CONCURRENCY,
+                                              long_lived_loop=_long_lived_loop(request))
+        data = [
+            {'lat': lat, 'lon': lon, 'error': 'Сервис погоды недоступен'} if isinstance(result, Exception)
+            else {'lat': lat, 'lon': lon, **result}
+            for (lat, lon), result in zip(points, results)
+        ]
+        return JsonResponse(data, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+def weather_metrics_view(request):
+    """Метрики сервиса погоды: состояние автомата (CircuitBreaker) и счётчики кэша"""
+    if request.method == "GET":
+        return JsonResponse(WEATHER_SERVICE.stats(), json_dumps_params={'ensure_ascii': False,
+                                                                         'indent': 4})
+
+
+def _long_lived_loop(request) -> bool:
+    """
+    Живёт ли цикл событий весь процесс: да под ASGI сервером (project/asgi.py), нет под WSGI
+    сервером и runserver, где async_to_sync создаёт новый цикл на каждый запрос.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def _unavailable_response() -> JsonResponse:
+    return JsonResponse({'error': 'Сервис погоды недоступен'}, status=503,
+                        json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,95 @@
+"""
+Проверка атомарного добавления в корзину (cart/services.py add_product_to_cart) под конкурентной нагрузкой.
+
+Несколько процессов одновременно добавляют один и тот же продукт в одну и ту же корзину
+(начиная с пустой корзины, поэтому проверяется и одновременное создание позиции).
+В конце проверяется, что позиция одна, её количество равно общему числу добавлений,
+а ошибок БД не было (ошибка - тоже потерянное добавление).
+
+С флагом --legacy используется прежний алгоритм представлений (get, filter, first, quantity += 1, save),
+чтобы увидеть потерянные увеличения.
+
+Запуск из корня проекта:
+python benchmarks/cart_upsert_concurrency.py --processes 8 --operations 200
+"""
+
+import argparse
+import sys
+from multiprocessing import Pool
+from time import time
+
+from utils import setup_django
+
+
+def legacy_add(user, product):
+    """Прежняя реализация cart_add_view: чтение, изменение в Python и запись"""
+    from cart.models import Cart, CartItem
+
+    cart = Cart.objects.get(customer=user)
+    products_cart = cart.items.filter(product=product)
+    if products_cart:
+        cart_item = products_cart.first()
+        cart_item.quantity += 1
+        cart_item.save()
+    else:
+        CartItem.objects.create(cart=cart, product=product)
+
+
+def worker(args):
+    user_id, product_id, operations, legacy = args
+    from django.contrib.auth.models import User
+    from django.db import connections, OperationalError, IntegrityError
+    from store.models import Product
+    from cart.services import add_product_to_cart
+
+    connections.close_all()  # У каждого процесса своё соединение с БД
+    user = User.objects.get(id=user_id)
+    product = Product.objects.get(id=product_id)
+    errors = 0
+    for _ in range(operations):
+        try:
+            if legacy:
+                legacy_add(user, product)
+            else:
+                add_product_to_cart(user, product_id)
+        except (OperationalError, IntegrityError):
+            errors += 1
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=200)
+    parser.add_argument('--legacy', action='store_true', help='прежний алгоритм чтение-изменение-запись')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from cart.models import CartItem
+    from utils import create_catalog
+
+    user = User.objects.create_user(username='bench', password='bench')  # Корзина создаётся сигналом
+    product = create_catalog(1)[0]
+    connections.close_all()  # Соединение не должно наследоваться дочерними процессами
+
+    tasks = [(user.id, product.id, args.operations, args.legacy)] * args.processes
+    t1 = time()
+    with Pool(args.processes) as pool:
+        errors = sum(pool.map(worker, tasks))
+    elapsed = time() - t1
+
+    total = args.processes * args.operations
+    items = list(CartItem.objects.filter(cart__customer=user))
+    quantity = sum(item.quantity for item in items)
+    print(f"{total} добавлений за {elapsed:.2f} c ({total / elapsed:.0f} оп/с), ошибок БД: {errors}")
+    print(f"Позиций в корзине: {len(items)}, количество: {quantity}, ожидалось: {total}")
+    ok = errors == 0 and len(items) == 1 and quantity == total
+    print("Потерянных увеличений нет" if ok else "ОБНАРУЖЕНЫ ПОТЕРЯННЫЕ УВЕЛИЧЕНИЯ")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Сравнение filtering_category (перебор и сортировка при каждом вызове) с индексом
+каталога CatalogIndex на синтетических каталогах.
+
+Запуск из корня проекта:
+python benchmarks/catalog_index.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+from time import perf_counter
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from logic.catalog import CatalogIndex  # noqa: E402
+
+CATEGORIES = ['Овощи', 'Фрукты', 'Соки', 'Семена']
+ORDERING_KEYS = ['price_after', 'rating', 'sold_value']
+
+
+def filtering_category(database, category_key=None, ordering_key=None, reverse=False):
+    """Исходный алгоритм из logic/services.py (без индекса)"""
+    if category_key is not None:
+        result = [value for value in database.values() if value['category'] == category_key]
+    else:
+        result = [*database.values()]
+    if ordering_key is not None:
+        result.sort(key=lambda x: x[ordering_key], reverse=reverse)
+    return result
+
+
+def make_catalog(size, seed=42):
+    rnd = random.Random(seed)
+    database = {}
+    for i in range(1, size + 1):
+        price = round(rnd.uniform(10, 1000), 2)
+        database[str(i)] = {
+            'id': i,
+            'category': rnd.choice(CATEGORIES),
+            'price_before': price,
+            'price_after': price,
+            'rating': round(rnd.uniform(1, 5), 1),
+            'sold_value': rnd.randint(0, 10000),
+        }
+    return database
+
+
+def measure(func, repeat):
+    t1 = perf_counter()
+    for _ in range(repeat):
+        func()
+    return (perf_counter() - t1) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    queries = [(category, key, reverse)
+               for category in ('Фрукты', None)
+               for key in ORDERING_KEYS
+               for reverse in (False, True)]
+
+    for size in args.sizes:
+        database = make_catalog(size)
+        t1 = perf_counter()
+        index = CatalogIndex(database)
+        build = perf_counter() - t1
+        t1 = perf_counter()
+        for query in queries:  # Первый запрос по ключу строит отсортированный список
+            index.query(*query)
+        warmup = perf_counter() - t1
+        print(f"\n{size} товаров: построение индекса {build:.3f} c, "
+              f"построение сортировок {warmup:.3f} c")
+
+        for query in queries:
+            assert index.query(*query) == filtering_category(database, *query)
+            linear = measure(lambda: filtering_category(database, *query), args.repeat)
+            indexed = measure(lambda: index.query(*query), args.repeat)
+            category, key, reverse = query
+            print(f"  {category or 'Все':7} {key:12} reverse={reverse!s:5} "
+                  f"перебор {linear * 1000:9.2f} мс  индекс {indexed * 1000:8.2f} мс  "
+                  f"x{linear / indexed:.1f}")
+
+        # Инкрементальное обновление индекса
+        ids = random.Random(0).sample(list(database), min(1000, size))
+        t1 = perf_counter()
+        for product_id in ids:
+            product = dict(database[product_id], price_after=1.0, category='Соки')
+            index.update(product_id, product)
+        print(f"  обновление 1 товара в индексе: {(perf_counter() - t1) / len(ids) * 1e6:.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Пропускная способность оформления заказов (order/services.py checkout) при параллельной нагрузке.
+
+Создаётся каталог с ограниченным остатком на складе и --users пользователей с заполненными корзинами
+(спрос на товары больше остатка, поэтому часть заказов получает OutOfStockError и откатывается).
+Несколько процессов одновременно оформляют заказы. В конце проверяется, что:
+- остаток ни одного товара не ушёл в минус и списано ровно столько, сколько заказано;
+- корзины оформленных заказов пусты, а корзины отклонённых не изменились.
+
+Запуск из корня проекта (SQLite, временная БД):
+python benchmarks/checkout_throughput.py --processes 8 --users 400
+PostgreSQL (отдельная пустая БД, параметры подключения в PGDATABASE, PGUSER, PGPASSWORD, PGHOST, PGPORT):
+python benchmarks/checkout_throughput.py --postgres --processes 8 --users 400
+"""
+
+import argparse
+import random
+import sys
+from multiprocessing import Pool
+from statistics import quantiles
+from time import perf_counter
+
+from utils import setup_django, create_catalog
+
+
+def worker(user_ids):
+    from django.contrib.auth.models import User
+    from django.db import connections, OperationalError
+    from order.services import checkout, OutOfStockError
+
+    connections.close_all()  # У каждого процесса своё соединение с БД
+    result = {'ok': [], 'out_of_stock': [], 'errors': 0, 'latency': []}
+    for user in User.objects.filter(id__in=user_ids):
+        t1 = perf_counter()
+        try:
+            checkout(user)
+            result['ok'].append(user.id)
+        except OutOfStockError:
+            result['out_of_stock'].append(user.id)
+        except OperationalError:
+            result['errors'] += 1
+        result['latency'].append(perf_counter() - t1)
+    return result
+
+
+def fill(users, products, items_per_cart, seed=42):
+    """Пользователи со случайными позициями в корзинах"""
+    from django.contrib.auth.models import User
+    from cart.models import Cart, CartItem
+
+    rnd = random.Random(seed)
+    created = User.objects.bulk_create([User(username=f'bench_{i}') for i in range(users)])
+    # bulk_create не отправляет post_save, поэтому корзины создаём явно
+    Cart.objects.bulk_create([Cart(customer=user) for user in created])
+    carts = dict(Cart.objects.values_list('customer_id', 'id'))
+    CartItem.objects.bulk_create([
+        CartItem(cart_id=carts[user.id], product=product, quantity=rnd.randint(1, 5))
+        for user in created
+        for product in rnd.sample(products, items_per_cart)
+    ])
+    return [user.id for user in created]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--users', type=int, default=400)
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--items', type=int, default=3, help='позиций в корзине')
+    parser.add_argument('--stock-ratio', type=float, default=0.7, help='остаток на складе / спрос')
+    parser.add_argument('--postgres', action='store_true', help='PostgreSQL вместо временной SQLite')
+    args = parser.parse_args()
+
+    setup_django(postgres=args.postgres)
+    from django.db import connections
+    from django.db.models import Sum
+    from cart.models import CartItem
+    from order.models import Order, OrderItem
+    from store.models import ProductDetail
+    from store.services import refresh_product_cards
+
+    products = create_catalog(args.products)
+    user_ids = fill(args.users, products, args.items)
+    demand = dict(CartItem.objects.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+    stock = {product.id: int(demand.get(product.id, 0) * args.stock_ratio) for product in products}
+    ProductDetail.objects.bulk_create([ProductDetail(product=product, quantity_in_stock=stock[product.id])
+                                       for product in products])
+    refresh_product_cards()
+    carts_before = {user_id: sorted(CartItem.objects.filter(cart__customer_id=user_id)
+                                    .values_list('product_id', 'quantity')) for user_id in user_ids}
+    connections.close_all()  # Соединение не должно наследоваться дочерними процессами
+
+    # Дочерние процессы наследуют настройки (в том числе --postgres) от родительского
+    tasks = [user_ids[i::args.processes] for i in range(args.processes)]
+    t1 = perf_counter()
+    with Pool(args.processes) as pool:
+        results = pool.map(worker, tasks)
+    elapsed = perf_counter() - t1
+
+    ok = [user_id for result in results for user_id in result['ok']]
+    rejected = [user_id for result in results for user_id in result['out_of_stock']]
+    errors = sum(result['errors'] for result in results)
+    latency = sorted(value for result in results for value in result['latency'])
+    percentiles = quantiles(latency, n=100)
+    engine = connections['default'].vendor
+    print(f"{engine}: {len(latency)} оформлений за {elapsed:.2f} c ({len(latency) / elapsed:.0f} заказов/с), "
+          f"p50 {percentiles[49] * 1000:.1f} мс, p95 {percentiles[94] * 1000:.1f} мс")
+    print(f"Оформлено: {len(ok)}, не хватило товара: {len(rejected)}, ошибок БД: {errors}")
+
+    checks = []
+    ordered = dict(OrderItem.objects.values('product_id').annotate(total=Sum('quantity'))
+                   .values_list('product_id', 'total'))
+    remaining = dict(ProductDetail.objects.values_list('product_id', 'quantity_in_stock'))
+    checks.append(all(stock[product_id] - remaining[product_id] == ordered.get(product_id, 0)
+                      for product_id in stock))
+    checks.append(Order.objects.count() == len(ok))
+    checks.append(not CartItem.objects.filter(cart__customer_id__in=ok).exists())
+    checks.append(all(sorted(CartItem.objects.filter(cart__customer_id=user_id)
+                             .values_list('product_id', 'quantity')) == carts_before[user_id]
+                      for user_id in rejected))
+    good = all(checks)
+    print("Склад, заказы и корзины согласованы" if good else f"ОБНАРУЖЕНО РАСХОЖДЕНИЕ: {checks}")
+    sys.exit(0 if good else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Скорость расчёта стоимости корзины с промокодами (promotion/pricing.py).
+
+Для корзин из --lines позиций и --promotions применённых промокодов (скидки в процентах
+и в рублях, бесплатная доставка, "купи N получи K") измеряется:
+- price_cart - полный расчёт с загрузкой корзины и промоакций из БД (два запроса);
+- price_lines - только расчёт по уже загруженным данным.
+
+Запуск из корня проекта:
+python benchmarks/pricing_engine.py --lines 1 10 100 1000 --promotions 0 12 36
+"""
+
+import argparse
+import sys
+from datetime import timedelta
+from time import perf_counter
+
+from utils import setup_django, create_catalog
+
+
+def create_promotions(count):
+    from django.utils import timezone
+    from promotion.models import Promotion, Discount, FreeShipping, BuyGet
+
+    now = timezone.now()
+    promotions = Promotion.objects.bulk_create(
+        [Promotion(name=f"Акция {i}", code=f"STACK{i:03d}", description='',
+                   start_date=now - timedelta(days=1), end_date=now + timedelta(days=1))
+         for i in range(count)])
+    Discount.objects.bulk_create([Discount(promotion=promotion, value=1 + i % 5, is_percentage=i % 2 == 0)
+                                  for i, promotion in enumerate(promotions) if i % 3 != 2])
+    FreeShipping.objects.bulk_create([FreeShipping(promotion=promotion) for promotion in promotions[::7]])
+    BuyGet.objects.bulk_create([BuyGet(promotion=promotion, buy_quantity=2 + i % 3, get_quantity=1)
+                                for i, promotion in enumerate(promotions) if i % 3 == 2])
+    return [promotion.code for promotion in promotions]
+
+
+def measure(function, repeat):
+    t1 = perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (perf_counter() - t1) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--promotions', type=int, nargs='+', default=[0, 12, 36])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from cart.models import Cart, CartItem
+    from promotion.pricing import price_cart, price_lines, load_promotions
+
+    products = create_catalog(max(args.lines))
+    codes = create_promotions(max(args.promotions))
+    carts = {}
+    for size in args.lines:
+        user = User.objects.create_user(f"pricing{size}")
+        cart = Cart.objects.get(customer=user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1 + i % 7)
+                                      for i, product in enumerate(products[:size])])
+        carts[size] = cart
+
+    print(f"{'позиций':>8} {'промокодов':>10} {'price_cart, мс':>15} {'price_lines, мс':>16} {'итог':>12}")
+    for size in args.lines:
+        lines = list(CartItem.objects.filter(cart=carts[size]).order_by('id')
+                     .values_list('product_id', 'quantity', 'product__card__price_after'))
+        for count in args.promotions:
+            applied = codes[:count]
+            promotions = load_promotions(applied)
+            cart_time, result = measure(lambda: price_cart(carts[size], applied, shipping=300), args.repeat)
+            lines_time, same = measure(lambda: price_lines(lines, promotions, shipping=300), args.repeat)
+            assert result == same, "Результат зависит от способа загрузки данных"
+            assert sum(line['total'] for line in result['lines']) + result['shipping'] == result['total']
+            print(f"{size:>8} {count:>10} {cart_time * 1000:>15.2f} {lines_time * 1000:>16.2f} {result['total']:>12}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Скорость проверки промокодов: индекс промоакций в памяти (promotion/services.py) против
+запроса к БД на каждую проверку (как сделал бы наивный coupon_check_view на моделях).
+
+Создаётся --codes активных промоакций (у каждой - скидка, у части - бесплатная доставка
+и "купи N получи K"), затем проверяются --lookups случайных кодов (10% - несуществующие).
+Отдельно измеряется построение индекса (один запрос) и перестроение после изменения промоакции.
+
+Запуск из корня проекта:
+python benchmarks/promotion_lookup.py --codes 100000 --lookups 1000000
+"""
+
+import argparse
+import random
+import sys
+from datetime import timedelta
+from time import perf_counter
+
+from utils import setup_django
+
+
+def create_promotions(count):
+    from django.utils import timezone
+    from promotion.models import Promotion, Discount, FreeShipping, BuyGet
+
+    now = timezone.now()
+    promotions = Promotion.objects.bulk_create(
+        [Promotion(name=f"Акция {i}", code=f"CODE{i:07d}", description='',
+                   start_date=now - timedelta(days=1), end_date=now + timedelta(days=30))
+         for i in range(count)], batch_size=5000)
+    Discount.objects.bulk_create([Discount(promotion=promotion, value=5 + i % 20, is_percentage=i % 3 > 0)
+                                  for i, promotion in enumerate(promotions)], batch_size=5000)
+    FreeShipping.objects.bulk_create([FreeShipping(promotion=promotion) for promotion in promotions[::4]],
+                                     batch_size=5000)
+    BuyGet.objects.bulk_create([BuyGet(promotion=promotion, buy_quantity=3, get_quantity=1)
+                                for promotion in promotions[::10]], batch_size=5000)
+
+
+def db_lookup(code):
+    """Проверка промокода запросом к БД"""
+    from django.utils import timezone
+    from promotion.models import Promotion
+
+    promotion = (Promotion.objects.select_related('discount', 'freeshipping', 'buyget')
+                 .filter(code=code, is_active=True).first())
+    return promotion is not None and promotion.start_date <= timezone.now() <= promotion.end_date
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--codes', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=1000000)
+    parser.add_argument('--db-lookups', type=int, default=20000, help='проверок запросом к БД')
+    args = parser.parse_args()
+
+    setup_django()
+    from promotion.models import Promotion
+    from promotion.services import PROMOTION_INDEX, find_promotion
+
+    t1 = perf_counter()
+    create_promotions(args.codes)
+    print(f"Создано {args.codes} промоакций за {perf_counter() - t1:.1f} c")
+
+    rnd = random.Random(42)
+    codes = [f"CODE{rnd.randrange(args.codes):07d}" if rnd.random() < 0.9 else f"NOPE{i}"
+             for i in range(args.lookups)]
+
+    t1 = perf_counter()
+    assert len(PROMOTION_INDEX) == args.codes
+    print(f"Построение индекса: {perf_counter() - t1:.2f} c")
+
+    t1 = perf_counter()
+    found = sum(find_promotion(code) is not None for code in codes)
+    elapsed = perf_counter() - t1
+    print(f"Индекс в памяти: {args.lookups} проверок за {elapsed:.2f} c "
+          f"({args.lookups / elapsed:,.0f} проверок/с), найдено {found}")
+
+    db_codes = codes[:args.db_lookups]
+    t1 = perf_counter()
+    db_found = sum(db_lookup(code) for code in db_codes)
+    elapsed = perf_counter() - t1
+    print(f"Запрос к БД:     {len(db_codes)} проверок за {elapsed:.2f} c "
+          f"({len(db_codes) / elapsed:,.0f} проверок/с), найдено {db_found}")
+
+    # Изменение промоакции (сигнал post_save) - новая версия, индекс перестраивается при следующем поиске
+    promotion = Promotion.objects.get(code='CODE0000000')
+    promotion.is_active = False
+    promotion.save()
+    t1 = perf_counter()
+    assert find_promotion('CODE0000000') is None
+    print(f"Перестроение после изменения промоакции: {perf_counter() - t1:.2f} c")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
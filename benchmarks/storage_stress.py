@@ -0,0 +1,91 @@
+"""
+Нагрузочная проверка хранилища корзины (logic/services.py).
+
+Несколько процессов одновременно вызывают add_to_cart для одного и того же пользователя.
+После завершения проверяется, что ни одно обновление не потеряно: количество товара
+в корзине равно общему числу вызовов add_to_cart.
+
+Запуск из корня проекта:
+python benchmarks/storage_stress.py --processes 8 --operations 500
+
+Данные пишутся во временную папку, рабочие файлы проекта не затрагиваются.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from multiprocessing import Pool
+from time import time
+from types import SimpleNamespace
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+
+def setup(work_dir):
+    """Настройка Django и сервисов внутри процесса"""
+    import django
+    django.setup()
+    os.chdir(work_dir)  # Хранилища используют пути относительно рабочей папки
+
+    from logic import services
+    # Запросы без сессии: пользователь берётся напрямую из объекта запроса
+    services.get_user = lambda request: request.user
+    return services
+
+
+def make_request(username):
+    return SimpleNamespace(user=SimpleNamespace(username=username))
+
+
+def worker(args):
+    work_dir, operations = args
+    services = setup(work_dir)
+
+    for _ in range(operations):
+        services.add_to_cart(make_request('stress'), '1')
+
+    # Процессы пула завершаются без atexit, поэтому сбрасываем кэш явно
+    services.CART_STORAGE.flush()
+    return services.CART_STORAGE.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=500,
+                        help='число вызовов add_to_cart в каждом процессе')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='storage_stress_')
+    tasks = [(work_dir, args.operations)] * args.processes
+
+    t1 = time()
+    with Pool(args.processes) as pool:
+        stats = pool.map(worker, tasks)
+    elapsed = time() - t1
+
+    services = setup(work_dir)
+    total_ops = args.processes * args.operations
+    print(f"Выполнено {total_ops} операций за {elapsed:.2f} c ({total_ops / elapsed:.0f} оп/с)")
+
+    hit_rate = sum(stat['hit_rate'] for stat in stats) / len(stats)
+    flush_mean = sum(stat['flush_time_mean'] for stat in stats) / len(stats)
+    conflicts = sum(stat['conflicts'] for stat in stats)
+    print(f"Кэш корзины: доля попаданий {hit_rate:.1%}, среднее время сброса {flush_mean * 1000:.2f} мс, "
+          f"конфликтов при сбросе {conflicts}")
+
+    expected = args.processes * args.operations
+    quantity = services.view_in_cart(make_request('stress'))['stress']['products'].get('1', 0)
+    print(f"Корзина: ожидалось {expected}, получено {quantity}")
+
+    ok = quantity == expected
+    print("Потерянных обновлений нет" if ok else "ОБНАРУЖЕНЫ ПОТЕРЯННЫЕ ОБНОВЛЕНИЯ")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
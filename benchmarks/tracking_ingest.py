@@ -0,0 +1,101 @@
+"""
+Скорость загрузки статусов доставки (delivery/tracking.py, команда ingest_tracking).
+
+Создаётся --deliveries доставок и файл из --events событий перевозчика (у каждого трек-номера -
+цепочка статусов, часть событий повторяется). Затем файл загружается в два приёма: загрузка
+прерывается на середине и продолжается с сохранённого смещения. В конце проверяется, что у всех
+доставок статус последнего события, а повторная загрузка ничего не меняет.
+
+Запуск из корня проекта:
+python benchmarks/tracking_ingest.py --deliveries 100000 --events 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from utils import setup_django
+
+CHAIN = ['accepted', 'shipped', 'in_transit', 'out_for_delivery', 'delivered']
+
+
+def create_deliveries(count):
+    from django.contrib.auth.models import User
+    from delivery.models import Delivery, ShippingAddress
+    from order.models import Order, OrderStatus
+
+    user = User.objects.create_user('tracking')
+    status, _ = OrderStatus.objects.get_or_create(name='Создан')
+    address = ShippingAddress.objects.create(customer=user, address_line='', city='', state='',
+                                             postal_code='', country='Россия')
+    orders = Order.objects.bulk_create([Order(customer=user, status=status) for _ in range(count)], batch_size=5000)
+    Delivery.objects.bulk_create([Delivery(order=order, shipping_address=address, delivery_status='В ожидании',
+                                           tracking_number=f"RA{order.pk:09d}") for order in orders],
+                                 batch_size=5000)
+    return [f"RA{order.pk:09d}" for order in orders]
+
+
+def write_events(path, tracking_numbers, count, seed=42):
+    """Файл событий. Возвращает ожидаемый итоговый статус по трек-номерам"""
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    progress = dict.fromkeys(tracking_numbers, -1)
+    expected = {}
+    with open(path, 'w', encoding='utf-8') as file:
+        for i in range(count):
+            tracking_number = rnd.choice(tracking_numbers)
+            step = min(progress[tracking_number] + rnd.choice((0, 1, 1)), len(CHAIN) - 1)  # 0 - повтор события
+            progress[tracking_number] = max(step, 0)
+            event = {'tracking_number': tracking_number, 'status': CHAIN[progress[tracking_number]],
+                     'timestamp': (start + timedelta(seconds=i)).isoformat()}
+            file.write(json.dumps(event) + '\n')
+            expected[tracking_number] = event['status']
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deliveries', type=int, default=100000)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    from delivery.models import Delivery
+    from delivery.tracking import ingest_tracking_file, TRACKING_STATUSES
+
+    tracking_numbers = create_deliveries(args.deliveries)
+    path = os.path.join(tempfile.mkdtemp(prefix='tracking_'), 'events.jsonl')
+    expected = write_events(path, tracking_numbers, args.events)
+
+    # Первая загрузка "падает" на середине файла: обрезаем файл, затем дописываем остаток
+    with open(path, 'rb') as file:
+        data = file.read()
+    half = data.index(b'\n', len(data) // 2) + 1
+    with open(path, 'wb') as file:
+        file.write(data[:half] + data[half:half + 20])  # Последняя строка не дописана
+    first = ingest_tracking_file(path, chunk_size=args.chunk_size)
+    with open(path, 'wb') as file:
+        file.write(data)
+    second = ingest_tracking_file(path, chunk_size=args.chunk_size)
+    again = ingest_tracking_file(path, chunk_size=args.chunk_size)
+
+    lines = first['lines'] + second['lines']
+    seconds = first['seconds'] + second['seconds']
+    print(f"{lines} событий ({args.deliveries} доставок) за {seconds:.2f} c ({lines / seconds:,.0f} строк/с), "
+          f"изменено доставок: {first['updated'] + second['updated']}")
+    print(f"Повторный запуск: прочитано строк {again['lines']}")
+
+    statuses = dict(Delivery.objects.values_list('tracking_number', 'delivery_status'))
+    wrong = sum(statuses[number] != TRACKING_STATUSES[status] for number, status in expected.items())
+    print("Статусы доставок совпадают с последними событиями" if not wrong and lines == args.events
+          else f"ОБНАРУЖЕНО РАСХОЖДЕНИЕ: {wrong} доставок, прочитано {lines} из {args.events} строк")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
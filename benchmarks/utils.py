@@ -0,0 +1,76 @@
+"""
+Общие функции для скриптов нагрузочного тестирования, работающих с БД.
+"""
+
+import os
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(temp_database: bool = True, postgres: bool = False) -> [None, str]:
+    """
+    Настройка Django для скрипта.
+
+    :param temp_database: Если используется SQLite, то работать с временной БД (с применёнными миграциями,
+    копируется из снимка, см. clear_database.py), а не с db.sqlite3 проекта. Для других СУБД (например, PostgreSQL через DJANGO_SETTINGS_MODULE
+    с другими настройками) используется БД из настроек.
+    :param postgres: Работать с PostgreSQL вместо БД из настроек. Параметры подключения берутся
+    из стандартных переменных окружения PGDATABASE, PGUSER, PGPASSWORD, PGHOST, PGPORT
+    (нужен драйвер psycopg). Используйте отдельную пустую БД: скрипты создают в ней данные.
+    :return: Путь до временной БД или None.
+    """
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import django
+    from django.conf import settings
+
+    if postgres:
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('PGDATABASE', 'bench'),
+            'USER': os.getenv('PGUSER', 'postgres'),
+            'PASSWORD': os.getenv('PGPASSWORD', ''),
+            'HOST': os.getenv('PGHOST', 'localhost'),
+            'PORT': os.getenv('PGPORT', '5432'),
+        }
+    database = settings.DATABASES['default']
+    path = None
+    if temp_database and database['ENGINE'].endswith('sqlite3'):
+        path = os.path.join(tempfile.mkdtemp(prefix='bench_db_'), 'db.sqlite3')
+        database['NAME'] = path
+        # Параллельные процессы ждут освобождения блокировки SQLite, а не падают сразу
+        database.setdefault('OPTIONS', {})['timeout'] = 60
+    if settings.CACHES['default']['BACKEND'].endswith('FileBasedCache'):
+        # Свой файловый кэш на каждый запуск, чтобы не получить данные из кэша прошлого запуска или проекта
+        settings.CACHES['default'] = {**settings.CACHES['default'],
+                                      'LOCATION': tempfile.mkdtemp(prefix='bench_cache_')}
+    django.setup()
+
+    if path is not None:
+        # Временная БД копируется из снимка БД после миграций (см. clear_database.py)
+        from clear_database import reset_database
+        reset_database()
+    else:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+    return path
+
+
+def create_catalog(products: int = 1, prefix: str = 'bench'):
+    """
+    Создание минимального каталога (категория, единица, валюта и products продуктов).
+
+    :return: Список созданных продуктов.
+    """
+    from store.models import Product, Category, Unit, Currency
+
+    category = Category.objects.create(name=f"{prefix} категория", slug_name=f"{prefix}-category")
+    unit = Unit.objects.create(name='кг')
+    currency = Currency.objects.create(name='руб')
+    return [Product.objects.create(name=f"{prefix} продукт {i}", slug_name=f"{prefix}-product-{i}",
+                                   description='', unit=unit, quantity_per_unit=1, price=100 + i,
+                                   currency=currency, category=category)
+            for i in range(products)]
@@ -0,0 +1,150 @@
+"""
+Нагрузочная проверка асинхронного представления погоды (app_weather/views.py).
+
+Поднимается локальная заглушка API погоды, которая отвечает с задержкой --latency.
+Затем одновременно отправляется --requests запросов:
+- в ASGI приложение (project/asgi.py) внутри одного цикла событий - один воркер;
+- в синхронный current_weather из --threads потоков - как WSGI сервер с --threads потоками.
+Кэш погоды отключён, а координаты у запросов разные, поэтому каждый запрос идёт в API.
+
+Для синхронного варианта время растёт как requests * latency / threads, для асинхронного
+остаётся близким к latency: ожидание ответа API не занимает воркер.
+Отдельно измеряется /weather/batch/ с WEATHER_BATCH_MAX_POINTS точками.
+
+Запуск из корня проекта:
+python benchmarks/weather_async_load.py --requests 200 --latency 0.2 --threads 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import parse_qs, urlsplit
+
+from utils import setup_django
+
+
+async def handle_stub(reader, writer, latency):
+    """Заглушка API Яндекс.Погоды: ответ в формате API через latency секунд"""
+    while True:
+        request_line = await reader.readline()
+        if not request_line:
+            break
+        while (await reader.readline()) not in (b'\r\n', b''):  # Заголовки не нужны
+            pass
+        query = parse_qs(urlsplit(request_line.split()[1].decode()).query)
+        await asyncio.sleep(latency)
+        body = json.dumps({
+            'geo_object': {'locality': {'name': f"Заглушка {query['lat'][0]}, {query['lon'][0]}"}},
+            'fact': {'uptime': 1700000000, 'temp': 1, 'feels_like': -2, 'pressure_mm': 750,
+                     'humidity': 90, 'wind_speed': 4.0, 'wind_gust': 8.0, 'wind_dir': 'sw'},
+        }).encode()
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+        await writer.drain()
+    writer.close()
+
+
+def start_stub(latency):
+    """Запуск заглушки в отдельном потоке. Возвращает адрес"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    started = threading.Event()
+
+    async def serve():
+        server = await asyncio.start_server(lambda r, w: handle_stub(r, w, latency), sock=sock, backlog=1024)
+        started.set()
+        await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return f"http://127.0.0.1:{sock.getsockname()[1]}/v2/forecast"
+
+
+async def asgi_get(application, path, query):
+    """Один GET запрос к ASGI приложению. Возвращает (статус, тело)"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    response = {'body': b''}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()  # Клиент не отключается
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'] += message.get('body', b'')
+
+    await application(scope, receive, send)
+    return response['status'], response['body']
+
+
+def points(count, offset=0):
+    return [(round(50 + (offset + i) * 0.01, 2), 30.0) for i in range(count)]
+
+
+async def run_asgi(application, count):
+    responses = await asyncio.gather(*(asgi_get(application, '/weather/', f'lat={lat}&lon={lon}')
+                                       for lat, lon in points(count)))
+    assert all(status == 200 for status, _ in responses), {status for status, _ in responses}
+
+
+async def run_batch(application, count, offset):
+    query = 'points=' + ';'.join(f'{lat},{lon}' for lat, lon in points(count, offset))
+    status, body = await asgi_get(application, '/weather/batch/', query)
+    assert status == 200 and not any('error' in item for item in json.loads(body)), body[:200]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help='задержка ответа API, с')
+    parser.add_argument('--threads', type=int, default=4, help='потоков у синхронного (WSGI) воркера')
+    args = parser.parse_args()
+
+    os.environ['WEATHER_API_URL'] = start_stub(args.latency)
+    os.environ.pop('WEATHER_PROVIDER', None)
+    setup_django()
+
+    import weather_api
+    from app_weather.views import WEATHER_BATCH_MAX_POINTS, WEATHER_BATCH_CONCURRENCY
+    from project.asgi import application
+    weather_api.WEATHER_SERVICE.ttl = weather_api.WEATHER_SERVICE.stale_ttl = 0  # Без кэша
+
+    t1 = perf_counter()
+    asyncio.run(run_asgi(application, args.requests))
+    async_time = perf_counter() - t1
+
+    t1 = perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(lambda point: weather_api.current_weather(*point), points(args.requests)))
+    sync_time = perf_counter() - t1
+
+    t1 = perf_counter()
+    asyncio.run(run_batch(application, WEATHER_BATCH_MAX_POINTS, args.requests))
+    batch_time = perf_counter() - t1
+
+    print(f"{args.requests} запросов, задержка API {args.latency * 1000:.0f} мс")
+    print(f"  ASGI, 1 воркер (цикл событий): {async_time:6.2f} c ({args.requests / async_time:.0f} запр/с)")
+    print(f"  WSGI, {args.threads} потока:            {sync_time:6.2f} c ({args.requests / sync_time:.0f} запр/с)")
+    print(f"  /weather/batch/ ({WEATHER_BATCH_MAX_POINTS} точек, не больше {WEATHER_BATCH_CONCURRENCY} "
+          f"одновременно): {batch_time:.2f} c")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
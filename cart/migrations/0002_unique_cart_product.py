@@ -0,0 +1,33 @@
+# Generated by Django 4.2.5 on 2026-10-18 10:58
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Объединение повторяющихся позиций (одинаковые cart и product) перед добавлением ограничения"""
+    CartItem = apps.get_model('cart', 'CartItem')
+    duplicates = (CartItem.objects.values('cart_id', 'product_id')
+                  .annotate(items=Count('id'), total=Sum('quantity'))
+                  .filter(items__gt=1))
+    for duplicate in duplicates:
+        items = CartItem.objects.filter(cart_id=duplicate['cart_id'],
+                                        product_id=duplicate['product_id']).order_by('id')
+        first = items.first()
+        items.exclude(id=first.id).delete()
+        CartItem.objects.filter(id=first.id).update(quantity=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
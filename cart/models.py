@@ -29,3 +29,9 @@ class CartItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity}"
+
+    class Meta:
+        constraints = [
+            # Один продукт - одна позиция в корзине (нужно для атомарного добавления в cart/services.py)
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
@@ -0,0 +1,218 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+from django.db.models import BigIntegerField, F, Case, When, Value, IntegerField, DecimalField, FloatField, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from store.models import Product
+from .models import Cart, CartItem
+
+CART_BULK_MAX_OPERATIONS = 100  # Максимум операций в одном вызове apply_cart_operations
+CART_MAX_DELTA = 2 ** 31 - 1  # Максимальное изменение количества (диапазон PositiveIntegerField)
+# Время жизни итогов корзины в кэше, с. Изменения позиций сбрасывают кэш сразу, а срок
+# ограничивает устаревание итогов после изменения цен продуктов
+CART_SUMMARY_TIMEOUT = 300
+
+
+class CartOperationError(ValueError):
+    """Некорректный пакет операций с корзиной (ни одна операция не применяется)"""
+
+
+def add_product_to_cart(user, product_id, quantity: int = 1) -> bool:
+    """
+    Атомарно добавляет продукт в корзину пользователя.
+
+    Если позиция уже есть, то количество увеличивается одним запросом
+    UPDATE ... SET quantity = quantity + n (без чтения значения в Python, поэтому
+    параллельные запросы не теряют увеличения). Если позиции нет, то она создаётся.
+    Уникальность пары (cart, product) гарантирует БД, поэтому при одновременном создании
+    одной и той же позиции второй запрос получает IntegrityError и повторяет увеличение.
+
+    :param user: Пользователь (владелец корзины).
+    :param product_id: id продукта.
+    :param quantity: На сколько увеличить количество.
+    :return: True в случае успешного добавления, False если продукта (или корзины) не существует.
+    """
+    try:
+        product_id = int(product_id)
+    except (TypeError, ValueError):
+        return False
+
+    # Обычный случай (продукт уже в корзине) - один запрос
+    if _increment(user, product_id, quantity):
+        return True
+
+    cart_id = Cart.objects.filter(customer=user).values_list('id', flat=True).first()
+    if cart_id is None:
+        return False
+    try:
+        with transaction.atomic():
+            # create отправляет post_save, итоги корзины сбрасывает сигнал
+            CartItem.objects.create(cart_id=cart_id, product_id=product_id, quantity=quantity)
+        return True
+    except IntegrityError:
+        # Позицию успела создать параллельная операция (или продукта не существует - тогда
+        # увеличивать будет нечего и вернётся False)
+        return _increment(user, product_id, quantity)
+
+
+def _increment(user, product_id: int, quantity: int) -> bool:
+    """Увеличение количества существующей позиции одним UPDATE. Возвращает True, если позиция найдена"""
+    updated = CartItem.objects.filter(cart__customer=user, product_id=product_id).update(
+        quantity=F('quantity') + quantity,
+        updated_at=timezone.now(),  # auto_now не срабатывает при update()
+    )
+    if updated:
+        invalidate_cart_summary(user.pk)  # update() не отправляет сигналы
+    return updated > 0
+
+
+def apply_cart_operations(user, operations, attempts: int = 3) -> dict:
+    """
+    Применяет пакет изменений корзины в одной транзакции: либо все, либо ни одного.
+
+    Все id продуктов проверяются одним запросом. Количество существующих позиций меняется
+    одним UPDATE ... SET quantity = MAX(quantity + CASE product_id ... END, 0) (без чтения
+    значений в Python, поэтому параллельные изменения не теряются), новые позиции создаются
+    одним INSERT, позиции с нулевым количеством удаляются одним DELETE.
+
+    :param user: Пользователь (владелец корзины).
+    :param operations: Список словарей {'product_id': id, 'delta': изменение количества}.
+    Положительный delta добавляет товар, отрицательный - уменьшает количество (позиция удаляется,
+    когда количество доходит до 0). Операции с одним продуктом складываются.
+    :param attempts: Число попыток, если позицию параллельно создал другой запрос.
+    :return: Состояние корзины после изменения (см. cart_state).
+    :raises CartOperationError: Некорректные операции или несуществующие продукты.
+    """
+    deltas = _parse_operations(operations)
+    unknown = deltas.keys() - set(Product.objects.filter(pk__in=deltas).values_list('pk', flat=True))
+    if unknown:
+        raise CartOperationError(f"Продуктов не существует: {', '.join(map(str, sorted(unknown)))}")
+    cart_id = Cart.objects.filter(customer=user).values_list('id', flat=True).first()
+    if cart_id is None:
+        raise CartOperationError("У пользователя нет корзины")
+
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                _apply_deltas(cart_id, deltas)
+            break
+        except IntegrityError:
+            # Позицию успела создать параллельная операция - повторяем, она уже будет обновлена UPDATE
+            if attempt == attempts - 1:
+                raise
+    invalidate_cart_summary(user.pk)  # update() и bulk_create() не отправляют сигналы
+    return cart_state(cart_id)
+
+
+def cart_state(cart_id: int) -> dict:
+    """
+    Состояние корзины одним запросом (цены берутся из карточек продуктов ProductCard).
+
+    :return: {'products': [{'product_id', 'name', 'quantity', 'price', 'price_total'}, ...],
+    'total_quantity': ..., 'total_price': ...}
+    """
+    items = list(CartItem.objects.filter(cart_id=cart_id).order_by('created_at', 'id').values(
+        'product_id', 'quantity', name=F('product__card__name'), price=F('product__card__price_after'),
+    ))
+    for item in items:
+        item['price_total'] = item['price'] * item['quantity']
+    return {
+        'products': items,
+        'total_quantity': sum(item['quantity'] for item in items),
+        'total_price': sum((item['price_total'] for item in items), 0),
+    }
+
+
+def cart_summary(user) -> dict:
+    """
+    Итоги корзины пользователя: число товаров, сумма без скидок, скидка и сумма к оплате.
+    Считаются одним агрегирующим запросом (цены из карточек продуктов ProductCard)
+    и кэшируются до изменения корзины (см. invalidate_cart_summary).
+
+    :param user: Пользователь (владелец корзины).
+    :return: {'item_count': ..., 'subtotal': Decimal, 'discount': Decimal, 'total': Decimal,
+    'weight': Decimal (вес товаров, кг - для расчёта доставки)}
+    """
+    key = _summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        money = DecimalField(max_digits=12, decimal_places=2)
+        totals = CartItem.objects.filter(cart__customer=user).aggregate(
+            item_count=Sum('quantity'),
+            subtotal=Sum(F('quantity') * F('product__card__price_before'), output_field=money),
+            total=Sum(F('quantity') * F('product__card__price_after'), output_field=money),
+            # Вес: количество * количество в единице * коэффициент перевода единицы в стандартную (кг, л)
+            weight=Sum(F('quantity') * F('product__quantity_per_unit') * F('product__unit__conversion_factor'),
+                       output_field=FloatField()),
+        )
+        # SQLite возвращает суммы без дробной части ("301"), приводим к копейкам
+        subtotal = (totals['subtotal'] or Decimal(0)).quantize(Decimal('0.01'))
+        total = (totals['total'] or Decimal(0)).quantize(Decimal('0.01'))
+        summary = {
+            'item_count': totals['item_count'] or 0,
+            'subtotal': subtotal,
+            'discount': subtotal - total,
+            'total': total,
+            'weight': Decimal(str(round(totals['weight'] or 0, 3))),
+        }
+        cache.set(key, summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_cart_summary(customer_id: int) -> None:
+    """
+    Сброс кэша итогов корзины пользователя. Если вызвано внутри транзакции, то сброс
+    выполняется после её фиксации (иначе параллельный запрос успел бы закэшировать старые данные).
+    Кэш общий для всех процессов сервера (см. CACHES в настройках), поэтому сброс виден всем воркерам.
+    """
+    transaction.on_commit(lambda: cache.delete(_summary_key(customer_id)))
+
+
+def _summary_key(customer_id: int) -> str:
+    return f"cart_summary:{customer_id}"
+
+
+def _apply_deltas(cart_id: int, deltas: dict) -> None:
+    if not deltas:
+        return
+    items = CartItem.objects.filter(cart_id=cart_id, product_id__in=deltas)
+    # Первым в транзакции идёт UPDATE: он сразу блокирует строки (в SQLite - всю БД на запись),
+    # поэтому параллельные пакеты выполняются по очереди, а не падают на повышении блокировки
+    change = Case(*(When(product_id=product_id, then=Value(delta)) for product_id, delta in deltas.items()),
+                  output_field=IntegerField())
+    items.update(
+        quantity=Greatest(F('quantity') + change, Value(0)),
+        updated_at=timezone.now(),  # auto_now не срабатывает при update()
+    )
+    existing = set(items.values_list('product_id', flat=True))
+    CartItem.objects.bulk_create([
+        CartItem(cart_id=cart_id, product_id=product_id, quantity=delta)
+        for product_id, delta in deltas.items() if product_id not in existing and delta > 0
+    ])
+    items.filter(quantity=0).delete()
+
+
+def _parse_operations(operations) -> dict:
+    """Проверка операций. Возвращает {id продукта: суммарное изменение количества}"""
+    if not isinstance(operations, list) or not operations:
+        raise CartOperationError("Ожидается непустой список операций")
+    if len(operations) > CART_BULK_MAX_OPERATIONS:
+        raise CartOperationError(f"Не больше {CART_BULK_MAX_OPERATIONS} операций за раз")
+    deltas = {}
+    for operation in operations:
+        try:
+            product_id = int(operation['product_id'])
+            delta = operation.get('delta', 1)
+            if isinstance(delta, bool) or not isinstance(delta, int):
+                raise TypeError
+            # Числа вне диапазона столбцов БД драйвер не примет (OverflowError)
+            if not 0 < product_id <= BigIntegerField.MAX_BIGINT or abs(delta) > CART_MAX_DELTA:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise CartOperationError(f"Некорректная операция: {operation!r}") from None
+        deltas[product_id] = deltas.get(product_id, 0) + delta
+        if abs(deltas[product_id]) > CART_MAX_DELTA:
+            raise CartOperationError(f"Слишком большое изменение количества продукта {product_id}")
+    return deltas
@@ -1,7 +1,8 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Cart
+from .models import Cart, CartItem
+from .services import invalidate_cart_summary
 
 
 # Принимается сигнал post_save отправленный от модели User(сигнал post_save
@@ -14,6 +15,15 @@ def create_user_cart(sender, instance, created, **kwargs):
         Cart.objects.create(
             customer=instance)  # Создаём корзину для пользователя
 
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def reset_cart_summary(sender, instance, **kwargs):
+    """Сброс кэша итогов корзины при изменении или удалении позиции"""
+    customer_id = Cart.objects.filter(pk=instance.cart_id).values_list('customer_id', flat=True).first()
+    if customer_id is not None:
+        invalidate_cart_summary(customer_id)
+
 """Код ниже не нужно раскомментировать, он показывает как можно удалить корзину, 
 при удалении пользователя, но нам это не требуется, так как в модели Cart у 
 поля customer в отношениях у нас стоит on_delete=models.CASCADE который на уровне
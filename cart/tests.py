@@ -1,3 +1,61 @@
-from django.test import TestCase
+from threading import Thread
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from logic.query_budget import assert_view_within_budget
+from store.tests import TEST_CACHES, create_products
+from .models import Cart, CartItem
+from .services import add_product_to_cart
+from .views import cart_view
 
-# Create your tests here.
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTest(TestCase):
+    """Корзина укладывается в объявленный бюджет SQL запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='password')  # Корзину создаёт сигнал
+        cart = Cart.objects.get(customer=cls.user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=2)
+                                      for product in create_products(5)])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_cart_view(self):
+        response = assert_view_within_budget(self.client, '/cart/', cart_view)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['products']), 5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentAddTest(TransactionTestCase):
+    """Одновременные добавления одного продукта в корзину не теряют увеличений"""
+
+    def test_concurrent_add_product_to_cart(self):
+        user = User.objects.create_user('buyer', password='password')
+        product = create_products(1)[0]
+        threads, operations = 4, 25
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(operations):
+                    add_product_to_cart(user, product.pk)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()  # У каждого потока своё соединение с БД
+
+        workers = [Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(list(CartItem.objects.filter(cart__customer=user).values_list('quantity', flat=True)),
+                         [threads * operations])
@@ -1,7 +1,8 @@
 # urls.py in store
 
 from django.urls import path
-from .views import cart_view, cart_add_view, cart_del_view, cart_buy_now_view, cart_remove_view
+from .views import cart_view, cart_add_view, cart_del_view, cart_buy_now_view, cart_remove_view, cart_bulk_view, \
+    cart_summary_view
 
 app_name = 'cart'
 
@@ -11,4 +12,6 @@ urlpatterns = [
     path('del/<str:id_product>', cart_del_view),
     path('buy/<str:id_product>', cart_buy_now_view, name="buy_now"),
     path('remove/<str:id_product>', cart_remove_view, name="remove_now"),
+    path('bulk/', cart_bulk_view, name="bulk"),
+    path('summary', cart_summary_view, name="summary"),
 ]
\ No newline at end of file
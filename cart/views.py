@@ -4,13 +4,18 @@ from store.models import DATABASE
 from logic.services import filtering_category, view_in_cart, add_to_cart, remove_from_cart
 from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
+from logic.query_budget import query_budget
 from .models import Cart, CartItem
+from .services import add_product_to_cart, apply_cart_operations, CartOperationError, cart_summary
 from store.models import Product
 from django.db.models import ExpressionWrapper, F, DecimalField, Case, When, Value
+from django.views.decorators.http import require_POST
+import json
 
 
 
 @login_required(login_url='login:login_view')
+@query_budget(3)
 def cart_view(request):
     if request.method == "GET":
         cart = Cart.objects.get(customer=request.user)
@@ -41,26 +46,57 @@ def cart_view(request):
             url=F("product__image"),
         ).values("id", "quantity", "price_after", "price_total", "name", "description", "url")
         # values аналогично SELECT позволяет в запросе указать на вывод только те колонки, что необходимы
-        return render(request, "cart/cart.html", context={"products": products})
+        return render(request, "cart/cart.html", context={"products": products,
+                                                          "summary": cart_summary(request.user)})
+
+
+def cart_summary_view(request):
+    """
+    Итоги корзины для значка в шапке сайта без отрисовки всей корзины:
+    {"item_count": ..., "subtotal": ..., "discount": ..., "total": ..., "weight": ...}.
+    Для неавторизованного пользователя - пустая корзина.
+    """
+    if request.method == "GET":
+        if request.user.is_authenticated:
+            summary = cart_summary(request.user)
+        else:
+            summary = {'item_count': 0, 'subtotal': '0.00', 'discount': '0.00', 'total': '0.00', 'weight': '0'}
+        return JsonResponse(summary, json_dumps_params={'ensure_ascii': False})
 
 
 @login_required(login_url='login:login_view')
 def cart_buy_now_view(request, id_product):
     if request.method == "GET":
-        cart = Cart.objects.get(customer=request.user)  # Получили корзину по пользователю
-        product = Product.objects.get(id=id_product)  # Получили продукт по его id
-        products_cart = cart.items.filter(product=product)
-        if products_cart:
-            cart_item = products_cart.first()
-            cart_item.quantity += 1
-            cart_item.save()
-        else:
-            CartItem.objects.create(cart=cart, product=product)  # Создали объект в CartItem по данным
-        return redirect("cart:cart_view")
+        # Атомарное добавление (увеличение количества одним UPDATE или создание позиции)
+        if add_product_to_cart(request.user, id_product):
+            return redirect("cart:cart_view")
 
         return HttpResponseNotFound("Неудачное добавление в корзину")
 
 
+@require_POST
+def cart_bulk_view(request):
+    """
+    Пакетное изменение корзины одним запросом (одна транзакция: применяются все операции или ни одной).
+    POST /cart/bulk/ с телом {"operations": [{"product_id": 1, "delta": 2}, {"product_id": 3, "delta": -1}]}
+    В ответе состояние корзины после изменения, повторно запрашивать корзину не нужно.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"answer": "Пользователь не авторизирован"}, status=401,
+                            json_dumps_params={'ensure_ascii': False})
+    try:
+        data = json.loads(request.body)
+    except ValueError:  # JSONDecodeError или тело не в UTF-8
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({"answer": "Некорректный JSON"}, status=400, json_dumps_params={'ensure_ascii': False})
+    try:
+        state = apply_cart_operations(request.user, data.get('operations'))
+    except CartOperationError as error:
+        return JsonResponse({"answer": str(error)}, status=400, json_dumps_params={'ensure_ascii': False})
+    return JsonResponse(state, json_dumps_params={'ensure_ascii': False})
+
+
 def cart_remove_view(request, id_product):
     # id_product - неудачное название, так как на самом деле передаётся id_cart_item
     # тоесть номер строки в базе данных CartItem, поэтому при удалении получаем объект по его id и удаляем
@@ -77,18 +113,10 @@ def cart_add_view(request, id_product):
     # Реализация для добавления в корзину, при нажатии на + на главной странице
     # (когда возвращается JSON, а не html)
     if request.method == "GET":
-        cart = Cart.objects.get(customer=request.user)
-        product = Product.objects.get(id=id_product)
-        products_cart = cart.items.filter(product=product)
-        if products_cart:
-            cart_item = products_cart.first()
-            cart_item.quantity += 1
-            cart_item.save()
-        else:
-            CartItem.objects.create(cart=cart, product=product)  # Создали объект в CartItem по данным
-        return JsonResponse(
-            {"answer": "Продукт успешно добавлен в корзину"},
-            json_dumps_params={'ensure_ascii': False})
+        if add_product_to_cart(request.user, id_product):
+            return JsonResponse(
+                {"answer": "Продукт успешно добавлен в корзину"},
+                json_dumps_params={'ensure_ascii': False})
 
         return JsonResponse({"answer": "Неудачное добавление в корзину"},
                             status=404,
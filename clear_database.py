@@ -1,19 +1,158 @@
 """
 Удаление базы данных и всех миграций
+
+python clear_database.py - удалить db.sqlite3 и применить все миграции заново (python manage.py migrate).
+python clear_database.py --fast [--seed-scale 0.1] [--refresh] - быстрый сброс из снимка БД.
+
+Быстрый сброс: один раз БД создаётся миграциями (и, если указан --seed-scale, заполняется
+командой seed_database), после чего сохраняется снимок через SQLite backup API в папку .db_snapshots.
+Имя снимка - хэш файлов миграций всех приложений (и версии Django) и параметров заполнения, поэтому
+после изменения или добавления миграции снимок создаётся заново. Следующие сбросы - копирование
+файла снимка вместо выполнения всех миграций (миллисекунды вместо секунд).
+
+Функция reset_database используется и скриптами нагрузочного тестирования (benchmarks/utils.py).
 """
 
+import argparse
+import hashlib
+import json
 import os
+import shutil
+import sqlite3
 import subprocess
+import sys
+from time import perf_counter
 
 DATABASE = "db.sqlite3"
 command_migrate = "python manage.py migrate"
 
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(PROJECT_DIR, '.db_snapshots')  # Папка снимков БД
+
+
+def reset_database(seed_options: [None, dict] = None, refresh: bool = False) -> str:
+    """
+    Быстрый сброс БД из настроек Django (только SQLite) к снимку. Если снимка нет, то БД создаётся
+    миграциями (и заполняется), а снимок сохраняется. Django должен быть настроен (django.setup()).
+
+    :param seed_options: [Опционально] Параметры команды seed_database (например, {'scale': 0.1}).
+    Если не указаны, то снимок - БД сразу после миграций.
+    :param refresh: Пересоздать снимок, даже если он уже есть.
+    :return: 'restored' - БД восстановлена из снимка, 'created' - БД создана и снимок сохранён.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.db import connections
+
+    database = settings.DATABASES['default']
+    if not database['ENGINE'].endswith('sqlite3'):
+        raise ValueError("Быстрый сброс поддерживается только для SQLite")
+    path = str(database['NAME'])
+    snapshot = snapshot_path(seed_options)
+
+    connections.close_all()  # Открытое соединение продолжило бы работать с удалённым файлом
+    _remove_database(path)
+    cache.clear()  # Кэш (общий для процессов, см. CACHES) хранит данные прежней БД
+    if not refresh and os.path.exists(snapshot):
+        shutil.copyfile(snapshot, path)
+        return 'restored'
+
+    call_command('migrate', verbosity=0)
+    if seed_options:
+        call_command('seed_database', **seed_options)
+    connections.close_all()
+    save_snapshot(path, snapshot)
+    return 'created'
+
+
+def snapshot_path(seed_options: [None, dict] = None) -> str:
+    """Путь до снимка для текущих миграций и параметров заполнения"""
+    import django
+
+    digest = hashlib.sha256(django.get_version().encode())
+    for path in _migration_files():
+        digest.update(os.path.relpath(path, PROJECT_DIR).replace(os.sep, '/').encode())
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    digest.update(json.dumps(seed_options or {}, sort_keys=True).encode())
+    return os.path.join(SNAPSHOT_DIR, f"{digest.hexdigest()[:16]}.sqlite3")
+
+
+def save_snapshot(path: str, snapshot: str) -> None:
+    """
+    Копия БД через SQLite backup API (согласованная, даже если с БД кто-то работает).
+    Снимок сначала пишется во временный файл, поэтому прерванное сохранение не оставит неполный снимок.
+    """
+    os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+    temp_path = snapshot + '.tmp'
+    _remove_database(temp_path)
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(temp_path)
+    try:
+        with target:
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    os.replace(temp_path, snapshot)
+
+
+def _migration_files() -> list:
+    """Файлы миграций всех приложений проекта (в одном и том же порядке)"""
+    files = []
+    for app in sorted(os.listdir(PROJECT_DIR)):
+        directory = os.path.join(PROJECT_DIR, app, 'migrations')
+        if os.path.isdir(directory):
+            files += [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                      if name.endswith('.py')]
+    return files
+
+
+def _remove_database(path: str) -> None:
+    """Удаление файла БД вместе с журналами SQLite"""
+    for name in (path, path + '-journal', path + '-wal', path + '-shm'):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def _setup_django() -> None:
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+    import django
+    django.setup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fast', action='store_true', help="Сбросить БД из снимка (создаётся при первом запуске)")
+    parser.add_argument('--seed-scale', type=float,
+                        help="Заполнить БД командой seed_database с таким --scale перед сохранением снимка")
+    parser.add_argument('--refresh', action='store_true', help="Пересоздать снимок")
+    args = parser.parse_args()
+
+    if not args.fast:
+        if os.path.exists(DATABASE):
+            os.remove(DATABASE)
+
+        try:
+            subprocess.run(command_migrate, shell=True, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Ошибка выполнения команды: {e}")
+        _setup_django()
+        from django.core.cache import cache
+        cache.clear()  # Кэш (общий для процессов, см. CACHES) хранит данные прежней БД
+        return
+
+    _setup_django()
 
-if os.path.exists(DATABASE):
-    os.remove(DATABASE)
+    t1 = perf_counter()
+    seed_options = {'scale': args.seed_scale} if args.seed_scale else None
+    result = reset_database(seed_options, refresh=args.refresh)
+    action = "восстановлена из снимка" if result == 'restored' else "создана, снимок сохранён"
+    print(f"БД {action} за {perf_counter() - t1:.3f} c ({snapshot_path(seed_options)})")
 
-try:
-    subprocess.run(command_migrate, shell=True, check=True)
-except subprocess.CalledProcessError as e:
-    print(f"Ошибка выполнения команды: {e}")
 
+if __name__ == "__main__":
+    main()
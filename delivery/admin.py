@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import ShippingAddress, Delivery
+from .models import ShippingAddress, Delivery, DeliveryTariff
 
 admin.site.register(ShippingAddress)
 admin.site.register(Delivery)
+admin.site.register(DeliveryTariff)
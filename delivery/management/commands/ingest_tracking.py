@@ -0,0 +1,42 @@
+"""
+Загрузка статусов доставки от перевозчика из JSONL файла (см. delivery/tracking.py).
+
+python manage.py ingest_tracking events.jsonl [--offset-file events.jsonl.offset] [--chunk-size 5000] [--reset]
+
+Загрузка продолжается с сохранённого смещения, поэтому команду можно запускать повторно
+(например, по расписанию для файла, который дописывается перевозчиком).
+"""
+
+import os
+from django.core.management.base import BaseCommand, CommandError
+from delivery.tracking import ingest_tracking_file, write_offset, TRACKING_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Загружает статусы доставок из JSONL файла событий перевозчика"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл событий (одно событие JSON в строке)")
+        parser.add_argument('--offset-file', help="Файл смещения (по умолчанию - <path>.offset)")
+        parser.add_argument('--chunk-size', type=int, default=TRACKING_CHUNK_SIZE,
+                            help="Сколько строк обрабатывается за одну транзакцию")
+        parser.add_argument('--reset', action='store_true', help="Загрузить файл с начала")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f"Файл {path} не найден")
+        offset_path = options['offset_file'] or path + '.offset'
+        if options['reset']:
+            write_offset(offset_path, 0)
+
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  строк: {stats['lines']}, изменено доставок: {stats['updated']}, "
+                                  f"смещение: {stats['offset']}")
+
+        stats = ingest_tracking_file(path, offset_path, options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Строк: {stats['lines']} за {stats['seconds']:.2f} c ({stats['rows_per_second']:.0f} строк/с). "
+            f"Событий без повторов: {stats['events']}, изменено доставок: {stats['updated']}, "
+            f"пропущено: {stats['skipped']}, некорректных строк: {stats['invalid']}"))
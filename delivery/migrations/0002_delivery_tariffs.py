@@ -0,0 +1,42 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+def create_default_tariffs(apps, schema_editor):
+    """Тарифы, которые раньше были зашиты в delivery_estimate_view (DATA_PRICE)"""
+    DeliveryTariff = apps.get_model('delivery', 'DeliveryTariff')
+    DeliveryTariff.objects.bulk_create([
+        DeliveryTariff(country='Россия', region='Москва', base_price=80),
+        DeliveryTariff(country='Россия', region='Санкт-Петербург', base_price=80),
+        DeliveryTariff(country='Россия', base_price=100),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryTariff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=100)),
+                ('region', models.CharField(blank=True, default='', max_length=100)),
+                ('postal_prefix', models.CharField(blank=True, default='', max_length=20)),
+                ('max_weight', models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True)),
+                ('base_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_per_kg', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['country', 'region', 'postal_prefix', 'max_weight'], name='tariff_location_idx')],
+            },
+        ),
+        migrations.RunPython(create_default_tariffs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0002_delivery_tariffs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='delivery',
+            name='tracking_number',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+    ]
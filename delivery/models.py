@@ -23,8 +23,40 @@ class Delivery(models.Model):
     delivery_status = models.CharField(max_length=20, choices=[('В ожидании', 'В ожидании'),
                                                                ('Отправлено', 'Отправлено'),
                                                                ('Доставлено', 'Доставлено')])
-    tracking_number = models.CharField(max_length=50, blank=True, null=True)
+    tracking_number = models.CharField(max_length=50, blank=True, null=True,
+                                       db_index=True)  # Трек-номер (по нему приходят статусы, см. delivery/tracking.py)
     estimated_delivery_date = models.DateField(blank=True, null=True)
 
     def __str__(self):
         return f"Доставка для заказа {self.order.id}, Статус: {self.delivery_status}"
+
+
+class DeliveryTariff(models.Model):
+    """
+    Модель тарифа доставки. Тариф действует на страну целиком, на регион (город или область)
+    или на почтовые индексы, начинающиеся с postal_prefix. Из подходящих тарифов выбирается самый
+    точный (самый длинный префикс индекса, затем регион, затем страна), а среди них - весовая
+    группа с наименьшим max_weight, в которую помещается заказ (см. delivery/services.py).
+    """
+    country = models.CharField(max_length=100)  # Страна
+    region = models.CharField(max_length=100, blank=True, default='')  # Город или область ('' - любой)
+    postal_prefix = models.CharField(max_length=20, blank=True, default='')  # Начало почтового индекса ('' - любой)
+    max_weight = models.DecimalField(max_digits=10, decimal_places=3, null=True,
+                                     blank=True)  # Верхняя граница весовой группы, кг (пусто - без ограничения)
+    base_price = models.DecimalField(max_digits=10, decimal_places=2)  # Стоимость доставки
+    price_per_kg = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Надбавка за каждый кг веса
+    is_active = models.BooleanField(default=True)  # Флаг активности тарифа
+    created_at = models.DateTimeField(
+        auto_now_add=True)  # Дата и время создания объекта сущности в базе данных
+    updated_at = models.DateTimeField(
+        auto_now=True)  # Дата и время обновления объекта сущности в базе данных
+
+    def __str__(self):
+        where = ', '.join(filter(None, [self.country, self.region, self.postal_prefix and f"{self.postal_prefix}*"]))
+        weight = f"до {self.max_weight} кг" if self.max_weight is not None else "любой вес"
+        return f"{where} ({weight}): {self.base_price} + {self.price_per_kg}/кг"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['country', 'region', 'postal_prefix', 'max_weight'], name='tariff_location_idx'),
+        ]
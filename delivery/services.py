@@ -0,0 +1,191 @@
+"""
+Расчёт стоимости доставки по тарифам (DeliveryTariff).
+
+Активные тарифы загружаются одним запросом в индекс в памяти процесса:
+- по стране - тарифы на всю страну и словарь тарифов по регионам (город или область);
+- префиксное дерево (trie) почтовых индексов страны: узел дерева - очередная цифра индекса.
+Поиск тарифа - проход по цифрам индекса (самый длинный подходящий префикс) и несколько обращений
+к словарям, без запросов к БД.
+
+Инвалидация версионная, как у индекса промоакций (promotion/services.py): изменение тарифа
+(сигналы delivery/signals.py) записывает новую уникальную версию в кэш Django, процесс сверяет
+версию не чаще, чем раз в TARIFF_VERSION_CHECK_INTERVAL секунд, и перестраивает индекс.
+Кэш общий для всех процессов сервера (см. CACHES в настройках), поэтому изменение тарифа
+доходит до индексов всех воркеров.
+"""
+
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.cache import cache
+from django.db import transaction
+from .models import DeliveryTariff
+
+TARIFF_VERSION_KEY = 'delivery_tariffs:version'  # Ключ версии тарифов в кэше Django
+TARIFF_VERSION_CHECK_INTERVAL = 1.0  # Как часто процесс сверяет версию индекса с кэшем, с
+
+_NO_LIMIT = Decimal('Infinity')  # Весовая группа без верхней границы
+
+
+class _Bands:
+    """Весовые группы тарифов одного места доставки, по возрастанию max_weight"""
+    __slots__ = ('limits', 'tariffs')
+
+    def __init__(self):
+        self.limits = []  # max_weight
+        self.tariffs = []  # (id, base_price, price_per_kg)
+
+    def add(self, max_weight, tariff: tuple) -> None:
+        limit = _NO_LIMIT if max_weight is None else max_weight
+        position = bisect_left(self.limits, limit)
+        self.limits.insert(position, limit)
+        self.tariffs.insert(position, tariff)
+
+    def find(self, weight: Decimal) -> [None, tuple]:
+        """Тариф группы с наименьшим max_weight >= weight"""
+        position = bisect_left(self.limits, weight)
+        return self.tariffs[position] if position < len(self.tariffs) else None
+
+
+class _TrieNode:
+    __slots__ = ('children', 'bands')
+
+    def __init__(self):
+        self.children = {}  # Цифра индекса -> узел
+        self.bands = None  # Тарифы префикса, который заканчивается в этом узле
+
+
+class _Country:
+    __slots__ = ('bands', 'regions', 'postal')
+
+    def __init__(self):
+        self.bands = None  # Тарифы на всю страну
+        self.regions = {}  # Регион -> тарифы
+        self.postal = _TrieNode()  # Корень дерева почтовых индексов
+
+
+class TariffIndex:
+    """Индекс тарифов доставки в памяти процесса (потокобезопасен, перестраивается одним потоком)"""
+
+    def __init__(self, version_check_interval: float = TARIFF_VERSION_CHECK_INTERVAL):
+        self.version_check_interval = version_check_interval
+        self._countries = None  # Страна -> _Country (None - ещё не построен)
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def quote(self, country: str, regions=(), postal_code: str = '', weight=0) -> [None, dict]:
+        """
+        Стоимость доставки по самому точному подходящему тарифу: самый длинный префикс почтового
+        индекса, затем регионы по порядку, затем вся страна. Если у самого точного места нет
+        весовой группы для такого веса, то используется следующее по точности место.
+
+        :param country: Страна.
+        :param regions: [Опционально] Регионы по убыванию точности (например, город и область).
+        :param postal_code: [Опционально] Почтовый индекс.
+        :param weight: [Опционально] Вес заказа, кг.
+        :return: {'price': Decimal, 'tariff_id': ..., 'match': 'postal_code' | 'region' | 'country'}
+        или None, если подходящего тарифа нет.
+        """
+        entry = self._current_countries().get(_normalize(country))
+        if entry is None:
+            return None
+        weight = Decimal(str(weight))
+
+        candidates = []
+        node = entry.postal
+        for digit in _normalize_postal_code(postal_code):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            if node.bands is not None:
+                candidates.append(('postal_code', node.bands))
+        candidates.reverse()  # Самый длинный префикс - первым
+        candidates += [('region', entry.regions[region]) for region in map(_normalize, regions)
+                       if region in entry.regions]
+        if entry.bands is not None:
+            candidates.append(('country', entry.bands))
+
+        for match, bands in candidates:
+            tariff = bands.find(weight)
+            if tariff is not None:
+                tariff_id, base_price, price_per_kg = tariff
+                price = (base_price + price_per_kg * weight).quantize(Decimal('0.01'), ROUND_HALF_UP)
+                return {'price': price, 'tariff_id': tariff_id, 'match': match}
+        return None
+
+    def expire(self) -> None:
+        """Сверить версию с кэшем при следующем расчёте (не дожидаясь version_check_interval)"""
+        self._checked_at = 0.0
+
+    def _current_countries(self) -> dict:
+        countries = self._countries
+        if countries is not None and time.monotonic() - self._checked_at < self.version_check_interval:
+            return countries
+        with self._lock:
+            if self._countries is not None and time.monotonic() - self._checked_at < self.version_check_interval:
+                return self._countries  # Версию уже сверил другой поток
+            version = _current_version()
+            if self._countries is None or version != self._version:
+                self._countries = _load_countries()
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._countries
+
+
+def quote_delivery(country: str, regions=(), postal_code: str = '', weight=0) -> [None, dict]:
+    """Стоимость доставки по индексу тарифов процесса (см. TariffIndex.quote)"""
+    return TARIFF_INDEX.quote(country, regions, postal_code, weight)
+
+
+def invalidate_tariffs() -> None:
+    """Записывает новую версию тарифов (все процессы перестроят индекс) после фиксации транзакции"""
+    def bump():
+        cache.set(TARIFF_VERSION_KEY, uuid.uuid4().hex, None)  # Не incr: см. promotion/services.py
+        TARIFF_INDEX.expire()
+
+    transaction.on_commit(bump)
+
+
+def _current_version() -> str:
+    version = cache.get(TARIFF_VERSION_KEY)
+    if version is None:
+        # Ключа нет (вытеснен или кэш очищен). Новая версия не совпадает ни с одной прежней,
+        # поэтому все процессы перестроят индекс
+        cache.add(TARIFF_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(TARIFF_VERSION_KEY)
+    return version
+
+
+def _load_countries() -> dict:
+    """Построение индекса по всем активным тарифам (один запрос)"""
+    countries = {}
+    tariffs = DeliveryTariff.objects.filter(is_active=True).values_list(
+        'id', 'country', 'region', 'postal_prefix', 'max_weight', 'base_price', 'price_per_kg')
+    for tariff_id, country, region, postal_prefix, max_weight, base_price, price_per_kg in tariffs:
+        entry = countries.setdefault(_normalize(country), _Country())
+        postal_prefix = _normalize_postal_code(postal_prefix)
+        if postal_prefix:
+            node = entry.postal
+            for digit in postal_prefix:
+                node = node.children.setdefault(digit, _TrieNode())
+            bands = node.bands = node.bands or _Bands()
+        elif region:
+            bands = entry.regions.setdefault(_normalize(region), _Bands())
+        else:
+            bands = entry.bands = entry.bands or _Bands()
+        bands.add(max_weight, (tariff_id, base_price, price_per_kg))
+    return countries
+
+
+def _normalize(value: str) -> str:
+    return ' '.join((value or '').split()).casefold()
+
+
+def _normalize_postal_code(value: str) -> str:
+    return ''.join((value or '').split()).upper()
+
+
+TARIFF_INDEX = TariffIndex()
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import DeliveryTariff
+from .services import invalidate_tariffs
+
+
+@receiver(post_save, sender=DeliveryTariff)
+@receiver(post_delete, sender=DeliveryTariff)
+def reset_tariff_index(sender, instance, **kwargs):
+    """Новая версия индекса тарифов при изменении тарифа"""
+    invalidate_tariffs()
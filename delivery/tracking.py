@@ -0,0 +1,174 @@
+"""
+Загрузка статусов доставки от перевозчика (Delivery.delivery_status, estimated_delivery_date).
+
+События - строки JSON (JSONL) вида
+{"tracking_number": "RA123", "status": "shipped", "timestamp": "2024-01-02T10:00:00+03:00",
+ "estimated_delivery_date": "2024-01-05"}
+(timestamp и estimated_delivery_date необязательны, статус - код перевозчика или значение из Delivery).
+
+События обрабатываются пакетами по chunk_size строк:
+1. в пакете для каждого трек-номера остаётся одно, самое позднее событие (по timestamp, затем по порядку в файле);
+2. доставки пакета читаются одним запросом (индекс по tracking_number);
+3. статус не откатывается назад (например, "Отправлено" после "Доставлено" - устаревшее событие);
+4. изменённые доставки записываются в одной транзакции на пакет: доставки с одинаковыми новыми
+   значениями (статус, дата) обновляются одним UPDATE ... WHERE id IN (...). Статусов всего три,
+   поэтому на пакет выполняется несколько запросов, а bulk_update строил бы CASE по каждой строке
+   (его построение и выполнение на порядок медленнее).
+После каждого пакета в файл смещения записывается позиция (в байтах) первой необработанной строки,
+поэтому прерванную загрузку можно продолжить с того же места, а повторная загрузка уже
+обработанного файла ничего не делает.
+"""
+
+import json
+import os
+from datetime import date, datetime
+from time import perf_counter
+from django.db import transaction
+from .models import Delivery
+
+TRACKING_CHUNK_SIZE = 5000  # Сколько строк событий обрабатывается за одну транзакцию
+
+# Статусы перевозчика -> статусы доставки (значения из Delivery.delivery_status тоже допустимы)
+TRACKING_STATUSES = {
+    'pending': 'В ожидании',
+    'accepted': 'В ожидании',
+    'shipped': 'Отправлено',
+    'in_transit': 'Отправлено',
+    'out_for_delivery': 'Отправлено',
+    'delivered': 'Доставлено',
+    'В ожидании': 'В ожидании',
+    'Отправлено': 'Отправлено',
+    'Доставлено': 'Доставлено',
+}
+# Порядок статусов: статус доставки меняется только вперёд
+STATUS_RANK = {'В ожидании': 0, 'Отправлено': 1, 'Доставлено': 2}
+
+
+def ingest_tracking_file(path: str, offset_path: [None, str] = None, chunk_size: int = TRACKING_CHUNK_SIZE,
+                         progress=None) -> dict:
+    """
+    Загрузка событий из JSONL файла начиная с сохранённого смещения.
+
+    :param path: Путь до файла событий.
+    :param offset_path: [Опционально] Файл смещения (по умолчанию - path + '.offset').
+    :param chunk_size: Размер пакета.
+    :param progress: [Опционально] Функция, которая вызывается со статистикой после каждого пакета.
+    :return: {'lines': прочитано строк, 'events': событий после удаления повторов, 'updated': изменено доставок,
+    'skipped': устаревших событий и событий без доставки, 'invalid': некорректных строк,
+    'offset': смещение после загрузки, 'seconds': время загрузки, 'rows_per_second': строк в секунду}
+    """
+    offset_path = offset_path or path + '.offset'
+    offset = read_offset(offset_path)
+    stats = {'lines': 0, 'events': 0, 'updated': 0, 'skipped': 0, 'invalid': 0}
+    started = perf_counter()
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        while True:
+            lines, offset = _read_chunk(file, chunk_size)
+            if not lines:
+                break
+            events, invalid = parse_events(lines)
+            updated, skipped = apply_events(events)
+            write_offset(offset_path, offset)  # Только после фиксации транзакции пакета
+            stats['lines'] += len(lines)
+            stats['events'] += len(events)
+            stats['updated'] += updated
+            stats['skipped'] += skipped
+            stats['invalid'] += invalid
+            if progress is not None:
+                progress(dict(stats, offset=offset))
+    seconds = perf_counter() - started
+    return dict(stats, offset=offset, seconds=seconds, rows_per_second=stats['lines'] / seconds if seconds else 0)
+
+
+def parse_events(lines) -> tuple:
+    """
+    Разбор строк событий и удаление повторов: для каждого трек-номера остаётся самое позднее событие.
+
+    :param lines: Строки JSONL (bytes или str).
+    :return: ({трек-номер: (статус доставки, estimated_delivery_date или None)}, число некорректных строк)
+    """
+    latest = {}  # трек-номер -> (timestamp, номер строки, статус, дата)
+    invalid = 0
+    for number, line in enumerate(lines):
+        try:
+            event = json.loads(line)
+            tracking_number = str(event['tracking_number'])
+            status = TRACKING_STATUSES[event['status']]
+            timestamp = event.get('timestamp')
+            timestamp = datetime.fromisoformat(timestamp).timestamp() if timestamp else float('-inf')
+            estimated = event.get('estimated_delivery_date')
+            estimated = date.fromisoformat(estimated) if estimated else None
+        except (ValueError, KeyError, TypeError):
+            invalid += 1
+            continue
+        key = (timestamp, number)
+        current = latest.get(tracking_number)
+        if current is None or key > current[0]:
+            latest[tracking_number] = (key, status, estimated)
+    return {tracking_number: (status, estimated) for tracking_number, (_, status, estimated) in latest.items()}, invalid
+
+
+def apply_events(events: dict) -> tuple:
+    """
+    Применение событий (см. parse_events) к доставкам: один запрос на чтение и по одному UPDATE
+    на каждое сочетание новых значений (статус, дата) в одной транзакции.
+
+    :return: (число изменённых доставок, число пропущенных событий)
+    """
+    if not events:
+        return 0, 0
+    with transaction.atomic():
+        deliveries = Delivery.objects.filter(tracking_number__in=events).values_list(
+            'id', 'tracking_number', 'delivery_status', 'estimated_delivery_date')
+        changed = {}  # (статус, дата) -> id доставок
+        applied = set()
+        for delivery_id, tracking_number, current_status, current_estimated in deliveries:
+            status, estimated = events[tracking_number]
+            if STATUS_RANK[status] < STATUS_RANK.get(current_status, -1):
+                continue  # Устаревшее событие
+            applied.add(tracking_number)
+            estimated = estimated or current_estimated
+            if (status, estimated) != (current_status, current_estimated):
+                changed.setdefault((status, estimated), []).append(delivery_id)
+        for (status, estimated), delivery_ids in changed.items():
+            Delivery.objects.filter(id__in=delivery_ids).update(delivery_status=status,
+                                                                 estimated_delivery_date=estimated)
+    return sum(map(len, changed.values())), len(events) - len(applied)
+
+
+def read_offset(offset_path: str) -> int:
+    """Сохранённое смещение (0, если загрузка ещё не выполнялась)"""
+    try:
+        with open(offset_path, encoding='utf-8') as file:
+            return int(file.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_offset(offset_path: str, offset: int) -> None:
+    """Атомарная запись смещения (через временный файл), чтобы сбой не оставил файл пустым"""
+    temp_path = offset_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(str(offset))
+    os.replace(temp_path, offset_path)
+
+
+def _read_chunk(file, chunk_size: int) -> tuple:
+    """
+    До chunk_size полных строк с текущей позиции файла (пустые строки пропускаются).
+    Незаконченная последняя строка (файл ещё дописывается) не читается.
+
+    :return: (строки, смещение после последней прочитанной строки)
+    """
+    lines = []
+    offset = file.tell()
+    while len(lines) < chunk_size:
+        line = file.readline()
+        if not line.endswith(b'\n'):
+            break
+        offset += len(line)
+        if line.strip():
+            lines.append(line)
+    file.seek(offset)
+    return lines, offset
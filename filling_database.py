@@ -9,6 +9,11 @@ python manage.py shell
 В случае вызова консоли (python manage.py shell), то так же как и в
 приведенном блоке (if __name__ == "__main__":) необходимо
 импортировать модели с которыми будете работать и далее выполнять команды с БД.
+
+Скрипт показывает разные способы создания записей и создаёт небольшой набор данных.
+Для больших объёмов (например, 1 000 000 продуктов и 100 000 пользователей) используйте
+команду python manage.py seed_database --scale 100 (store/seeding.py): пакетная запись
+через bulk_create и хэширование паролей в пуле процессов.
 """
 
 import django
@@ -0,0 +1,223 @@
+"""
+Индекс каталога для быстрой фильтрации и сортировки товаров (см. filtering_category).
+
+Товары раскладываются по корзинам категорий (bucket). Для каждой категории (и для
+всего каталога) хранится список товаров в исходном порядке и отсортированные списки
+по ключам сортировки. Запрос "категория + сортировка" превращается в выдачу готового
+списка длиной k (число товаров в категории) без перебора всего каталога и без сортировки.
+
+Отсортированный список по ключу строится при первом запросе по этому ключу, дальше
+поддерживается инкрементально (bisect) при добавлении, изменении и удалении товаров.
+Индекс хранит копию значений каждого товара на момент индексации, поэтому товар можно
+изменить на месте (DATABASE[id]['price'] = 0) и затем вызвать update - старая запись
+будет найдена по прежним значениям.
+"""
+
+from bisect import bisect_left, insort
+from itertools import count
+from numbers import Number
+from operator import itemgetter
+
+_product = itemgetter(2)
+
+
+class CatalogIndex:
+    """
+    Индекс над словарём товаров вида {id: {'category': ..., 'price_after': ..., ...}}.
+
+    Результаты запросов совпадают с результатами filtering_category (в том числе порядок
+    товаров с одинаковым значением ключа сортировки, как у устойчивой сортировки).
+
+    Изменять каталог нужно через add/update/remove индекса - они меняют и сам словарь,
+    и индекс, поэтому индекс не нужно перестраивать целиком.
+    """
+
+    def __init__(self, database: dict):
+        self.database = database
+        self._seq = {}  # id товара -> порядковый номер (порядок товаров в словаре)
+        self._counter = count()
+        self._buckets = {None: _Bucket()}  # None - все товары, остальные ключи - категории
+        self._unsortable = set()  # Ключи, по которым значения нельзя сравнить между собой
+        self._value_types = {}  # Ключ -> тип значений (число или строка)
+        for product_id, product in database.items():
+            self._insert(product_id, product)
+
+    def query(self,
+              category_key: [None, str] = None,
+              ordering_key: [None, str] = None,
+              reverse: bool = False,
+              ) -> list:
+        """
+        Аналог filtering_category.
+
+        :param category_key: [Опционально] Категория. Если нет, то рассматриваются все товары.
+        :param ordering_key: [Опционально] Ключ сортировки.
+        :param reverse: [Опционально] Сортировка по убыванию.
+        :return: list[dict] список товаров.
+        """
+        bucket = self._buckets.get(category_key)
+        if bucket is None:
+            return []
+        if ordering_key is None:
+            return [product for _, product in bucket.items]
+        if ordering_key in self._unsortable:
+            # Значения нельзя сравнить (например, есть None), ведём себя как обычная сортировка
+            return sorted((product for _, product in bucket.items),
+                          key=lambda x: x[ordering_key], reverse=reverse)
+
+        entries = bucket.ordering(ordering_key, reverse)
+        if not reverse:
+            return list(map(_product, entries))
+        return list(map(_product, reversed(entries)))
+
+    def iterate(self,
+                category_key: [None, str] = None,
+                ordering_key: [None, str] = None,
+                reverse: bool = False,
+                after: [None, tuple] = None,
+                ):
+        """
+        Ленивый обход того же результата, что и query, для постраничной выдачи.
+
+        :param category_key: [Опционально] Категория.
+        :param ordering_key: [Опционально] Ключ сортировки.
+        :param reverse: [Опционально] Сортировка по убыванию.
+        :param after: [Опционально] Позиция (курсор), после которой начинать обход.
+        :return: Итератор пар (позиция, товар). Позицию последнего выданного товара можно
+        передать в after, чтобы продолжить со следующего товара. Начало обхода с позиции
+        стоит O(log n) и не зависит от того, насколько далеко она от начала списка.
+        :raises ValueError: Позиция after не подходит для такой сортировки.
+        """
+        bucket = self._buckets.get(category_key)
+        if bucket is None:
+            return iter(())
+        # Позиция - (seq,) без сортировки и для несортируемого ключа, иначе (значение, seq)
+        if after is not None and len(after) != (1 if ordering_key is None or ordering_key in self._unsortable else 2):
+            raise ValueError(f"Позиция {after!r} не подходит для сортировки {ordering_key!r}")
+
+        if ordering_key is None:
+            entries = bucket.items  # [(seq, product)]
+            start = 0 if after is None else bisect_left(entries, (after[0] + 1,))
+            return ((entry[:1], entry[1]) for entry in map(entries.__getitem__, range(start, len(entries))))
+
+        if ordering_key in self._unsortable:
+            # Отсортированного списка нет, позиция - номер товара в результате
+            result = self.query(category_key, ordering_key, reverse)
+            start = 0 if after is None else after[0] + 1
+            return (((position,), result[position]) for position in range(start, len(result)))
+
+        entries = bucket.ordering(ordering_key, reverse)  # [(value, ±seq, product)]
+        if not reverse:
+            start = 0 if after is None else bisect_left(entries, (after[0], after[1] + 1))
+            positions = range(start, len(entries))
+        else:
+            start = len(entries) if after is None else bisect_left(entries, tuple(after))
+            positions = range(start - 1, -1, -1)
+        return ((entry[:2], entry[2]) for entry in map(entries.__getitem__, positions))
+
+    def add(self, product_id: str, product: dict) -> None:
+        """Добавляет новый товар в каталог и индекс"""
+        if product_id in self.database:
+            self.update(product_id, product)
+            return
+        self.database[product_id] = product
+        self._insert(product_id, product)
+
+    def update(self, product_id: str, product: dict) -> None:
+        """Изменяет товар (позиция товара в порядке каталога сохраняется, как у словаря)"""
+        if product_id not in self.database:
+            self.add(product_id, product)
+            return
+        seq = self._seq[product_id]
+        self._delete(product_id)
+        self.database[product_id] = product
+        self._insert(product_id, product, seq)
+
+    def remove(self, product_id: str) -> None:
+        """Удаляет товар из каталога и индекса"""
+        if product_id in self.database:
+            self._delete(product_id)
+            del self.database[product_id]
+            del self._seq[product_id]
+
+    def _insert(self, product_id: str, product: dict, seq: [None, int] = None) -> None:
+        if seq is None:
+            seq = next(self._counter)
+        self._seq[product_id] = seq
+        self._check_sortable(product)
+        for bucket_key in (None, product['category']):
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = _Bucket()
+            bucket.insert(seq, product)
+
+    def _delete(self, product_id: str) -> None:
+        # Категория и значения берутся из копии на момент индексации, а не из (возможно,
+        # уже изменённого на месте) товара
+        seq = self._seq[product_id]
+        for bucket_key in (None, self._buckets[None].indexed[seq]['category']):
+            bucket = self._buckets[bucket_key]
+            bucket.delete(seq)
+            if bucket_key is not None and not bucket.items:
+                del self._buckets[bucket_key]
+
+    def _check_sortable(self, product: dict) -> None:
+        """Ключи со значениями разных типов (или None) исключаются из индекса сортировки"""
+        missing = self._value_types.keys() - product.keys() - self._unsortable
+        for key in missing:  # Ключа нет у части товаров - отсортировать по нему нельзя
+            self._mark_unsortable(key)
+        for key, value in product.items():
+            if key in self._unsortable:
+                continue
+            if key not in self._value_types and len(self._seq) > 1:
+                # Новый ключ, которого нет у ранее добавленных товаров
+                self._mark_unsortable(key)
+                continue
+            if isinstance(value, bool) or not isinstance(value, (Number, str)):
+                value_type = None
+            else:
+                value_type = str if isinstance(value, str) else Number
+            known_type = self._value_types.setdefault(key, value_type)
+            if value_type is None or value_type is not known_type:
+                self._mark_unsortable(key)
+
+    def _mark_unsortable(self, key: str) -> None:
+        self._unsortable.add(key)
+        for bucket in self._buckets.values():
+            bucket.orderings.pop((key, False), None)
+            bucket.orderings.pop((key, True), None)
+
+
+class _Bucket:
+    """Товары одной категории: исходный порядок и отсортированные списки по ключам"""
+
+    def __init__(self):
+        self.items = []  # [(seq, product)] по возрастанию seq
+        self.indexed = {}  # seq -> копия товара на момент индексации (по ней строятся и ищутся записи)
+        # (ключ, reverse) -> [(value, ±seq, product)] по возрастанию.
+        # Для убывания хранится -seq, тогда при обходе списка с конца товары с равным
+        # значением идут в исходном порядке, как при list.sort(reverse=True)
+        self.orderings = {}
+
+    def ordering(self, key: str, reverse: bool) -> list:
+        """Отсортированный по ключу список (строится при первом обращении)"""
+        entries = self.orderings.get((key, reverse))
+        if entries is None:
+            sign = -1 if reverse else 1
+            entries = self.orderings[(key, reverse)] = sorted(
+                (self.indexed[seq][key], sign * seq, product) for seq, product in self.items
+            )
+        return entries
+
+    def insert(self, seq: int, product: dict) -> None:
+        # Сравнение кортежей не доходит до словаря товара, так как seq уникален
+        insort(self.items, (seq, product))
+        self.indexed[seq] = dict(product)
+        for (key, reverse), entries in self.orderings.items():
+            insort(entries, (product[key], -seq if reverse else seq, product))
+
+    def delete(self, seq: int) -> None:
+        del self.items[bisect_left(self.items, (seq,))]
+        indexed = self.indexed.pop(seq)
+        for (key, reverse), entries in self.orderings.items():
+            del entries[bisect_left(entries, (indexed[key], -seq if reverse else seq))]
@@ -0,0 +1,130 @@
+"""
+Бюджет SQL запросов для представлений.
+
+Декоратор query_budget объявляет, сколько запросов к БД может выполнить представление.
+Если представление выходит за бюджет (например, из-за N+1 запросов в шаблоне), то:
+- при QUERY_BUDGET_STRICT = True (по умолчанию равно DEBUG) выбрасывается QueryBudgetExceeded;
+- иначе в лог пишется предупреждение со списком выполненных запросов.
+
+Для тестов есть контекстный менеджер assert_max_queries и функция assert_view_within_budget.
+"""
+
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL запросов, чем объявлено в его бюджете"""
+
+
+class QueryCounter:
+    """Обёртка выполнения запросов (connection.execute_wrapper), которая запоминает выполненные запросы"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+
+@contextmanager
+def count_queries(using: str = DEFAULT_DB_ALIAS):
+    """
+    Подсчёт SQL запросов внутри блока with.
+
+    :param using: Псевдоним БД.
+    :return: QueryCounter со списком выполненных запросов.
+    """
+    counter = QueryCounter()
+    with connections[using].execute_wrapper(counter):
+        yield counter
+
+
+def query_budget(max_queries: int, using: str = DEFAULT_DB_ALIAS):
+    """
+    Декоратор представления с бюджетом SQL запросов.
+
+    :param max_queries: Максимальное число запросов за один вызов представления (включая отрисовку шаблона).
+    :param using: Псевдоним БД.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            _load_user(request)
+            with count_queries(using) as counter:
+                response = view_func(request, *args, **kwargs)
+                # Отложенная отрисовка (TemplateResponse) тоже должна попасть в бюджет
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+            if len(counter) > max_queries:
+                message = _budget_message(view_func.__qualname__, max_queries, counter)
+                if getattr(settings, 'QUERY_BUDGET_STRICT', settings.DEBUG):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+
+        wrapper.query_budget = max_queries  # Объявленный бюджет доступен тестам
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, using: str = DEFAULT_DB_ALIAS):
+    """
+    Тестовый помощник: падает с AssertionError, если внутри блока выполнено больше max_queries запросов.
+
+    Пример:
+        with assert_max_queries(2):
+            self.client.get('/cart/')
+    """
+    with count_queries(using) as counter:
+        yield counter
+    if len(counter) > max_queries:
+        raise AssertionError(_budget_message('блок', max_queries, counter))
+
+
+def assert_view_within_budget(client, url: str, view_func):
+    """
+    Тестовый помощник: запрашивает url тестовым клиентом и проверяет, что представление
+    уложилось в бюджет, объявленный декоратором query_budget. Запросы промежуточных слоёв
+    (сессия, пользователь) не учитываются - считаются только запросы самого представления.
+
+    :param client: django.test.Client (при необходимости уже авторизованный).
+    :param url: Адрес страницы.
+    :param view_func: Представление, обёрнутое query_budget.
+    :return: Ответ представления.
+    """
+    from django.test.utils import override_settings
+
+    if getattr(view_func, 'query_budget', None) is None:
+        raise AssertionError(f"У представления {view_func.__qualname__} не объявлен бюджет запросов")
+    try:
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            return client.get(url)
+    except QueryBudgetExceeded as error:
+        raise AssertionError(str(error)) from None
+
+
+def _load_user(request) -> None:
+    """
+    Загрузка пользователя из сессии (request.user ленивый). Эти запросы выполняются
+    промежуточным слоем на любой странице, поэтому в бюджет представления не входят.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None:
+        user.is_authenticated  # noqa: B018 - обращение к атрибуту загружает ленивый объект
+
+
+def _budget_message(name: str, max_queries: int, counter: QueryCounter) -> str:
+    queries = '\n'.join(f"  {number}. {sql}" for number, sql in enumerate(counter.queries, 1))
+    return f"{name}: выполнено {len(counter)} SQL запросов при бюджете {max_queries}\n{queries}"
@@ -1,7 +1,18 @@
-import json
-import os
 from store.models import DATABASE
 from django.contrib.auth import get_user
+from logic.storage import ShardedJsonStorage, CachedStorage
+from logic.catalog import CatalogIndex
+
+# Хранилище корзин: у каждого пользователя свой файл в папке storage/cart.
+# Данные из старого общего файла cart.json переносятся при первом обращении.
+# Поверх файлов работает кэш в памяти процесса с отложенной записью (см. CachedStorage),
+# его метрики доступны через CART_STORAGE.stats().
+# Для замены хранилища достаточно присвоить CART_STORAGE другой объект BaseStorage.
+CART_STORAGE = CachedStorage(ShardedJsonStorage('storage/cart', legacy_file='cart.json'))
+
+# Индекс каталога DATABASE для filtering_category. Строится один раз при импорте модуля.
+# Изменять DATABASE нужно через CATALOG_INDEX.add/update/remove, тогда индекс обновляется инкрементально.
+CATALOG_INDEX = CatalogIndex(DATABASE)
 
 
 def filtering_category(database: dict,
@@ -21,6 +32,10 @@ def filtering_category(database: dict,
     :return: list[dict] список товаров с их характеристиками, попавших под условия фильтрации. Если нет таких элементов,
     то возвращается пустой список.
     """
+    if database is CATALOG_INDEX.database:
+        # Для основного каталога используем заранее построенный индекс
+        return CATALOG_INDEX.query(category_key, ordering_key, reverse)
+
     if category_key is not None:
         result = [value for value in database.values() if value['category'] == category_key]
     else:
@@ -32,20 +47,17 @@ def filtering_category(database: dict,
 
 def view_in_cart(request) -> dict:
     """
-    Просматривает содержимое cart.json
+    Просматривает содержимое корзины текущего пользователя.
+    Читается только шард этого пользователя, а не корзины всех пользователей.
 
-    :return: Содержимое 'cart.json'
+    :return: Словарь вида {username: {'products': {...}}}. Если корзины ещё нет, то в нём пустая корзина.
     """
-    if os.path.exists('cart.json'):  # Если файл существует
-        with open('cart.json', encoding='utf-8') as f:
-            return json.load(f)
-
     user = get_user(request).username  # Получаем авторизированного пользователя
-    cart = {user: {'products': {}}}  # Создаём пустую корзину
-    with open('cart.json', mode='x', encoding='utf-8') as f:   # Создаём файл и записываем туда пустую корзину
-        json.dump(cart, f)
+    cart = CART_STORAGE.load(user)
+    if cart is None:  # Если корзины ещё нет, то возвращаем пустую корзину
+        cart = _empty_cart()
 
-    return cart
+    return {user: cart}
 
 
 def add_to_cart(request, id_product: str) -> bool:
@@ -57,22 +69,17 @@ def add_to_cart(request, id_product: str) -> bool:
     :return: Возвращает True в случае успешного добавления, а False в случае неуспешного добавления(товара по id_product
     не существует).
     """
-    cart_users = view_in_cart(request)
-    cart = cart_users[get_user(request).username]
-
-    if id_product not in cart['products']:
-        if not DATABASE.get(id_product):
-            return False
-        cart['products'][id_product] = 1
-    else:
-        cart['products'][id_product] += 1
-    # Если товар существует, то увеличиваем его количество на 1
+    if not DATABASE.get(id_product):
+        return False
 
-    # Не забываем записать обновленные данные cart в 'cart.json'
-    with open('cart.json', mode='w', encoding='utf-8') as f:
-        json.dump(cart_users, f)
+    def add(cart):
+        # Если товар существует, то увеличиваем его количество на 1, иначе добавляем с количеством 1
+        cart['products'][id_product] = cart['products'].get(id_product, 0) + 1
+        return True
 
-    return True
+    # Изменение выполняется хранилищем атомарно, поэтому параллельные запросы
+    # (в том числе из других воркеров) не перезаписывают изменения друг друга
+    return CART_STORAGE.update(get_user(request).username, add, default=_empty_cart)
 
 
 def remove_from_cart(request, id_product: str) -> bool:
@@ -84,19 +91,11 @@ def remove_from_cart(request, id_product: str) -> bool:
     :return: Возвращает True в случае успешного удаления, а False в случае неуспешного удаления(товара по id_product
     не существует).
     """
-    cart_users = view_in_cart(request)
-    cart = cart_users[get_user(request).username]
+    def remove(cart):
+        # Если существует, то удаляем ключ 'id_product' у cart['products'].
+        return cart['products'].pop(id_product, None) is not None
 
-    if id_product not in cart['products']:
-        return False
-
-    cart['products'].pop(id_product)  # Если существует, то удаляем ключ 'id_product' у cart['products'].
-
-    # Не забываем записать обновленные данные cart в 'cart.json'
-    with open('cart.json', mode='w', encoding='utf-8') as f:
-        json.dump(cart_users, f)
-
-    return True
+    return CART_STORAGE.update(get_user(request).username, remove, default=_empty_cart)
 
 
 def add_user_to_cart(request, username: str) -> None:
@@ -106,99 +105,12 @@ def add_user_to_cart(request, username: str) -> None:
     :param username: Имя пользователя
     :return: None
     """
-    cart_users = view_in_cart(request)
-
-    cart = cart_users.get(username)
-
-    if not cart:
-        with open('cart.json', mode='w', encoding='utf-8') as f:
-            cart_users[username] = {'products': {}}
-            json.dump(cart_users, f)
-
-
-def view_in_wishlist(request) -> dict:
-    """
-    Просматривает содержимое wishlist.json
-
-    :return: Содержимое 'wishlist.json'
-    """
-    if os.path.exists('wishlist.json'):  # Если файл существует
-        with open('wishlist.json', encoding='utf-8') as f:
-            return json.load(f)
-
-    user = get_user(request).username
-    wishlist = {user: {'products': []}}  # Создаём пустую корзину
-    with open('wishlist.json', mode='x', encoding='utf-8') as f:   # Создаём файл и записываем туда пустую корзину
-        json.dump(wishlist, f)
-
-    return wishlist
-
-
-def add_to_wishlist(request, id_product: str) -> bool:
-    """
-    Добавляет продукт в корзину. Если в корзине нет данного продукта, то добавляет его с количеством равное 1.
-    Если в корзине есть такой продукт, то добавляет количеству данного продукта + 1.
-
-    :param id_product: Идентификационный номер продукта в виде строки.
-    :return: Возвращает True в случае успешного добавления, а False в случае неуспешного добавления(товара по id_product
-    не существует).
-    """
-    wishlist_users = view_in_wishlist(request)
-    wishlist = wishlist_users[get_user(request).username]
-
-    if id_product not in wishlist['products']:
-        if not DATABASE.get(id_product):
-            return False
-        wishlist['products'].append(id_product)
-    else:
-        return False
-
-    # Не забываем записать обновленные данные cart в 'cart.json'
-    with open('wishlist.json', mode='w', encoding='utf-8') as f:
-        json.dump(wishlist_users, f)
-
-    return True
-
-
-def remove_from_wishlist(request, id_product: str) -> bool:
-    """
-    Удаляем позицию продукта из корзины. Если в корзине есть такой продукт, то удаляется ключ в словаре
-    с этим продуктом.
-
-    :param id_product: Идентификационный номер продукта в виде строки.
-    :return: Возвращает True в случае успешного удаления, а False в случае неуспешного удаления(товара по id_product
-    не существует).
-    """
-    wishlist_users = view_in_wishlist(request)
-    wishlist = wishlist_users[get_user(request).username]
-
-    if id_product not in wishlist['products']:
-        return False
-
-    wishlist['products'].remove(id_product)  # Если существует, то удаляем ключ 'id_product' у cart['products'].
-
-    # Не забываем записать обновленные данные cart в 'cart.json'
-    with open('wishlist.json', mode='w', encoding='utf-8') as f:
-        json.dump(wishlist_users, f)
-
-    return True
-
-
-def add_user_to_wishlist(request, username: str) -> None:
-    """
-    Добавляет пользователя в базу данных избранное, если его там не было.
-
-    :param username: Имя пользователя
-    :return: None
-    """
-    wishlist_users = view_in_wishlist(request)
+    if CART_STORAGE.load(username) is None:
+        CART_STORAGE.update(username, lambda cart: True, default=_empty_cart)
 
-    wishlist = wishlist_users.get(username)
 
-    if not wishlist:
-        with open('wishlist.json', mode='w', encoding='utf-8') as f:
-            wishlist_users[username] = {'products': []}
-            json.dump(wishlist_users, f)
+def _empty_cart() -> dict:
+    return {'products': {}}
 
 
 if __name__ == "__main__":
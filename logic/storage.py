@@ -0,0 +1,458 @@
+"""
+Хранилища данных корзины и избранного.
+
+Каждая запись (корзина или избранное одного пользователя) хранится отдельно от
+остальных, поэтому изменение данных одного пользователя не требует чтения и
+перезаписи данных всех остальных пользователей.
+"""
+
+import atexit
+import copy
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from urllib.parse import quote
+
+
+class StorageLockTimeout(Exception):
+    """Не удалось захватить блокировку записи за отведённое время"""
+
+
+class BaseStorage:
+    """Базовый интерфейс хранилища. Ключ - имя пользователя, значение - словарь с его данными"""
+
+    def load(self, key: str) -> [None, dict]:
+        """
+        Возвращает данные по ключу.
+
+        :param key: Ключ записи (имя пользователя).
+        :return: Словарь с данными или None, если записи нет.
+        """
+        raise NotImplementedError
+
+    def save(self, key: str, data: dict) -> None:
+        """
+        Записывает данные по ключу.
+
+        :param key: Ключ записи (имя пользователя).
+        :param data: Данные для записи.
+        :return: None
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """
+        Удаляет запись по ключу, если она существует.
+
+        :param key: Ключ записи (имя пользователя).
+        :return: None
+        """
+        raise NotImplementedError
+
+    def lock(self, key: str):
+        """
+        Контекстный менеджер блокировки записи на время цикла чтение-изменение-запись.
+        По умолчанию блокировка не нужна (например, если хранилище само атомарно).
+
+        :param key: Ключ записи (имя пользователя).
+        """
+        return nullcontext()
+
+    def version(self, key: str):
+        """
+        Версия записи - значение, которое меняется при каждой записи (в том числе другим процессом).
+        Используется кэшем для проверки актуальности. None - запись отсутствует.
+
+        :param key: Ключ записи (имя пользователя).
+        """
+        raise NotImplementedError
+
+    def update(self, key: str, func, default) -> bool:
+        """
+        Атомарный цикл чтение-изменение-запись.
+
+        :param key: Ключ записи (имя пользователя).
+        :param func: Функция, изменяющая данные на месте. Возвращает True, если данные изменились.
+        :param default: Функция, создающая данные по умолчанию, если записи ещё нет.
+        :return: Результат func.
+        """
+        with self.lock(key):
+            data = self.load(key)
+            if data is None:
+                data = default()
+            changed = func(data)
+            if changed:
+                self.save(key, data)
+        return changed
+
+
+class ShardedJsonStorage(BaseStorage):
+    """
+    Хранилище, в котором данные каждого пользователя лежат в отдельном JSON файле
+    (шарде) внутри папки directory.
+
+    Если передан legacy_file (старый общий файл вида {username: data}), то при первом
+    обращении к пользователю, у которого ещё нет своего шарда, его данные переносятся
+    из общего файла.
+
+    Запись атомарна: данные пишутся во временный файл и затем переименовываются поверх
+    шарда, поэтому читатель никогда не увидит обрезанный файл. Для защиты от потерянных
+    обновлений между процессами (несколько воркеров gunicorn) используется lock(key) -
+    файл блокировки, создаваемый с O_EXCL, с повторными попытками и экспоненциальной
+    задержкой. В файл записывается уникальное значение владельца, и при выходе файл удаляется,
+    только если значение совпадает. Такой способ работает одинаково на Linux и Windows.
+    """
+
+    def __init__(self, directory: str, legacy_file: [None, str] = None,
+                 lock_timeout: float = 10.0,
+                 stale_lock_timeout: float = 30.0):
+        self.directory = directory
+        self.legacy_file = legacy_file
+        self.lock_timeout = lock_timeout  # Сколько секунд ждать блокировку
+        self.stale_lock_timeout = stale_lock_timeout  # Через сколько секунд блокировка считается брошенной
+
+    def path(self, key: str) -> str:
+        """Путь до файла шарда. Имя пользователя экранируется, чтобы получить корректное имя файла"""
+        return os.path.join(self.directory, f"{quote(key, safe='')}.json")
+
+    def load(self, key: str) -> [None, dict]:
+        try:
+            with open(self.path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self._load_legacy(key)
+
+    def save(self, key: str, data: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Пишем во временный файл в той же папке, чтобы os.replace был атомарным
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode='w', encoding='utf-8') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            self._retry(os.replace, tmp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def version(self, key: str):
+        # os.replace при каждой записи создаёт новый файл, поэтому inode (на Windows - номер файла)
+        # вместе с mtime и размером надёжно определяют, менялся ли шард
+        try:
+            stat = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def lock(self, key: str):
+        os.makedirs(self.directory, exist_ok=True)
+        lock_path = self.path(key) + '.lock'
+        token = uuid.uuid4().hex  # Владелец блокировки: снимается только блокировка с этим значением
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.001
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                self._remove_stale_lock(lock_path)
+                if time.monotonic() > deadline:
+                    raise StorageLockTimeout(f"Не удалось заблокировать {lock_path!r}")
+                time.sleep(delay * (1 + random.random()))  # Задержка со случайным разбросом
+                delay = min(delay * 2, 0.1)  # Экспоненциальное увеличение задержки
+        try:
+            with os.fdopen(fd, mode='w', encoding='ascii') as f:
+                f.write(token)
+            yield
+        finally:
+            self._release_lock(lock_path, token)
+
+    def _release_lock(self, lock_path: str, token: str) -> None:
+        """
+        Снимает блокировку, только если она всё ещё наша. Если блокировку сочли брошенной
+        и её захватил другой процесс, то его блокировка не удаляется.
+        """
+        try:
+            with open(lock_path, encoding='ascii') as f:
+                owned = f.read() == token
+            if owned:
+                os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_stale_lock(self, lock_path: str) -> None:
+        """
+        Удаляет блокировку, оставленную упавшим процессом.
+
+        Проверка возраста и удаление по одному имени не атомарны: между ними блокировку могут удалить
+        и тут же создать заново, и удалена была бы уже свежая блокировка. Поэтому файл сначала
+        атомарно переименовывается в уникальное имя (переименовать его сможет только один процесс),
+        и возраст проверяется у переименованного файла. Свежая блокировка возвращается на место
+        (os.link не перезаписывает блокировку, если её уже создали снова).
+        """
+        try:
+            if time.time() - os.path.getmtime(lock_path) <= self.stale_lock_timeout:
+                return
+            stale_path = f"{lock_path}.{uuid.uuid4().hex}.stale"
+            os.rename(lock_path, stale_path)
+        except (FileNotFoundError, PermissionError):
+            # Блокировку уже сняли или забрал другой процесс (на Windows файл может быть открыт)
+            return
+        try:
+            if time.time() - os.path.getmtime(stale_path) <= self.stale_lock_timeout:
+                try:
+                    os.link(stale_path, lock_path)
+                except FileExistsError:
+                    pass
+        finally:
+            os.remove(stale_path)
+
+    def _retry(self, func, *args, attempts: int = 10):
+        """
+        Повтор операции с файлом. На Windows os.replace падает с PermissionError,
+        если файл в этот момент открыт другим процессом на чтение.
+        """
+        delay = 0.001
+        for attempt in range(attempts):
+            try:
+                return func(*args)
+            except PermissionError:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(delay * (1 + random.random()))
+                delay = min(delay * 2, 0.1)
+
+    def _load_legacy(self, key: str) -> [None, dict]:
+        """Перенос данных пользователя из старого общего файла в отдельный шард"""
+        if self.legacy_file is None or not os.path.exists(self.legacy_file):
+            return None
+        with open(self.legacy_file, encoding='utf-8') as f:
+            data = json.load(f).get(key)
+        if data is not None:
+            self.save(key, data)
+        return data
+
+
+class CachedStorage(BaseStorage):
+    """
+    Кэш с отложенной записью (write-back) поверх другого хранилища.
+
+    Чтение обслуживается из памяти. Актуальность записи проверяется по version() не чаще,
+    чем раз в revalidate_after секунд, поэтому изменения из других воркеров подхватываются
+    с задержкой не больше revalidate_after (свои изменения видны сразу).
+    Изменения (update) применяются к данным в памяти и запоминаются как список функций.
+    Сброс на диск происходит, когда накопилось max_dirty изменённых записей, раз в
+    flush_interval секунд в фоновом потоке и при завершении процесса. Файлы пишутся без
+    удержания общей блокировки кэша, поэтому чтение не ждёт сброса.
+
+    Если к моменту сброса запись изменил другой процесс, то свежие данные перечитываются
+    и накопленные функции применяются к ним повторно, поэтому чужие изменения не теряются.
+    """
+
+    def __init__(self, storage: BaseStorage,
+                 flush_interval: float = 1.0,
+                 max_dirty: int = 50,
+                 revalidate_after: float = 0.5):
+        self.storage = storage
+        self.flush_interval = flush_interval  # Период фонового сброса, в секундах
+        self.max_dirty = max_dirty  # Число изменённых записей, при котором происходит сброс
+        self.revalidate_after = revalidate_after  # Как часто проверять версию записи, в секундах
+        self._entries = {}  # key -> _CacheEntry
+        self._dirty = set()  # Ключи с несброшенными изменениями
+        self._mutex = threading.RLock()  # Данные кэша. Не удерживается во время записи файлов
+        self._flush_lock = threading.Lock()  # Сброс выполняется одним потоком за раз
+        self._flusher = None
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'flushes': 0,
+                       'flushed_keys': 0, 'conflicts': 0,
+                       'flush_time_total': 0.0, 'flush_time_max': 0.0}
+        atexit.register(self.flush)
+
+    def load(self, key: str) -> [None, dict]:
+        with self._mutex:
+            entry = self._get_entry(key)
+            # Возвращаем копию, чтобы изменения снаружи не испортили кэш
+            return copy.deepcopy(entry.data)
+
+    def save(self, key: str, data: dict) -> None:
+        # Полная перезапись выполняется сразу (write-through). Порядок блокировок везде один:
+        # сначала блокировка записи в хранилище, затем блокировка кэша
+        with self.storage.lock(key):
+            self.storage.save(key, data)
+            version = self.storage.version(key)
+            with self._mutex:
+                self._entries[key] = _CacheEntry(copy.deepcopy(data), version)
+                self._dirty.discard(key)
+
+    def delete(self, key: str) -> None:
+        with self.storage.lock(key):
+            self.storage.delete(key)
+            with self._mutex:
+                self._entries.pop(key, None)
+                self._dirty.discard(key)
+
+    def version(self, key: str):
+        return self.storage.version(key)
+
+    def update(self, key: str, func, default) -> bool:
+        flush_now = False
+        with self._mutex:
+            entry = self._get_entry(key)
+            entry.default = default
+            if entry.data is None:
+                entry.data = default()
+            changed = func(entry.data)
+            if changed:
+                entry.pending.append(func)
+                self._dirty.add(key)
+                flush_now = len(self._dirty) >= self.max_dirty
+                if not flush_now:
+                    self._start_flusher()
+        if flush_now:
+            self.flush()  # После освобождения блокировки кэша
+        return changed
+
+    def flush(self) -> None:
+        """
+        Записывает все накопленные изменения в исходное хранилище.
+
+        Под блокировкой кэша берётся снимок изменённых записей (копия данных и список изменений),
+        файлы пишутся уже без неё. Изменения, сделанные во время записи, остаются в pending
+        и записываются следующим сбросом.
+        """
+        with self._flush_lock:
+            with self._mutex:
+                if not self._dirty:
+                    return
+                snapshot = []
+                for key in self._dirty:
+                    entry = self._entries[key]
+                    entry.flushing = True  # Пока идёт запись, версия записи в кэше не проверяется
+                    snapshot.append((key, entry, copy.deepcopy(entry.data), list(entry.pending), entry.version))
+            t1 = time.perf_counter()
+            try:
+                for key, entry, data, pending, version in snapshot:
+                    self._flush_entry(key, entry, data, pending, version)
+            finally:
+                with self._mutex:
+                    for _, entry, *_ in snapshot:
+                        entry.flushing = False
+            elapsed = time.perf_counter() - t1
+            with self._mutex:
+                self._stats['flushes'] += 1
+                self._stats['flush_time_total'] += elapsed
+                self._stats['flush_time_max'] = max(self._stats['flush_time_max'], elapsed)
+
+    def _flush_entry(self, key: str, entry: '_CacheEntry', data: dict, pending: list, version) -> None:
+        """Запись снимка одной записи кэша (data - копия данных с изменениями pending)"""
+        with self.storage.lock(key):
+            with self._mutex:
+                if self._entries.get(key) is not entry:
+                    return  # После снимка запись перезаписана (save) или удалена (delete)
+            conflict = self.storage.version(key) != version
+            if conflict:
+                # Запись изменил другой процесс: применяем наши изменения к свежим данным
+                data = self._replay(key, entry.default, pending)
+            self.storage.save(key, data)
+            new_version = self.storage.version(key)
+            with self._mutex:
+                del entry.pending[:len(pending)]
+                if conflict:
+                    # Данные в памяти - записанные данные и изменения, сделанные во время записи
+                    entry.data = copy.deepcopy(data)
+                    for func in entry.pending:
+                        func(entry.data)
+                    self._stats['conflicts'] += 1
+                entry.version = new_version
+                entry.checked_at = time.monotonic()
+                if not entry.pending:
+                    self._dirty.discard(key)
+                self._stats['flushed_keys'] += 1
+
+    def stats(self) -> dict:
+        """
+        Метрики кэша.
+
+        :return: Словарь с числом попаданий/промахов, долей попаданий (hit_rate), числом сбросов,
+        средним и максимальным временем сброса в секундах и т.д.
+        """
+        with self._mutex:
+            stats = dict(self._stats)
+            requests = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / requests if requests else 0.0
+            stats['flush_time_mean'] = stats['flush_time_total'] / stats['flushes'] if stats['flushes'] else 0.0
+            stats['dirty'] = len(self._dirty)
+            stats['cached'] = len(self._entries)
+            return stats
+
+    def _get_entry(self, key: str) -> '_CacheEntry':
+        """Запись кэша, проверенная на актуальность"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and (entry.flushing or now - entry.checked_at < self.revalidate_after):
+            self._stats['hits'] += 1
+            return entry
+
+        version = self.storage.version(key)
+        if entry is not None and version == entry.version:
+            self._stats['hits'] += 1
+        elif entry is not None:
+            # Запись изменена другим процессом
+            self._stats['invalidations'] += 1
+            self._stats['misses'] += 1
+            if entry.pending:
+                entry.data = self._replay(key, entry.default, entry.pending)
+            else:
+                entry.data = self.storage.load(key)
+            entry.version = version
+        else:
+            self._stats['misses'] += 1
+            entry = self._entries[key] = _CacheEntry(self.storage.load(key), version)
+        entry.checked_at = now
+        return entry
+
+    def _replay(self, key: str, default, pending: list) -> dict:
+        """Применяет несброшенные изменения pending к свежим данным из исходного хранилища"""
+        data = self.storage.load(key)
+        if data is None:
+            data = default()
+        for func in pending:
+            func(data)
+        return data
+
+    def _start_flusher(self) -> None:
+        """Запуск фонового потока периодического сброса (один на процесс)"""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+class _CacheEntry:
+    """Запись кэша: данные, версия в исходном хранилище и несброшенные изменения"""
+
+    def __init__(self, data: [None, dict], version):
+        self.data = data
+        self.version = version
+        self.default = dict
+        self.pending = []  # Функции изменения, ещё не записанные в исходное хранилище
+        self.flushing = False  # Запись идёт в flush (версию проверит и обновит сам flush)
+        self.checked_at = time.monotonic()  # Время последней проверки версии
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:52
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+ORDER_STATUS_NEW = 'Создан'
+
+
+def merge_duplicate_statuses(apps, schema_editor):
+    """Объединение статусов с одинаковым именем перед добавлением ограничения уникальности"""
+    Order = apps.get_model('order', 'Order')
+    OrderStatus = apps.get_model('order', 'OrderStatus')
+    duplicates = (OrderStatus.objects.values('name')
+                  .annotate(statuses=Count('id'), first_id=Min('id'))
+                  .filter(statuses__gt=1))
+    for duplicate in duplicates:
+        others = OrderStatus.objects.filter(name=duplicate['name']).exclude(id=duplicate['first_id'])
+        Order.objects.filter(status__in=others).update(status_id=duplicate['first_id'])
+        others.delete()
+
+
+def create_new_status(apps, schema_editor):
+    """Статус только что оформленного заказа (order.services.ORDER_STATUS_NEW)"""
+    OrderStatus = apps.get_model('order', 'OrderStatus')
+    OrderStatus.objects.get_or_create(name=ORDER_STATUS_NEW)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_statuses, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderstatus',
+            name='name',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+        migrations.RunPython(create_new_status, migrations.RunPython.noop),
+    ]
@@ -29,7 +29,7 @@ class OrderItem(models.Model):
 
 class OrderStatus(models.Model):
     """Модель статусов заказа"""
-    name = models.CharField(max_length=50)  # Обозначение статуса
+    name = models.CharField(max_length=50, unique=True)  # Обозначение статуса
     description = models.TextField(null=True)  # Описание статуса
 
     def __str__(self):
@@ -0,0 +1,77 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, DecimalField, Value, When
+from django.utils import timezone
+from cart.models import Cart, CartItem
+from cart.services import invalidate_cart_summary
+from stock.services import InsufficientStockError, reserve, commit_reservation
+from store.models import ProductDetail
+from .models import Order, OrderItem, OrderStatus
+
+ORDER_STATUS_NEW = 'Создан'  # Статус только что оформленного заказа
+
+
+class CheckoutError(Exception):
+    """Заказ не оформлен (корзины нет, она пуста или у товара нет цены). Изменения не применяются"""
+
+
+class OutOfStockError(CheckoutError):
+    """Товара на складе меньше, чем в корзине"""
+
+    def __init__(self, product_ids: list):
+        self.product_ids = product_ids
+        super().__init__(f"Недостаточно товара на складе: {', '.join(map(str, product_ids))}")
+
+
+def checkout(user) -> Order:
+    """
+    Оформление заказа из корзины пользователя в одной транзакции.
+
+    1. Блокируется корзина (UPDATE строки корзины): повторное оформление той же корзины
+       параллельным запросом ждёт завершения первого и получает уже пустую корзину.
+    2. Товар резервируется на складах и резерв сразу подтверждается (stock.services.reserve):
+       списание условным UPDATE ... WHERE quantity >= n. Если товара не хватает - откат всего заказа.
+    3. Сумма заказа считается одним агрегирующим запросом (до резерва: товар без карточки с ценой
+       не даёт оформить заказ), позиции создаются одним bulk_create, корзина очищается одним DELETE.
+       Статус ORDER_STATUS_NEW создаётся миграцией, имя статуса уникально.
+
+    :param user: Пользователь (владелец корзины).
+    :return: Созданный заказ.
+    :raises CheckoutError: Корзины нет, она пуста или у товара нет цены.
+    :raises OutOfStockError: Каких-то товаров не хватает на складе.
+    """
+    with transaction.atomic():
+        # Первым запросом в транзакции идёт запись - блокировка корзины (в SQLite - всей БД на запись)
+        if not Cart.objects.filter(customer=user).update(updated_at=timezone.now()):
+            raise CheckoutError("У пользователя нет корзины")
+        cart_items = CartItem.objects.filter(cart__customer=user)
+        items = list(cart_items.order_by('product_id').values_list('product_id', 'quantity'))
+        if not items:
+            raise CheckoutError("Корзина пуста")
+        totals = cart_items.aggregate(
+            sum_price=Sum(F('quantity') * F('product__card__price_after'),
+                          output_field=DecimalField(max_digits=10, decimal_places=2)),
+            unpriced=Count('id', filter=Q(product__card__price_after__isnull=True)),
+        )
+        if totals['unpriced']:
+            raise CheckoutError("У части товаров корзины нет цены")
+        sum_price = totals['sum_price'].quantize(Decimal('0.01'))
+
+        try:
+            reservation = reserve(dict(items), customer=user)
+        except InsufficientStockError as error:
+            raise OutOfStockError(error.product_ids) from None
+        commit_reservation(reservation.id)
+        ProductDetail.objects.filter(product_id__in=[product_id for product_id, _ in items]).update(
+            sold_value=F('sold_value') + Case(*(When(product_id=product_id, then=Value(quantity))
+                                                for product_id, quantity in items),
+                                              default=Value(0), output_field=IntegerField()))
+
+        status, _ = OrderStatus.objects.get_or_create(name=ORDER_STATUS_NEW)
+        order = Order.objects.create(customer=user, status=status, sum_price=sum_price)
+        OrderItem.objects.bulk_create([OrderItem(order=order, product_id=product_id, quantity=quantity)
+                                       for product_id, quantity in items])
+        cart_items.delete()
+        invalidate_cart_summary(user.pk)
+    return order
+
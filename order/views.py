@@ -1,3 +1,23 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from .services import checkout, CheckoutError, OutOfStockError
 
-# Create your views here.
+
+@require_POST
+def checkout_view(request):
+    """
+    Оформление заказа из корзины текущего пользователя.
+    POST /order/checkout/ -> {"order_id": ..., "sum_price": ...}
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"answer": "Пользователь не авторизирован"}, status=401,
+                            json_dumps_params={'ensure_ascii': False})
+    try:
+        order = checkout(request.user)
+    except OutOfStockError as error:
+        return JsonResponse({"answer": str(error), "product_ids": error.product_ids}, status=409,
+                            json_dumps_params={'ensure_ascii': False})
+    except CheckoutError as error:
+        return JsonResponse({"answer": str(error)}, status=400, json_dumps_params={'ensure_ascii': False})
+    return JsonResponse({"order_id": order.pk, "sum_price": order.sum_price},
+                        json_dumps_params={'ensure_ascii': False})
@@ -5,6 +5,14 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Асинхронные представления (например, app_weather) не занимают воркер, пока ждут
+внешние API, если проект запущен ASGI сервером, например:
+uvicorn project.asgi:application --workers 2
+
+Под WSGI сервером (project/wsgi.py, runserver) асинхронные представления тоже работают, но
+выполняются через async_to_sync в новом цикле событий на каждый запрос, поэтому погода там
+запрашивается синхронным путём в отдельном потоке (см. weather_api.acurrent_weather).
 """
 
 import os
@@ -83,6 +83,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'project.wsgi.application'
+# Асинхронные представления (app_weather) полностью асинхронны только под ASGI сервером,
+# например: uvicorn project.asgi:application --workers 2 (см. project/asgi.py)
+ASGI_APPLICATION = 'project.asgi.application'
 
 AUTHENTICATION_BACKENDS = (
    'social_core.backends.github.GithubOAuth2',
@@ -102,6 +105,25 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Тестовая БД - файл, а не БД в памяти: в общей БД в памяти одновременная запись из нескольких
+        # потоков сразу падает с "database table is locked" вместо ожидания блокировки
+        # (тесты конкурентных операций, например cart/tests.py)
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Кэш должен быть общим для всех процессов (воркеров) сервера: сброс кэша в одном процессе
+# (итоги корзины, первая страница отзывов, версии индексов промоакций и тарифов) должен
+# быть виден остальным. По умолчанию - файловый кэш (процессы одного сервера), для нескольких
+# серверов задайте CACHE_BACKEND=django.core.cache.backends.redis.RedisCache и CACHE_LOCATION=redis://...
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.django_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
     }
 }
 
@@ -153,4 +175,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 INTERNAL_IPS = [
     "127.0.0.1",
-]
\ No newline at end of file
+]
+# Бюджет SQL запросов представлений (logic/query_budget.py): при превышении бюджета
+# в строгом режиме выбрасывается исключение, иначе пишется предупреждение в лог
+QUERY_BUDGET_STRICT = DEBUG
@@ -37,6 +37,7 @@ urlpatterns = [
     path('cart/', include('cart.urls')),
     path('login/', include('app_login.urls')),
     path('wishlist/', include('wishlist.urls')),
+    path('order/', include('order.urls')),
     path('auth/', include('social_django.urls', namespace='social')),
 ]
 
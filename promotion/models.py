@@ -44,4 +44,4 @@ class BuyGet(models.Model):
     get_quantity = models.PositiveIntegerField()
 
     def __str__(self):
-        return f"Купи {self.buy_quantity}, Заплати за {self.get_quantity}"
+        return f"Купи {self.buy_quantity}, получи {self.get_quantity} бесплатно"
@@ -0,0 +1,147 @@
+"""
+Расчёт стоимости корзины с промокодами (Discount, FreeShipping, BuyGet).
+
+Правила (результат не зависит от порядка промокодов, все суммы - Decimal с точностью до копейки):
+1. Цена позиции - итоговая цена из карточки продукта (ProductCard.price_after, скидка продукта уже учтена).
+2. BuyGet ("купи N, получи K бесплатно") действует на каждую позицию отдельно: в каждой полной группе
+   из N + K единиц товара K единиц бесплатны. Если промокодов BuyGet несколько, то для позиции
+   выбирается самый выгодный (одни и те же единицы не становятся бесплатными дважды).
+3. Скидки Discount действуют на сумму заказа после BuyGet: процентные перемножаются
+   (каждая действует на остаток после остальных), затем вычитаются скидки в рублях.
+   Скидка не больше суммы заказа.
+4. Скидка на заказ распределяется по позициям пропорционально их сумме (копейки, оставшиеся
+   после округления вниз, достаются позициям с наибольшим остатком), поэтому сумма итогов
+   позиций всегда равна итогу заказа.
+5. FreeShipping обнуляет стоимость доставки.
+
+Промоакции загружаются одним запросом, позиции обрабатываются за один проход: правила всех
+промокодов заранее сводятся к общему множителю процентных скидок, сумме скидок в рублях
+и набору различных правил BuyGet.
+"""
+
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from django.utils import timezone
+from cart.models import CartItem
+from .models import Promotion
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def price_cart(cart, codes=(), shipping=ZERO) -> dict:
+    """
+    Стоимость корзины с промокодами. Два запроса: позиции корзины с ценами и промоакции.
+
+    :param cart: Корзина (Cart).
+    :param codes: Коды промоакций. Несуществующие, выключенные и недействующие коды не применяются.
+    :param shipping: [Опционально] Стоимость доставки.
+    :return: см. price_lines.
+    """
+    lines = CartItem.objects.filter(cart=cart).order_by('id').values_list(
+        'product_id', 'quantity', 'product__card__price_after')
+    return price_lines(lines, load_promotions(codes), shipping)
+
+
+def load_promotions(codes, now=None) -> list:
+    """
+    Действующие промоакции по кодам одним запросом (правила присоединяются LEFT JOIN).
+
+    :param codes: Коды промоакций.
+    :param now: [Опционально] Момент проверки срока действия (по умолчанию - текущее время).
+    :return: Список промоакций (с подгруженными discount, freeshipping, buyget), отсортированный по коду.
+    """
+    codes = {code for code in codes if code}
+    if not codes:
+        return []
+    now = now or timezone.now()
+    return list(Promotion.objects
+                .filter(code__in=codes, is_active=True, start_date__lte=now, end_date__gte=now)
+                .select_related('discount', 'freeshipping', 'buyget')
+                .order_by('code'))
+
+
+def price_lines(lines, promotions, shipping=ZERO) -> dict:
+    """
+    Стоимость позиций с промоакциями (без запросов к БД).
+
+    :param lines: Позиции: последовательность (id продукта, количество, цена единицы).
+    :param promotions: Промоакции (см. load_promotions).
+    :param shipping: [Опционально] Стоимость доставки.
+    :return: {'lines': [{'product_id', 'quantity', 'unit_price', 'subtotal', 'free_units', 'discount',
+    'total'}], 'subtotal': сумма без промокодов, 'discount': скидка по промокодам, 'shipping': доставка,
+    'total': к оплате, 'codes': применённые коды}.
+    """
+    percent_factor, amount_off, buy_get_rules, free_shipping = _combine_rules(promotions)
+
+    # Проход по позициям: сумма позиции и скидка BuyGet
+    result_lines = []
+    subtotal = net_total = ZERO
+    for product_id, quantity, unit_price in lines:
+        unit_price = Decimal(unit_price or 0).quantize(CENT, ROUND_HALF_UP)
+        line_subtotal = unit_price * quantity
+        free_units = max((quantity // group * free for group, free in buy_get_rules), default=0)
+        net = line_subtotal - unit_price * free_units
+        result_lines.append({'product_id': product_id, 'quantity': quantity, 'unit_price': unit_price,
+                             'subtotal': line_subtotal, 'free_units': free_units, 'net': net})
+        subtotal += line_subtotal
+        net_total += net
+
+    # Скидка на заказ и её распределение по позициям
+    order_discount = (net_total * (1 - percent_factor)).quantize(CENT, ROUND_HALF_UP) + amount_off
+    order_discount = min(order_discount, net_total)
+    _allocate(result_lines, order_discount, net_total)
+
+    shipping = ZERO if free_shipping else Decimal(shipping).quantize(CENT, ROUND_HALF_UP)
+    total = net_total - order_discount
+    return {
+        'lines': result_lines,
+        'subtotal': subtotal,
+        'discount': subtotal - total,
+        'shipping': shipping,
+        'total': total + shipping,
+        'codes': [promotion.code for promotion in promotions],
+    }
+
+
+def _combine_rules(promotions) -> tuple:
+    """
+    Сведение правил промоакций: (множитель процентных скидок, сумма скидок в рублях,
+    различные правила BuyGet в виде (N + K, K), есть ли бесплатная доставка)
+    """
+    percent_factor = Decimal(1)
+    amount_off = ZERO
+    buy_get_rules = set()
+    free_shipping = False
+    for promotion in promotions:
+        discount = getattr(promotion, 'discount', None)
+        if discount is not None:
+            if discount.is_percentage:
+                percent_factor *= 1 - min(discount.value, Decimal(100)) / 100
+            else:
+                amount_off += discount.value
+        buy_get = getattr(promotion, 'buyget', None)
+        if buy_get is not None and buy_get.get_quantity:
+            buy_get_rules.add((buy_get.buy_quantity + buy_get.get_quantity, buy_get.get_quantity))
+        free_shipping = free_shipping or getattr(promotion, 'freeshipping', None) is not None
+    return percent_factor, amount_off.quantize(CENT, ROUND_HALF_UP), sorted(buy_get_rules), free_shipping
+
+
+def _allocate(lines: list, order_discount: Decimal, net_total: Decimal) -> None:
+    """Распределение скидки на заказ по позициям пропорционально их сумме (метод наибольшего остатка)"""
+    shares = []
+    allocated = ZERO
+    for line in lines:
+        exact = order_discount * line['net'] / net_total if net_total else ZERO
+        share = exact.quantize(CENT, ROUND_DOWN)
+        shares.append(share)
+        allocated += share
+    # Оставшиеся копейки - позициям с наибольшим остатком (при равенстве - более ранним позициям)
+    cents = int((order_discount - allocated) / CENT)
+    if cents:
+        remainders = sorted(range(len(lines)),
+                            key=lambda i: (-(order_discount * lines[i]['net'] / net_total - shares[i]), i))
+        for i in remainders[:cents]:
+            shares[i] += CENT
+    for line, share in zip(lines, shares):
+        line['discount'] = line['subtotal'] - line['net'] + share
+        line['total'] = line.pop('net') - share
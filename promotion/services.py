@@ -0,0 +1,130 @@
+"""
+Поиск промоакций по коду без запросов к БД.
+
+Все активные (is_active) и не закончившиеся промоакции вместе с их правилами (Discount,
+FreeShipping, BuyGet) загружаются одним запросом в индекс в памяти процесса: словарь код -> кортеж.
+Срок действия (start_date, end_date) проверяется при каждом поиске, поэтому индекс не нужно
+перестраивать, когда промоакция начинается или заканчивается.
+
+Инвалидация версионная: любое изменение промоакций (сигналы promotion/signals.py) записывает
+новую версию (уникальное значение) в кэш Django. Процесс сверяет свою версию индекса с кэшем
+не чаще, чем раз в PROMOTION_VERSION_CHECK_INTERVAL секунд, и перестраивает индекс, если версия
+изменилась. Изменения доходят до всех процессов (воркеров) сервера, потому что кэш общий для них
+(см. CACHES в настройках; с кэшем в памяти процесса, LocMemCache, версия была бы видна только
+процессу, который изменил промоакцию). Версия - не счётчик: incr файлового кэша и кэша в БД
+не атомарен, и два одновременных увеличения дали бы одно значение, а новое уникальное значение
+отличается от всех прежних, даже если одна запись затирает другую.
+"""
+
+import threading
+import time
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import Promotion
+
+PROMOTION_VERSION_KEY = 'promotion_index:version'  # Ключ версии промоакций в кэше Django
+PROMOTION_VERSION_CHECK_INTERVAL = 1.0  # Как часто процесс сверяет версию индекса с кэшем, с
+
+# Поля промоакции в индексе (в том же порядке, что и кортеж записи индекса)
+_INDEX_FIELDS = ('name', 'start_date', 'end_date', 'discount__value', 'discount__is_percentage',
+                 'freeshipping__id', 'buyget__buy_quantity', 'buyget__get_quantity')
+
+
+class PromotionIndex:
+    """
+    Индекс промоакций в памяти: код -> (name, start_date, end_date, значение скидки, скидка в процентах,
+    id бесплатной доставки, buy_quantity, get_quantity). Потокобезопасен: индекс перестраивается
+    одним потоком, остальные в это время читают старый индекс.
+    """
+
+    def __init__(self, version_check_interval: float = PROMOTION_VERSION_CHECK_INTERVAL):
+        self.version_check_interval = version_check_interval
+        self._entries = None  # Словарь индекса (None - ещё не построен)
+        self._version = None  # Версия промоакций, по которой построен индекс
+        self._checked_at = 0.0  # Когда версия последний раз сверялась с кэшем (time.monotonic)
+        self._lock = threading.Lock()
+
+    def get(self, code: str, now=None) -> [None, dict]:
+        """
+        Поиск промоакции по коду.
+
+        :param code: Код промоакции.
+        :param now: [Опционально] Момент проверки срока действия (по умолчанию - текущее время).
+        :return: None, если промоакции нет (или она выключена, или закончилась до построения индекса).
+        Иначе словарь с правилами промоакции и флагом is_valid (действует ли она в момент now).
+        """
+        entry = self._current_entries().get(code)
+        if entry is None:
+            return None
+        name, start_date, end_date, discount, is_percentage, free_shipping, buy_quantity, get_quantity = entry
+        now = now or timezone.now()
+        return {
+            'code': code,
+            'name': name,
+            'start_date': start_date,
+            'end_date': end_date,
+            'is_valid': start_date <= now <= end_date,
+            'discount': None if discount is None else {'value': discount, 'is_percentage': is_percentage},
+            'free_shipping': free_shipping is not None,
+            'buy_get': None if buy_quantity is None else {'buy_quantity': buy_quantity, 'get_quantity': get_quantity},
+        }
+
+    def expire(self) -> None:
+        """Сверить версию с кэшем при следующем поиске (не дожидаясь version_check_interval)"""
+        self._checked_at = 0.0
+
+    def __len__(self):
+        return len(self._current_entries())
+
+    def _current_entries(self) -> dict:
+        entries = self._entries
+        if entries is not None and time.monotonic() - self._checked_at < self.version_check_interval:
+            return entries
+        with self._lock:
+            if self._entries is not None and time.monotonic() - self._checked_at < self.version_check_interval:
+                return self._entries  # Версию уже сверил другой поток
+            version = _current_version()
+            if self._entries is None or version != self._version:
+                self._entries = _load_entries()
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._entries
+
+
+def invalidate_promotions() -> None:
+    """
+    Записывает новую версию промоакций (все процессы перестроят индекс). Если вызвано внутри транзакции,
+    то после её фиксации, иначе индекс мог бы перестроиться по ещё не зафиксированным данным.
+    """
+    def bump():
+        cache.set(PROMOTION_VERSION_KEY, uuid.uuid4().hex, None)
+        PROMOTION_INDEX.expire()
+
+    transaction.on_commit(bump)
+
+
+def find_promotion(code: str, now=None) -> [None, dict]:
+    """Поиск промоакции по коду в индексе процесса (см. PromotionIndex.get)"""
+    return PROMOTION_INDEX.get(code, now)
+
+
+def _current_version() -> str:
+    version = cache.get(PROMOTION_VERSION_KEY)
+    if version is None:
+        # Ключа нет (вытеснен или кэш очищен). Новая версия не совпадает ни с одной прежней,
+        # поэтому все процессы перестроят индекс
+        cache.add(PROMOTION_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(PROMOTION_VERSION_KEY)
+    return version
+
+
+def _load_entries() -> dict:
+    """Все действующие и будущие промоакции одним запросом (правила присоединяются LEFT JOIN)"""
+    promotions = (Promotion.objects.filter(is_active=True, end_date__gte=timezone.now())
+                  .values_list('code', *_INDEX_FIELDS))
+    return {row[0]: row[1:] for row in promotions.iterator(chunk_size=10000)}
+
+
+PROMOTION_INDEX = PromotionIndex()
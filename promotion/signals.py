@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Promotion, Discount, FreeShipping, BuyGet
+from .services import invalidate_promotions
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+@receiver(post_save, sender=FreeShipping)
+@receiver(post_delete, sender=FreeShipping)
+@receiver(post_save, sender=BuyGet)
+@receiver(post_delete, sender=BuyGet)
+def reset_promotion_index(sender, instance, **kwargs):
+    """Новая версия индекса промоакций при изменении промоакции или её правил"""
+    invalidate_promotions()
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Warehouse, WarehouseItem
+from .models import Warehouse, WarehouseItem, Reservation, ReservationItem
 
 admin.site.register(Warehouse)
 admin.site.register(WarehouseItem)
+admin.site.register(Reservation)
+admin.site.register(ReservationItem)
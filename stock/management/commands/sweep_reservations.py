@@ -0,0 +1,22 @@
+"""
+Отмена истёкших резервов товара (товар возвращается на склады).
+
+python manage.py sweep_reservations [--batch-size 500]
+
+Запускается по расписанию (cron), например, раз в минуту.
+"""
+
+from django.core.management.base import BaseCommand
+from stock.services import sweep_expired_reservations, SWEEP_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Отменяет истёкшие резервы и возвращает товар на склады"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE,
+                            help="Сколько резервов отменяется за одну транзакцию")
+
+    def handle(self, *args, **options):
+        released = sweep_expired_reservations(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Отменено резервов: {released}"))
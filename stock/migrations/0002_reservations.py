@@ -0,0 +1,78 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Объединение повторяющихся строк склада (одинаковые warehouse и product) перед добавлением ограничения"""
+    WarehouseItem = apps.get_model('stock', 'WarehouseItem')
+    duplicates = (WarehouseItem.objects.values('warehouse_id', 'product_id')
+                  .annotate(items=Count('id'), total=Sum('quantity'))
+                  .filter(items__gt=1))
+    for duplicate in duplicates:
+        items = WarehouseItem.objects.filter(warehouse_id=duplicate['warehouse_id'],
+                                             product_id=duplicate['product_id']).order_by('id')
+        first = items.first()
+        items.exclude(id=first.id).delete()
+        WarehouseItem.objects.filter(id=first.id).update(quantity=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('store', '0003_productcard_keyset_indexes'),
+        ('stock', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('active', 'Активен'), ('committed', 'Подтверждён'), ('released', 'Отменён')], default='active', max_length=10)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReservationItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='warehouseitem',
+            constraint=models.UniqueConstraint(fields=('warehouse', 'product'), name='unique_warehouse_product'),
+        ),
+        migrations.AddField(
+            model_name='reservationitem',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_items', to='store.product'),
+        ),
+        migrations.AddField(
+            model_name='reservationitem',
+            name='reservation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='stock.reservation'),
+        ),
+        migrations.AddField(
+            model_name='reservationitem',
+            name='warehouse_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_items', to='stock.warehouseitem'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'expires_at'], name='reservation_status_expires_idx'),
+        ),
+    ]
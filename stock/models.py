@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.auth.models import User
 from store.models import Product
 
 
@@ -23,3 +24,50 @@ class WarehouseItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} ({self.quantity} {self.product.unit.name})"
+
+    class Meta:
+        constraints = [
+            # Один продукт - одна строка на складе (нужно для переноса остатков в stock/services.py)
+            models.UniqueConstraint(fields=['warehouse', 'product'], name='unique_warehouse_product'),
+        ]
+
+
+class Reservation(models.Model):
+    """
+    Модель резерва товара (см. stock/services.py). Зарезервированное количество уже списано
+    со складов (WarehouseItem.quantity) и возвращается на них при отмене или истечении резерва.
+    """
+    ACTIVE = 'active'  # Товар зарезервирован до expires_at
+    COMMITTED = 'committed'  # Резерв подтверждён (например, заказ оформлен), товар не вернётся на склад
+    RELEASED = 'released'  # Резерв отменён, товар возвращается на склад (строка сразу удаляется)
+    STATUS_CHOICES = [(ACTIVE, 'Активен'), (COMMITTED, 'Подтверждён'), (RELEASED, 'Отменён')]
+
+    customer = models.ForeignKey(User, related_name='reservations', null=True, blank=True,
+                                 on_delete=models.SET_NULL)  # Ссылка на пользователя (если есть)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=ACTIVE)  # Состояние резерва
+    expires_at = models.DateTimeField()  # Когда активный резерв истекает
+    created_at = models.DateTimeField(auto_now_add=True)  # Дата и время создания объекта сущности в базе данных
+    updated_at = models.DateTimeField(auto_now=True)  # Дата и время обновления объекта сущности в базе данных
+
+    def __str__(self):
+        return f"Резерв {self.id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Поиск истёкших активных резервов пакетами (sweep_expired_reservations)
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_expires_idx'),
+        ]
+
+
+class ReservationItem(models.Model):
+    """Сколько товара резерв списал с конкретного склада"""
+    reservation = models.ForeignKey(Reservation, related_name='items',
+                                    on_delete=models.CASCADE)  # Ссылка на резерв
+    warehouse_item = models.ForeignKey(WarehouseItem, related_name='reservation_items',
+                                       on_delete=models.CASCADE)  # Ссылка на строку склада
+    product = models.ForeignKey(Product, related_name='reservation_items',
+                                on_delete=models.CASCADE)  # Ссылка на продукт (дублирует warehouse_item.product)
+    quantity = models.PositiveIntegerField()  # Зарезервированное количество
+
+    def __str__(self):
+        return f"{self.product.name} - {self.quantity}"
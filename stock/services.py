@@ -0,0 +1,219 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from store.models import ProductDetail
+from store.services import refresh_product_cards
+from .models import Warehouse, WarehouseItem, Reservation, ReservationItem
+
+RESERVATION_TTL = timedelta(minutes=15)  # Время жизни активного резерва
+SWEEP_BATCH_SIZE = 500  # Сколько истёкших резервов снимается за одну транзакцию
+DEFAULT_WAREHOUSE_NAME = 'Основной склад'  # Склад для остатков, которые не учтены на складах
+
+
+class InsufficientStockError(Exception):
+    """На складах меньше товара, чем запрошено. Ничего не резервируется"""
+
+    def __init__(self, product_ids: list):
+        self.product_ids = product_ids
+        super().__init__(f"Недостаточно товара на складах: {', '.join(map(str, product_ids))}")
+
+
+def reserve(quantities: dict, customer=None, ttl: timedelta = RESERVATION_TTL) -> Reservation:
+    """
+    Резервирует товар сразу на нескольких складах в одной транзакции.
+
+    Для каждого продукта количество набирается со складов, начиная с тех, где товара больше.
+    Списание со всех складов - один условный UPDATE ... SET quantity = quantity - n
+    WHERE id IN (...) AND quantity >= n: если параллельный резерв успел забрать товар,
+    UPDATE затронет меньше строк и резерв откатится целиком.
+
+    Остаток из ProductDetail.quantity_in_stock, которого нет на складах, сначала переносится
+    на склад DEFAULT_WAREHOUSE_NAME (см. adopt_product_stock). После списания ProductDetail.quantity_in_stock
+    (и карточки продуктов) хранят сумму остатков по всем складам - страницы магазина читают её
+    без суммирования складов на каждый запрос.
+
+    :param quantities: {id продукта: количество}.
+    :param customer: [Опционально] Пользователь, для которого резервируется товар.
+    :param ttl: [Опционально] Через сколько активный резерв истекает (см. sweep_expired_reservations).
+    :return: Созданный резерв (в статусе Reservation.ACTIVE).
+    :raises InsufficientStockError: Каких-то продуктов не хватает.
+    """
+    quantities = {int(product_id): int(quantity) for product_id, quantity in quantities.items() if int(quantity) > 0}
+    if not quantities:
+        raise ValueError("Нечего резервировать")
+    product_ids = sorted(quantities)
+
+    with transaction.atomic():
+        # Первым запросом в транзакции идёт запись (в SQLite - блокировка всей БД на запись)
+        reservation = Reservation.objects.create(customer=customer, expires_at=timezone.now() + ttl)
+        adopt_product_stock(product_ids)
+        # Строки блокируются в одном порядке, чтобы параллельные резервы не блокировали друг друга крест-накрест
+        warehouse_items = (WarehouseItem.objects.select_for_update()
+                           .filter(product_id__in=product_ids, quantity__gt=0)
+                           .order_by('product_id', '-quantity', 'id')
+                           .values_list('id', 'product_id', 'quantity'))
+
+        plan = {}  # id строки склада -> (id продукта, количество)
+        needed = dict(quantities)
+        for item_id, product_id, quantity in warehouse_items:
+            take = min(quantity, needed[product_id])
+            if take:
+                plan[item_id] = (product_id, take)
+                needed[product_id] -= take
+        missing = [product_id for product_id in product_ids if needed[product_id]]
+        if missing:
+            raise InsufficientStockError(missing)
+
+        taken = _quantity_case(plan)
+        updated = WarehouseItem.objects.filter(id__in=plan, quantity__gte=taken).update(quantity=F('quantity') - taken)
+        if updated != len(plan):
+            # Между чтением и списанием остаток изменился (возможно только без блокировки строк)
+            raise InsufficientStockError(product_ids)
+        ReservationItem.objects.bulk_create([
+            ReservationItem(reservation=reservation, warehouse_item_id=item_id, product_id=product_id, quantity=quantity)
+            for item_id, (product_id, quantity) in plan.items()
+        ])
+        sync_available_stock(product_ids)
+    return reservation
+
+
+def commit_reservation(reservation_id: int) -> bool:
+    """
+    Подтверждает резерв: товар остаётся списанным со складов.
+
+    :param reservation_id: id резерва.
+    :return: False, если резерв уже подтверждён, отменён или истёк.
+    """
+    return Reservation.objects.filter(
+        id=reservation_id, status=Reservation.ACTIVE, expires_at__gt=timezone.now(),
+    ).update(status=Reservation.COMMITTED, updated_at=timezone.now()) > 0
+
+
+def release_reservation(reservation_id: int) -> bool:
+    """
+    Отменяет активный резерв и возвращает товар на те же склады.
+
+    :param reservation_id: id резерва.
+    :return: False, если резерв уже подтверждён или отменён.
+    """
+    with transaction.atomic():
+        # Условный UPDATE статуса: вернуть товар может только один из параллельных вызовов
+        if not Reservation.objects.filter(id=reservation_id, status=Reservation.ACTIVE).update(
+                status=Reservation.RELEASED, updated_at=timezone.now()):
+            return False
+        _return_released_stock()
+    return True
+
+
+def sweep_expired_reservations(batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """
+    Отменяет истёкшие активные резервы пакетами по batch_size (каждый пакет - своя транзакция,
+    поэтому БД не блокируется надолго даже при большом числе истёкших резервов).
+
+    :param batch_size: Размер пакета.
+    :return: Число отменённых резервов.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = (Reservation.objects
+                       .filter(status=Reservation.ACTIVE, expires_at__lte=timezone.now())
+                       .order_by('expires_at')
+                       .values('id')[:batch_size])
+            count = Reservation.objects.filter(id__in=Subquery(expired)).update(
+                status=Reservation.RELEASED, updated_at=timezone.now())
+            if count:
+                _return_released_stock()
+        released += count
+        if count < batch_size:
+            return released
+
+
+def available_stock(product_ids) -> dict:
+    """
+    Доступный остаток продуктов (сумма по всем складам за вычетом резервов) одним запросом
+    к ProductDetail - без суммирования складов.
+
+    :param product_ids: id продуктов.
+    :return: {id продукта: количество}. Продукты без ProductDetail не попадают в результат.
+    """
+    return dict(ProductDetail.objects.filter(product_id__in=product_ids)
+                .values_list('product_id', 'quantity_in_stock'))
+
+
+def _return_released_stock() -> None:
+    """
+    Возвращает на склады товар всех резервов в статусе RELEASED (одним UPDATE) и удаляет эти резервы.
+    Вызывается в транзакции сразу после перевода резервов в RELEASED.
+    """
+    items = list(ReservationItem.objects.filter(reservation__status=Reservation.RELEASED)
+                 .values_list('warehouse_item_id', 'product_id', 'quantity'))
+    returned = {}  # id строки склада -> (id продукта, количество)
+    for item_id, product_id, quantity in items:
+        returned[item_id] = (product_id, returned.get(item_id, (None, 0))[1] + quantity)
+    if returned:
+        WarehouseItem.objects.filter(id__in=returned).update(quantity=F('quantity') + _quantity_case(returned))
+    Reservation.objects.filter(status=Reservation.RELEASED).delete()
+    if returned:
+        sync_available_stock({product_id for product_id, _ in returned.values()})
+
+
+def adopt_product_stock(product_ids, applied: [None, dict] = None) -> None:
+    """
+    Перенос на склад по умолчанию остатка из ProductDetail, которого нет на складах.
+
+    ProductDetail.quantity_in_stock после каждого пересчёта (sync_available_stock) равен сумме по складам,
+    поэтому превышение над суммой - товар, который ещё не учтён на складах (начальные данные, ProductDetail
+    создан или изменён напрямую). Без переноса пересчёт затёр бы этот остаток суммой по складам.
+    Уменьшение остатка в ProductDetail не переносится: остаток меняется через строки складов
+    (WarehouseItem), в админ панели поле quantity_in_stock только для чтения.
+
+    :param product_ids: id продуктов.
+    :param applied: [Опционально] {id продукта: изменение количества на складах}, которое уже записано,
+    но ещё не учтено в ProductDetail (например, строка склада только что сохранена или удалена).
+    """
+    applied = applied or {}
+    warehoused = dict(WarehouseItem.objects.filter(product_id__in=product_ids).order_by()
+                      .values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+    leftovers = {}
+    for product_id, quantity in (ProductDetail.objects.filter(product_id__in=product_ids, quantity_in_stock__gt=0)
+                                 .values_list('product_id', 'quantity_in_stock')):
+        leftover = quantity - (warehoused.get(product_id, 0) - applied.get(product_id, 0))
+        if leftover > 0:
+            leftovers[product_id] = leftover
+    if not leftovers:
+        return
+    warehouse, _ = Warehouse.objects.get_or_create(name=DEFAULT_WAREHOUSE_NAME)
+    existing = dict(WarehouseItem.objects.filter(warehouse=warehouse, product_id__in=leftovers)
+                    .values_list('id', 'product_id'))
+    if existing:
+        added = {item_id: (product_id, leftovers[product_id]) for item_id, product_id in existing.items()}
+        WarehouseItem.objects.filter(id__in=added).update(quantity=F('quantity') + _quantity_case(added))
+    stocked = set(existing.values())
+    WarehouseItem.objects.bulk_create([WarehouseItem(warehouse=warehouse, product_id=product_id, quantity=quantity)
+                                       for product_id, quantity in leftovers.items() if product_id not in stocked])
+
+
+def sync_available_stock(product_ids) -> None:
+    """
+    Пересчёт кэша доступного остатка (ProductDetail.quantity_in_stock) одним UPDATE с подзапросом
+    и карточек продуктов после фиксации транзакции.
+    Остаток, которого нет на складах, должен быть перенесён заранее (adopt_product_stock).
+
+    :param product_ids: id продуктов.
+    """
+    product_ids = list(product_ids)
+    total = (WarehouseItem.objects.filter(product_id=OuterRef('product_id'))
+             .values('product_id').annotate(total=Sum('quantity')).values('total'))
+    ProductDetail.objects.filter(product_id__in=product_ids).update(
+        quantity_in_stock=Coalesce(Subquery(total), 0), updated_at=timezone.now())
+    # update() не отправляет сигналы, карточки пересчитываются явно
+    transaction.on_commit(lambda: refresh_product_cards(product_ids))
+
+
+def _quantity_case(plan: dict) -> Case:
+    """CASE id WHEN ... THEN количество - количество для каждой строки склада в одном UPDATE"""
+    return Case(*(When(id=item_id, then=Value(quantity)) for item_id, (_, quantity) in plan.items()),
+                default=Value(0), output_field=IntegerField())
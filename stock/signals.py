@@ -0,0 +1,34 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import WarehouseItem
+from .services import adopt_product_stock, sync_available_stock
+
+
+@receiver(pre_save, sender=WarehouseItem)
+def remember_warehouse_item(sender, instance, **kwargs):
+    """Запоминание продукта и количества строки склада до изменения (нужно для расчёта разницы)"""
+    instance._stock_before = None
+    if instance.pk is not None:
+        instance._stock_before = (WarehouseItem.objects.filter(pk=instance.pk)
+                                  .values_list('product_id', 'quantity').first())
+
+
+@receiver(post_save, sender=WarehouseItem)
+def reset_available_stock(sender, instance, **kwargs):
+    """Пересчёт доступного остатка продукта при изменении строки склада (например, в админ панели)"""
+    applied = {instance.product_id: instance.quantity}
+    before = getattr(instance, '_stock_before', None)
+    if before is not None:  # Строка изменена (и, возможно, перенесена на другой продукт)
+        product_id, quantity = before
+        applied[product_id] = applied.get(product_id, 0) - quantity
+    # Остаток продукта, который ещё не был учтён на складах, сохраняется на складе по умолчанию
+    adopt_product_stock(list(applied), applied)
+    sync_available_stock(applied)
+
+
+@receiver(post_delete, sender=WarehouseItem)
+def reset_available_stock_on_delete(sender, instance, **kwargs):
+    """Пересчёт доступного остатка продукта при удалении строки склада"""
+    applied = {instance.product_id: -instance.quantity}
+    adopt_product_stock(list(applied), applied)
+    sync_available_stock(applied)
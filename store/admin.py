@@ -1,14 +1,22 @@
 from django.contrib import admin
 from django.apps import apps
-from .models import Product, ProductDetail, Unit, Currency, Category, Review, ProductDiscount
+from .models import Product, ProductDetail, Unit, Currency, Category, Review, ProductDiscount, ProductCard
 
 app = apps.get_app_config('store')
 app.verbose_name = 'Магазин'  # verbose_name - заменит отображаемое название приложения в админ панели
 
 admin.site.register(Product)
-admin.site.register(ProductDetail)
 admin.site.register(ProductDiscount)
 admin.site.register(Unit)
 admin.site.register(Currency)
 admin.site.register(Category)
 admin.site.register(Review)
+admin.site.register(ProductCard)
+
+
+@admin.register(ProductDetail)
+class ProductDetailAdmin(admin.ModelAdmin):
+    # Остаток - кэш суммы по складам (stock.services.sync_available_stock) и пересчитывается при
+    # каждом изменении складов, поэтому правка здесь не меняла бы товар на складах, с которых идёт
+    # резервирование. Остаток меняется только через строки складов (WarehouseItem)
+    readonly_fields = ('quantity_in_stock',)
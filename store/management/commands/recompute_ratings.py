@@ -0,0 +1,23 @@
+"""
+Полный пересчёт рейтингов продуктов (ProductDetail.rating_mean, review_count, rating_sum) по отзывам.
+
+python manage.py recompute_ratings [--batch-size 1000]
+
+Обычно рейтинг обновляется инкрементально при изменении отзывов (store/signals.py). Команда нужна,
+чтобы исправить расхождения: отзывы, изменённые через update()/bulk_create без сигналов, начальные данные.
+"""
+
+from django.core.management.base import BaseCommand
+from store.services import recompute_product_ratings, RATING_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает рейтинги всех продуктов по отзывам"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RATING_BATCH_SIZE,
+                            help="Сколько продуктов пересчитывается за одну транзакцию")
+
+    def handle(self, *args, **options):
+        recomputed = recompute_product_ratings(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано продуктов: {recomputed}"))
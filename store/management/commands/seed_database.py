@@ -0,0 +1,51 @@
+"""
+Заполнение БД синтетическими пользователями и продуктами пакетами (store/seeding.py).
+
+python manage.py seed_database [--scale 1] [--products N] [--users N] [--passwords 64]
+                               [--batch-size 5000] [--workers N] [--users-file users.json]
+
+--scale умножает базовые объёмы (10 000 продуктов и 1 000 пользователей), например --scale 100 -
+1 000 000 продуктов и 100 000 пользователей. --products и --users задают объёмы явно.
+Данные добавляются к уже имеющимся, для чистой БД сначала запустите clear_database.py.
+"""
+
+import json
+from django.core.management.base import BaseCommand, CommandError
+from store.seeding import seed_database, SEED_PRODUCTS, SEED_USERS, SEED_PASSWORDS, SEED_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Заполняет БД синтетическими пользователями и продуктами"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help=f"Множитель объёмов ({SEED_PRODUCTS} продуктов и {SEED_USERS} пользователей)")
+        parser.add_argument('--products', type=int, help="Число продуктов (вместо расчёта по --scale)")
+        parser.add_argument('--users', type=int, help="Число пользователей (вместо расчёта по --scale)")
+        parser.add_argument('--passwords', type=int, default=SEED_PASSWORDS,
+                            help="Число различных паролей (хэши вычисляются в пуле процессов)")
+        parser.add_argument('--batch-size', type=int, default=SEED_BATCH_SIZE,
+                            help="Сколько строк записывается за одну транзакцию")
+        parser.add_argument('--workers', type=int, help="Число процессов хэширования (по умолчанию - число ядер)")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--users-file', help="Записать логины и пароли созданных пользователей в JSON файл")
+
+    def handle(self, *args, **options):
+        products = options['products'] if options['products'] is not None else round(SEED_PRODUCTS * options['scale'])
+        users = options['users'] if options['users'] is not None else round(SEED_USERS * options['scale'])
+        if products < 0 or users < 0 or options['batch_size'] < 1 or options['passwords'] < 1:
+            raise CommandError("Объёмы не могут быть отрицательными, --batch-size и --passwords - не меньше 1")
+
+        self.stdout.write(f"Создание {products} продуктов и {users} пользователей")
+        result = seed_database(products=products, users=users, passwords=options['passwords'],
+                               batch_size=options['batch_size'], workers=options['workers'],
+                               seed=options['seed'],
+                               progress=lambda name, seconds: self.stdout.write(f"  {name}: {seconds:.2f} c"))
+
+        if options['users_file']:
+            with open(options['users_file'], 'w', encoding='utf-8') as f:
+                json.dump([{'username': username, 'password': password} for username, password in result['users']],
+                          f, indent=4)
+        total = sum(result['timings'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано продуктов: {result['products']}, пользователей: {len(result['users'])} за {total:.2f} c"))
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.5 on 2026-10-18 10:56
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_product_cards(apps, schema_editor):
+    """Заполнение карточек для уже существующих продуктов"""
+    Product = apps.get_model('store', 'Product')
+    ProductCard = apps.get_model('store', 'ProductCard')
+    cards = []
+    for product in Product.objects.select_related('category', 'details', 'discount'):
+        details = getattr(product, 'details', None)
+        discount = getattr(product, 'discount', None)
+        price_after = product.price
+        if discount is not None:
+            price_after = (product.price * (100 - discount.value) / 100).quantize(Decimal('0.01'))
+        cards.append(ProductCard(
+            product=product,
+            name=product.name,
+            slug_name=product.slug_name,
+            description=product.description,
+            category=product.category.name,
+            price_before=product.price,
+            price_after=price_after,
+            discount=discount.value if discount is not None else None,
+            rating=details.rating_mean if details is not None else 0,
+            review=details.review_count if details is not None else 0,
+            sold_value=details.sold_value if details is not None else 0,
+            weight_in_stock=details.quantity_in_stock if details is not None else 0,
+            image=product.image.name or None,
+        ))
+    ProductCard.objects.bulk_create(cards, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='store.product', verbose_name='продукт')),
+                ('name', models.CharField(max_length=255, verbose_name='название')),
+                ('slug_name', models.SlugField(verbose_name="'slug' значение")),
+                ('description', models.TextField(verbose_name='описание')),
+                ('category', models.CharField(db_index=True, max_length=255, verbose_name='категория')),
+                ('price_before', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='цена без скидки')),
+                ('price_after', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='цена со скидкой')),
+                ('discount', models.PositiveIntegerField(blank=True, null=True, verbose_name='скидка, %')),
+                ('rating', models.DecimalField(decimal_places=2, default=0.0, max_digits=3, verbose_name='средний рейтинг')),
+                ('review', models.PositiveIntegerField(default=0, verbose_name='число отзывов')),
+                ('sold_value', models.PositiveIntegerField(default=0, verbose_name='количество продаж')),
+                ('weight_in_stock', models.PositiveIntegerField(default=0, verbose_name='количество на складе')),
+                ('image', models.ImageField(blank=True, null=True, upload_to='static/products/', verbose_name='картинка')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Карточка продукта',
+                'verbose_name_plural': 'Карточки продуктов',
+            },
+        ),
+        migrations.RunPython(fill_product_cards, migrations.RunPython.noop),
+    ]
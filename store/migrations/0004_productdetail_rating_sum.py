@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:15
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_rating_sum(apps, schema_editor):
+    """Сумма оценок для уже заполненных подробностей: rating_mean * review_count (одним UPDATE)"""
+    ProductDetail = apps.get_model('store', 'ProductDetail')
+    ProductDetail.objects.update(rating_sum=F('rating_mean') * F('review_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_productcard_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productdetail',
+            name='rating_sum',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12, verbose_name='сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating_sum, migrations.RunPython.noop),
+    ]
@@ -95,6 +95,13 @@ class ProductDetail(models.Model):
         verbose_name="число отзывов"
     )  # Число отзывов
 
+    rating_sum = models.DecimalField(
+        default=0.0,
+        max_digits=12,
+        decimal_places=2,
+        verbose_name="сумма оценок"
+    )  # Сумма оценок отзывов (rating_mean = rating_sum / review_count, см. store/services.py)
+
     sold_value = models.PositiveIntegerField(
         default=0,
         verbose_name="количество продаж"
@@ -320,6 +327,118 @@ class Review(models.Model):
     class Meta:
         verbose_name = 'Отзыв'  # одиночная форма (для отображения в админ панели)
         verbose_name_plural = 'Отзывы'  # множественная форма (для отображения в админ панели)
+        indexes = [
+            # Постраничная выдача отзывов продукта по ключу (created_at, id), см. review_page
+            models.Index(fields=['product', 'created_at', 'id'], name='review_product_created_idx'),
+        ]
+
+
+class ProductCard(models.Model):
+    """
+    Денормализованная карточка продукта (read model) для страниц магазина.
+
+    Хранит всё, что нужно для отображения продукта в списке и на его странице
+    (итоговая цена, скидка, рейтинг, остаток, картинка), поэтому страницы строятся
+    одним запросом к одной таблице без соединений и вычислений.
+    Обновляется сигналами при изменении Product, ProductDetail, ProductDiscount и Category
+    (см. store/signals.py и store/services.py).
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name="продукт",
+    )  # Ссылка на продукт (является и первичным ключом карточки)
+
+    name = models.CharField(
+        max_length=255,
+        verbose_name="название"
+    )  # Название товара
+
+    slug_name = models.SlugField(
+        db_index=True,
+        verbose_name="'slug' значение"
+    )  # Slug название товара
+
+    description = models.TextField(
+        verbose_name="описание"
+    )  # Описание товара
+
+    category = models.CharField(
+        max_length=255,
+        db_index=True,
+        verbose_name="категория"
+    )  # Название категории
+
+    price_before = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name="цена без скидки"
+    )  # Цена без учета скидки
+
+    price_after = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name="цена со скидкой"
+    )  # Итоговая цена (если скидки нет, то совпадает с price_before)
+
+    discount = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="скидка, %"
+    )  # Значение скидки в процентах (None - скидки нет)
+
+    rating = models.DecimalField(
+        default=0.0,
+        max_digits=3,
+        decimal_places=2,
+        verbose_name="средний рейтинг"
+    )  # Средний рейтинг
+
+    review = models.PositiveIntegerField(
+        default=0,
+        verbose_name="число отзывов"
+    )  # Число отзывов
+
+    sold_value = models.PositiveIntegerField(
+        default=0,
+        verbose_name="количество продаж"
+    )  # Объём проданного товара
+
+    weight_in_stock = models.PositiveIntegerField(
+        default=0,
+        verbose_name="количество на складе"
+    )  # Загрузка товара на складе
+
+    image = models.ImageField(
+        upload_to='static/products/',
+        null=True,
+        blank=True,
+        verbose_name="картинка",
+    )  # Картинка товара (тот же файл, что и у продукта)
+
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )  # Дата и время обновления карточки
+
+    def __str__(self):
+        return f"Карточка продукта: {self.name!r}, Цена = {self.price_after}"
+
+    class Meta:
+        verbose_name = 'Карточка продукта'  # одиночная форма (для отображения в админ панели)
+        verbose_name_plural = 'Карточки продуктов'  # множественная форма (для отображения в админ панели)
+        # Составные индексы для постраничной выдачи по ключу в магазине:
+        # фильтр по категории + сортировка по полю + pk для однозначного порядка
+        indexes = [
+            models.Index(fields=['category', 'product'], name='card_category_idx'),
+            models.Index(fields=['category', 'price_after', 'product'], name='card_category_price_idx'),
+            models.Index(fields=['category', 'price_before', 'product'], name='card_category_price_b_idx'),
+            models.Index(fields=['category', 'rating', 'product'], name='card_category_rating_idx'),
+            models.Index(fields=['category', 'review', 'product'], name='card_category_review_idx'),
+            models.Index(fields=['category', 'sold_value', 'product'], name='card_category_sold_idx'),
+            models.Index(fields=['category', 'name', 'product'], name='card_category_name_idx'),
+        ]
 
 
 DATABASE = {'1': {'name': 'Болгарский перец',
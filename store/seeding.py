@@ -0,0 +1,198 @@
+"""
+Быстрое заполнение БД синтетическими данными (команда seed_database).
+
+В отличие от filling_database.py (create_user и .create() для каждой строки, asave через asyncio.gather)
+данные записываются пакетами через bulk_create, по одной транзакции на пакет:
+1. справочники (категории, единицы, валюта) из DATABASE - get_or_create;
+2. хэши паролей - make_password в пуле процессов (хэширование занимает основное время создания
+   пользователя и выполняется на всех ядрах); хэшируется --passwords различных паролей,
+   пользователю с номером n достаётся пароль n % passwords;
+3. пользователи и их корзины. bulk_create не отправляет сигналы, поэтому корзины, которые при
+   обычном создании пользователя создаёт cart/signals.py, создаются тем же пакетом;
+4. продукты, их подробности, скидки и карточки (ProductCard, см. store/signals.py) - тоже пакетом,
+   карточки собираются из уже созданных в памяти объектов без повторного чтения из БД.
+   Картинки DATABASE копируются в хранилище один раз и используются всеми продуктами.
+
+Размер пакета - число строк в одной транзакции, bulk_create дополнительно делит пакет
+на запросы по ограничению СУБД на число параметров запроса.
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from time import perf_counter
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from cart.models import Cart
+from .models import Product, ProductDetail, ProductDiscount, ProductCard, Category, Unit, Currency, DATABASE
+from .services import build_product_card
+
+SEED_PRODUCTS = 10000  # Число продуктов при scale=1 (scale=100 - 1 000 000 продуктов)
+SEED_USERS = 1000  # Число пользователей при scale=1 (scale=100 - 100 000 пользователей)
+SEED_PASSWORDS = 64  # Число различных паролей (и вычисляемых хэшей)
+SEED_BATCH_SIZE = 5000  # Сколько строк записывается за одну транзакцию
+
+CATEGORY_SLUGS = {'Овощи': 'vegetables', 'Фрукты': 'fruits', 'Соки': 'juices', 'Семена': 'seeds'}
+DISCOUNT_START = datetime(2023, month=12, day=1, tzinfo=dt_timezone.utc)
+DISCOUNT_END = datetime(2024, month=12, day=1, tzinfo=dt_timezone.utc)
+
+
+def seed_database(products: int = SEED_PRODUCTS, users: int = SEED_USERS, passwords: int = SEED_PASSWORDS,
+                  batch_size: int = SEED_BATCH_SIZE, workers: [None, int] = None, seed: int = 42,
+                  progress=None) -> dict:
+    """
+    Заполнение БД пользователями и продуктами.
+
+    :param products: Число продуктов.
+    :param users: Число пользователей.
+    :param passwords: Число различных паролей пользователей.
+    :param batch_size: Размер пакета.
+    :param workers: [Опционально] Число процессов для хэширования паролей (по умолчанию - число ядер).
+    :param seed: Начальное значение генератора случайных чисел (данные воспроизводимы).
+    :param progress: [Опционально] Функция, которая вызывается с названием этапа и временем его выполнения.
+    :return: {'timings': {этап: секунды}, 'users': [(username, пароль)], 'products': число продуктов}
+    """
+    rnd = random.Random(seed)
+    timings = {}
+
+    @contextmanager
+    def stage(name):
+        started = perf_counter()
+        yield
+        timings[name] = perf_counter() - started
+        if progress is not None:
+            progress(name, timings[name])
+
+    with stage('справочники'):
+        references = _create_references()
+    with stage('хэши паролей'):
+        plain_passwords = [f"seed-{rnd.getrandbits(48):012x}" for _ in range(max(1, min(passwords, users)))]
+        hashes = hash_passwords(plain_passwords, workers)
+    with stage('пользователи и корзины'):
+        credentials = _create_users(users, plain_passwords, hashes, batch_size)
+    with stage('картинки'):
+        images = _store_images()
+    with stage('продукты, подробности, скидки и карточки'):
+        created = _create_products(products, references, images, batch_size, rnd)
+    return {'timings': timings, 'users': credentials, 'products': created}
+
+
+def hash_passwords(passwords, workers: [None, int] = None) -> list:
+    """
+    Хэши паролей (make_password), вычисленные в пуле процессов.
+
+    :param passwords: Пароли.
+    :param workers: [Опционально] Число процессов (по умолчанию - число ядер).
+    :return: Хэши в порядке паролей.
+    """
+    if len(passwords) <= 1:
+        return [make_password(password) for password in passwords]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(passwords)), initializer=_init_worker,
+                             initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'),)) as executor:
+        return list(executor.map(make_password, passwords,
+                                 chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def _init_worker(settings_module: [None, str]) -> None:
+    """Настройка Django в процессе пула (при запуске процессов через spawn/forkserver)"""
+    import django
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    if not settings.configured:
+        django.setup()
+
+
+def _create_references() -> dict:
+    """Категории, единицы и валюта (создаются, если их ещё нет)"""
+    categories = {name: Category.objects.get_or_create(name=name, slug_name=slug)[0]
+                  for name, slug in CATEGORY_SLUGS.items()}
+    units = {'кг': Unit.objects.get_or_create(name='кг', defaults={'description': "Килограмм"})[0],
+             'л': Unit.objects.get_or_create(name='л', defaults={'description': "Литр"})[0]}
+    currency = Currency.objects.get_or_create(name='руб', defaults={'description': "Рубль"})[0]
+    return {'categories': categories, 'units': units, 'currency': currency}
+
+
+def _create_users(count: int, passwords: list, hashes: list, batch_size: int) -> list:
+    """Пользователи с корзинами. Имена продолжают нумерацию уже созданных командой пользователей"""
+    start = User.objects.filter(username__startswith='seed_user_').count()
+    credentials = []
+    for offset in range(0, count, batch_size):
+        numbers = range(start + offset, start + min(offset + batch_size, count))
+        batch = [User(username=f"seed_user_{n:07d}", email=f"seed_user_{n:07d}@example.com",
+                      password=hashes[n % len(hashes)])
+                 for n in numbers]
+        with transaction.atomic():
+            created = User.objects.bulk_create(batch, batch_size=batch_size)
+            # Корзины, которые при create_user создаёт сигнал (cart/signals.py)
+            Cart.objects.bulk_create([Cart(customer=user) for user in created], batch_size=batch_size)
+        credentials += [(user.username, passwords[n % len(passwords)]) for n, user in zip(numbers, created)]
+    return credentials
+
+
+def _store_images() -> dict:
+    """Картинки продуктов DATABASE в хранилище (копируются один раз): slug шаблона -> имя файла"""
+    images = {}
+    for product in DATABASE.values():
+        name = 'static/products/' + os.path.basename(product['url'])
+        if not default_storage.exists(name):
+            path = os.path.join(settings.BASE_DIR, 'store', 'static', *product['url'].split('/'))
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as image_file:
+                name = default_storage.save(name, File(image_file))
+        images[product['html']] = name
+    return images
+
+
+def _create_products(count: int, references: dict, images: dict, batch_size: int, rnd: random.Random) -> int:
+    """Продукты по шаблонам DATABASE с подробностями, скидками и карточками"""
+    templates = list(DATABASE.values())
+    start = Product.objects.count()
+    for offset in range(0, count, batch_size):
+        products, details, discounts = [], [], []
+        for n in range(start + offset, start + min(offset + batch_size, count)):
+            template = templates[n % len(templates)]
+            product = Product(name=f"{template['name']} №{n + 1}",
+                              slug_name=f"{template['html']}-{n + 1}",
+                              description=template['description'],
+                              unit=references['units']['л' if template['category'] == 'Соки' else 'кг'],
+                              quantity_per_unit=Decimal('1.000'),
+                              price=Decimal(rnd.randrange(5000, 100000)) / 100,
+                              currency=references['currency'],
+                              category=references['categories'][template['category']],
+                              image=images.get(template['html']))
+            review_count = rnd.randrange(0, 500)
+            rating_mean = Decimal(rnd.randrange(300, 501)) / 100 if review_count else Decimal('0.00')
+            details.append(ProductDetail(product=product,
+                                         rating_mean=rating_mean,
+                                         review_count=review_count,
+                                         rating_sum=rating_mean * review_count,
+                                         sold_value=rnd.randrange(0, 1000),
+                                         quantity_in_stock=rnd.randrange(0, 1000)))
+            product.details = details[-1]  # Связанные объекты в кэше продукта нужны build_product_card
+            if rnd.random() < 0.3:
+                discounts.append(ProductDiscount(product=product, value=rnd.choice((5, 10, 15, 20, 30)),
+                                                 is_percentage=True,
+                                                 start_date=DISCOUNT_START, end_date=DISCOUNT_END))
+                product.discount = discounts[-1]
+            else:
+                Product.discount.related.set_cached_value(product, None)  # Без запроса к БД
+            products.append(product)
+
+        with transaction.atomic():
+            Product.objects.bulk_create(products, batch_size=batch_size)
+            # product_id подробностей и скидок bulk_create берёт из уже созданных продуктов
+            ProductDetail.objects.bulk_create(details, batch_size=batch_size)
+            ProductDiscount.objects.bulk_create(discounts, batch_size=batch_size)
+            # Карточки, которые при обычном создании пересчитывают сигналы (store/signals.py)
+            ProductCard.objects.bulk_create([build_product_card(product) for product in products],
+                                            batch_size=batch_size)
+    return count
@@ -0,0 +1,181 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (Avg, Case, Count, DecimalField, ExpressionWrapper, F, FloatField, OuterRef,
+                              Q, Subquery, Sum, Value, When)
+from django.db.models.functions import Cast, Coalesce, Greatest
+from .models import Product, ProductCard, ProductDetail, Review
+
+# Поля карточки, которые обновляются при пересчёте (все, кроме первичного ключа)
+CARD_FIELDS = ['name', 'slug_name', 'description', 'category', 'price_before', 'price_after',
+               'discount', 'rating', 'review', 'sold_value', 'weight_in_stock', 'image']
+
+RATING_BATCH_SIZE = 1000  # Сколько продуктов пересчитывается одним UPDATE в recompute_product_ratings
+REVIEWS_PAGE_SIZE = 10  # Число отзывов на странице
+REVIEWS_CACHE_TIMEOUT = 600  # Время жизни кэша первой страницы отзывов, с (изменения отзывов сбрасывают кэш сразу)
+
+
+def build_product_card(product: Product) -> ProductCard:
+    """
+    Собирает карточку продукта из продукта и связанных с ним объектов.
+
+    :param product: Продукт с подгруженными category, details и discount (select_related).
+    :return: Несохранённый объект ProductCard.
+    """
+    details = getattr(product, 'details', None)
+    discount = getattr(product, 'discount', None)
+    price_after = product.price
+    if discount is not None:
+        # Скидка считается так же, как раньше в аннотациях представлений: price * (100 - value) / 100
+        price_after = (product.price * (100 - discount.value) / 100).quantize(Decimal('0.01'))
+    return ProductCard(
+        product=product,
+        name=product.name,
+        slug_name=product.slug_name,
+        description=product.description,
+        category=product.category.name,
+        price_before=product.price,
+        price_after=price_after,
+        discount=discount.value if discount is not None else None,
+        rating=details.rating_mean if details is not None else 0,
+        review=details.review_count if details is not None else 0,
+        sold_value=details.sold_value if details is not None else 0,
+        weight_in_stock=details.quantity_in_stock if details is not None else 0,
+        image=product.image.name or None,
+    )
+
+
+def refresh_product_cards(product_ids=None, batch_size: int = 1000) -> int:
+    """
+    Пересчитывает карточки продуктов.
+    Данные берутся одним запросом (с присоединением category, details, discount),
+    а карточки записываются пакетно через вставку с обновлением при конфликте (upsert).
+
+    :param product_ids: [Опционально] id продуктов. Если нет, то пересчитываются все карточки.
+    :param batch_size: Размер пакета записи.
+    :return: Число пересчитанных карточек.
+    """
+    products = Product.objects.select_related('category', 'details', 'discount')
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+
+    cards = [build_product_card(product) for product in products.iterator(chunk_size=batch_size)]
+    ProductCard.objects.bulk_create(cards,
+                                    batch_size=batch_size,
+                                    update_conflicts=True,
+                                    unique_fields=['product'],
+                                    update_fields=CARD_FIELDS)
+    return len(cards)
+
+
+def apply_review_rating(product_id: int, count_delta: int, sum_delta) -> None:
+    """
+    Инкрементальное обновление рейтинга продукта при добавлении, изменении или удалении отзыва.
+    Один UPDATE с F() выражениями - без пересчёта всех отзывов продукта, параллельные отзывы
+    не теряют изменения друг друга.
+
+    :param product_id: id продукта.
+    :param count_delta: Изменение числа отзывов (1 - добавлен, -1 - удалён, 0 - изменена оценка).
+    :param sum_delta: Изменение суммы оценок.
+    """
+    # В SET выражения ссылаются на старые значения полей, поэтому среднее считается от новых суммы и числа
+    review_count = Greatest(F('review_count') + count_delta, 0)
+    rating_sum = F('rating_sum') + Value(Decimal(sum_delta))
+    rating_mean = Case(
+        When(review_count__gt=-count_delta,
+             # Деление вещественное (в SQLite целая сумма оценок делилась бы нацело)
+             then=ExpressionWrapper(Cast(rating_sum, FloatField()) / review_count,
+                                    output_field=DecimalField(max_digits=3, decimal_places=2))),
+        default=Value(Decimal('0')),
+    )
+    ProductDetail.objects.filter(product_id=product_id).update(
+        review_count=review_count,
+        rating_sum=Case(When(review_count__gt=-count_delta, then=rating_sum), default=Value(Decimal('0'))),
+        rating_mean=rating_mean,
+    )
+    # update() не отправляет сигналы, карточка пересчитывается явно
+    transaction.on_commit(lambda: refresh_product_cards([product_id]))
+
+
+def recompute_product_ratings(batch_size: int = RATING_BATCH_SIZE) -> int:
+    """
+    Полный пересчёт рейтингов всех продуктов по отзывам (исправляет расхождения инкрементального обновления).
+    Продукты обходятся по возрастанию id пакетами по batch_size. Пакет - один UPDATE с подзапросами
+    к отзывам (по индексу review.product_id), поэтому БД не блокируется надолго, а сами отзывы
+    в память не загружаются.
+
+    :param batch_size: Размер пакета.
+    :return: Число пересчитанных продуктов.
+    """
+    reviews = Review.objects.filter(product_id=OuterRef('product_id')).values('product_id')
+    review_count = Coalesce(Subquery(reviews.annotate(value=Count('id')).values('value')), 0)
+    rating_sum = Coalesce(Subquery(reviews.annotate(value=Sum('rating')).values('value')), Value(Decimal('0')))
+    rating_mean = Coalesce(Subquery(reviews.annotate(value=Avg('rating')).values('value')), Value(Decimal('0')),
+                           output_field=DecimalField(max_digits=3, decimal_places=2))
+
+    recomputed = 0
+    last_id = 0
+    while True:
+        product_ids = list(ProductDetail.objects.filter(product_id__gt=last_id).order_by('product_id')
+                           .values_list('product_id', flat=True)[:batch_size])
+        if not product_ids:
+            return recomputed
+        with transaction.atomic():
+            ProductDetail.objects.filter(product_id__in=product_ids).update(
+                review_count=review_count, rating_sum=rating_sum, rating_mean=rating_mean)
+            refresh_product_cards(product_ids)
+        recomputed += len(product_ids)
+        last_id = product_ids[-1]
+
+
+def review_page(product_id: int, after: [None, tuple] = None) -> tuple:
+    """
+    Страница отзывов продукта от новых к старым с постраничной выдачей по ключу (created_at, id).
+    Страница - один запрос по индексу review_product_created_idx с присоединением пользователя
+    (select_related), стоимость не зависит от номера страницы. Первая страница кэшируется
+    до изменения отзывов продукта (см. invalidate_review_page).
+
+    :param product_id: id продукта.
+    :param after: [Опционально] Позиция (created_at, id) последнего отзыва предыдущей страницы.
+    :return: (список отзывов-словарей, позиция для следующей страницы или None)
+    """
+    if after is None:
+        key = _review_page_key(product_id)
+        page = cache.get(key)
+        if page is None:
+            page = _load_review_page(product_id, None)
+            cache.set(key, page, REVIEWS_CACHE_TIMEOUT)
+        return page
+    return _load_review_page(product_id, after)
+
+
+def invalidate_review_page(product_id: int) -> None:
+    """
+    Сброс кэша первой страницы отзывов продукта (после фиксации транзакции, как у итогов корзины).
+    Кэш общий для всех процессов сервера (см. CACHES в настройках), поэтому новый или удалённый
+    отзыв сразу виден во всех воркерах, а не через REVIEWS_CACHE_TIMEOUT.
+    """
+    transaction.on_commit(lambda: cache.delete(_review_page_key(product_id)))
+
+
+def _load_review_page(product_id: int, after: [None, tuple]) -> tuple:
+    reviews = Review.objects.filter(product_id=product_id).select_related('customer')
+    if after is not None:
+        created_at, review_id = after
+        reviews = reviews.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=review_id))
+    # Берём на один отзыв больше, чтобы понять, есть ли следующая страница
+    page = list(reviews.order_by('-created_at', '-id')[:REVIEWS_PAGE_SIZE + 1])
+    has_more = len(page) > REVIEWS_PAGE_SIZE
+    page = [{
+        'id': review.id,
+        'rating': review.rating,
+        'comment': review.comment,
+        'customer': review.customer.username if review.customer is not None else None,
+        'created_at': review.created_at,
+    } for review in page[:REVIEWS_PAGE_SIZE]]
+    next_position = (page[-1]['created_at'], page[-1]['id']) if has_more else None
+    return page, next_position
+
+
+def _review_page_key(product_id: int) -> str:
+    return f"review_page:{product_id}"
@@ -0,0 +1,77 @@
+from decimal import Decimal
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Product, ProductDetail, ProductDiscount, Category, Review
+from .services import refresh_product_cards, apply_review_rating, invalidate_review_page
+
+
+# Карточка продукта (ProductCard) - денормализованная копия данных продукта,
+# поэтому при изменении любого источника её данных карточка пересчитывается.
+# Удаление самого продукта удалит карточку каскадно (on_delete=models.CASCADE).
+@receiver(post_save, sender=Product)
+def refresh_card_on_product_save(sender, instance, **kwargs):
+    """Пересчёт карточки при создании или изменении продукта"""
+    refresh_product_cards([instance.id])
+
+
+@receiver(post_save, sender=ProductDetail)
+@receiver(post_delete, sender=ProductDetail)
+@receiver(post_save, sender=ProductDiscount)
+@receiver(post_delete, sender=ProductDiscount)
+def refresh_card_on_related_change(sender, instance, origin=None, **kwargs):
+    """Пересчёт карточки при изменении подробностей или скидки продукта"""
+    if isinstance(origin, Product) or getattr(origin, 'model', None) is Product:
+        return  # Удаляется сам продукт (каскадно), карточка будет удалена вместе с ним
+    refresh_product_cards([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+def refresh_cards_on_category_save(sender, instance, created, **kwargs):
+    """При переименовании категории пересчитываются карточки всех её продуктов"""
+    if not created:
+        refresh_product_cards(instance.product_set.values_list('id', flat=True))
+
+
+# Рейтинг продукта (ProductDetail.rating_mean, review_count, rating_sum) обновляется инкрементально
+# при каждом изменении отзыва. Полный пересчёт - команда recompute_ratings.
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    """Запоминание продукта и оценки отзыва до изменения (нужно для расчёта разницы)"""
+    instance._rating_before = None
+    if instance.pk is not None:
+        instance._rating_before = (Review.objects.filter(pk=instance.pk)
+                                   .values_list('product_id', 'rating').first())
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, created, **kwargs):
+    """Учёт нового или изменённого отзыва в рейтинге продукта"""
+    new_rating = Decimal(str(instance.rating))  # До перезагрузки из БД оценка может быть числом float
+    before = None if created else getattr(instance, '_rating_before', None)
+    if before is None:
+        apply_review_rating(instance.product_id, 1, new_rating)
+        return
+    product_id, rating = before
+    if product_id != instance.product_id:  # Отзыв перенесён на другой продукт
+        apply_review_rating(product_id, -1, -rating)
+        apply_review_rating(instance.product_id, 1, new_rating)
+    elif rating != new_rating:
+        apply_review_rating(product_id, 0, new_rating - rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, origin=None, **kwargs):
+    """Исключение удалённого отзыва из рейтинга продукта"""
+    if isinstance(origin, Product) or getattr(origin, 'model', None) is Product:
+        return  # Удаляется сам продукт (каскадно) вместе с подробностями
+    apply_review_rating(instance.product_id, -1, -Decimal(str(instance.rating)))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def reset_review_page(sender, instance, **kwargs):
+    """Сброс кэша первой страницы отзывов продукта (и прежнего продукта, если отзыв перенесён)"""
+    invalidate_review_page(instance.product_id)
+    before = getattr(instance, '_rating_before', None)
+    if before is not None and before[0] != instance.product_id:
+        invalidate_review_page(before[0])
@@ -1,3 +1,87 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from logic.catalog import CatalogIndex
+from logic.query_budget import assert_view_within_budget
+from .models import Product, ProductDetail, Category, Unit, Currency
+from .views import shop_view, products_page_view
 
-# Create your tests here.
+# Кэш в памяти процесса: тесты не должны видеть общий файловый кэш (см. CACHES)
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_products(count: int) -> list:
+    """Продукты с подробностями (карточки ProductCard создают сигналы store/signals.py)"""
+    category = Category.objects.create(name="Овощи", slug_name="vegetables")
+    unit = Unit.objects.create(name='кг')
+    currency = Currency.objects.create(name='руб')
+    products = []
+    for i in range(count):
+        product = Product.objects.create(name=f"Продукт {i}", slug_name=f"product-{i}", description='',
+                                         unit=unit, quantity_per_unit=1, price=100 + i, currency=currency,
+                                         category=category, image='static/products/product.jpg')
+        ProductDetail.objects.create(product=product, quantity_in_stock=10)
+        products.append(product)
+    return products
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTest(TestCase):
+    """Представления магазина укладываются в объявленный бюджет SQL запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(5)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_shop_view(self):
+        for url in ('/', '/?category=Овощи&ordering=price_after'):
+            response = assert_view_within_budget(self.client, url, shop_view)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['products']), len(self.products))
+
+    def test_products_page_view(self):
+        product = self.products[0]
+        for url in (f'/product/{product.slug_name}.html', f'/product/{product.pk}'):
+            response = assert_view_within_budget(self.client, url, products_page_view)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['product'].pk, product.pk)
+
+
+class CatalogIndexTest(SimpleTestCase):
+    """Индекс каталога (logic/catalog.py) после изменения товара на месте и вызова update"""
+
+    def test_update_after_in_place_change(self):
+        database = {str(i): {'category': 'a', 'price': i} for i in range(5)}
+        index = CatalogIndex(database)
+        index.query('a', 'price')  # Отсортированные списки строятся до изменения
+        index.query('a', 'price', reverse=True)
+
+        database['2']['price'] = 0
+        index.update('2', database['2'])
+        database['3']['price'] = 99
+        index.update('3', database['3'])
+
+        expected = sorted(database.values(), key=lambda product: product['price'])
+        self.assertEqual(index.query('a', 'price'), expected)
+        self.assertEqual(index.query('a', 'price', reverse=True),
+                         sorted(database.values(), key=lambda product: product['price'], reverse=True))
+        self.assertEqual([position for position, _ in index.iterate('a', 'price', after=(0, 0))],
+                         [(0, 2), (1, 1), (4, 4), (99, 3)])
+
+
+class ProductsViewTest(SimpleTestCase):
+    """Постраничная выдача API каталога /product/"""
+
+    def test_cursor_pages(self):
+        response = self.client.get('/product/', {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(len(page['results']), 2)
+        next_page = self.client.get('/product/', {'limit': 2, 'cursor': page['next']})
+        self.assertEqual(next_page.status_code, 200)
+        self.assertNotEqual(next_page.json()['results'][0], page['results'][0])
+
+    def test_zero_limit(self):
+        self.assertEqual(self.client.get('/product/', {'limit': 0}).status_code, 400)
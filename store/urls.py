@@ -1,7 +1,8 @@
 # urls.py in store
 
 from django.urls import path
-from .views import products_view, shop_view, products_page_view, coupon_check_view, delivery_estimate_view
+from .views import products_view, shop_view, products_page_view, product_reviews_view, coupon_check_view, \
+    delivery_estimate_view
 
 app_name = 'store'
 
@@ -10,6 +11,7 @@ urlpatterns = [
     path('', shop_view, name="shop_view"),
     path('product/<slug:page>.html', products_page_view, name="products_page_view"),
     path('product/<int:page>', products_page_view),
+    path('product/<int:page>/reviews/', product_reviews_view, name="product_reviews_view"),
 
     path('coupon/check/<slug:name_coupon>', coupon_check_view),
     path('delivery/estimate/', delivery_estimate_view),
@@ -1,79 +1,212 @@
+import binascii
+import json
+from datetime import datetime
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from itertools import islice
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponse, HttpResponseNotFound
+from django.http import JsonResponse, HttpResponse, HttpResponseNotFound, HttpResponseBadRequest, \
+    StreamingHttpResponse
 from .models import DATABASE
-from logic.services import filtering_category, view_in_cart, add_to_cart, remove_from_cart
+from logic.services import filtering_category, view_in_cart, add_to_cart, remove_from_cart, CATALOG_INDEX
 from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
-from .models import Product
-from django.db.models import F
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.exceptions import ValidationError
+from .models import Product, ProductCard
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
+from logic.query_budget import query_budget
+from .services import review_page
+from promotion.services import find_promotion
+from delivery.models import ShippingAddress
+from delivery.services import quote_delivery
+from cart.services import cart_summary
+
+
+PRODUCTS_MAX_LIMIT = 1000  # Максимальное число товаров на одной странице /product/
 
 
 def products_view(request):
+    """
+    API каталога товаров.
+
+    Параметры запроса:
+    - id - вернуть один товар;
+    - category, ordering, reverse - фильтрация и сортировка (см. filtering_category);
+    - limit (не меньше 1), offset - постраничная выдача по смещению;
+    - cursor - постраничная выдача по курсору из поля "next" предыдущей страницы
+      (стоимость получения страницы не зависит от её номера);
+    - fields - список полей через запятую, которые нужно вернуть (например, fields=id,name,price_after);
+    - stream=true - ответ отдаётся потоково (StreamingHttpResponse), по мере обхода товаров;
+    - pretty=true - ответ с отступами (по умолчанию ответ компактный).
+
+    Без limit и cursor возвращается список всех подходящих товаров. С limit или cursor возвращается
+    словарь {"results": [...], "next": курсор следующей страницы или null}.
+    """
     if request.method == "GET":
+        json_dumps_params = {'ensure_ascii': False}
+        if request.GET.get("pretty") in ('true', 'True'):
+            json_dumps_params['indent'] = 4
+        fields = [field for field in request.GET.get("fields", "").split(",") if field]
+
         # Обработка id из параметров запроса
         if id_product := request.GET.get("id"):
             if data := DATABASE.get(id_product):
-                return JsonResponse(data, json_dumps_params={'ensure_ascii': False,
-                                                             'indent': 4})
+                return JsonResponse(_project(data, fields), json_dumps_params=json_dumps_params)
             return HttpResponseNotFound("Данного продукта нет в базе данных")
 
         # Обработка фильтрации из параметров запроса
         category_key = request.GET.get("category")
-        if ordering_key := request.GET.get("ordering"):
-            if request.GET.get("reverse") in ('true', 'True'):
-                data = filtering_category(DATABASE, category_key, ordering_key, True)
-            else:
-                data = filtering_category(DATABASE, category_key, ordering_key)
-        else:
-            data = filtering_category(DATABASE, category_key)
-        # В этот раз добавляем параметр safe=False, для корректного отображения списка в JSON
-        return JsonResponse(data, safe=False, json_dumps_params={'ensure_ascii': False,
-                                                                 'indent': 4})
+        ordering_key = request.GET.get("ordering")
+        reverse = request.GET.get("reverse") in ('true', 'True')
+
+        try:
+            limit = _positive_int(request.GET.get("limit"), PRODUCTS_MAX_LIMIT, minimum=1)
+            offset = _positive_int(request.GET.get("offset")) or 0
+            cursor = _decode_cursor(request.GET.get("cursor"))
+        except ValueError:
+            return HttpResponseBadRequest("Неверные параметры постраничной выдачи")
+        paginate = limit is not None or cursor is not None
+        if paginate and limit is None:
+            limit = PRODUCTS_MAX_LIMIT
+
+        try:
+            items = CATALOG_INDEX.iterate(category_key, ordering_key, reverse, after=cursor)
+        except (TypeError, KeyError, ValueError):
+            return HttpResponseBadRequest("Неверный ключ сортировки или курсор")
+        # Берём на один товар больше, чтобы понять, есть ли следующая страница
+        items = islice(items, offset, None if limit is None else offset + limit + 1)
+        chunks = _products_json(items, fields, limit, paginate, json_dumps_params)
+
+        if request.GET.get("stream") in ('true', 'True'):
+            return StreamingHttpResponse(chunks, content_type='application/json')
+        return HttpResponse(''.join(chunks), content_type='application/json')
+
+
+def _products_json(items, fields: list, limit: [None, int], paginate: bool, json_dumps_params: dict):
+    """
+    Генератор JSON ответа /product/ по частям: товары сериализуются по одному по мере обхода,
+    поэтому при потоковой выдаче первый байт уходит клиенту сразу, а весь список не строится в памяти.
+    """
+    separator = ',\n' if 'indent' in json_dumps_params else ','
+    yield '{"results": [' if paginate else '['
+    next_cursor = None
+    last_position = None
+    for number, (position, product) in enumerate(items):
+        if number == limit:  # Есть товар после последнего на странице - значит, есть следующая страница
+            next_cursor = _encode_cursor(last_position)
+            break
+        yield (separator if number else '') + json.dumps(_project(product, fields), **json_dumps_params)
+        last_position = position
+    if paginate:
+        yield '], "next": ' + json.dumps(next_cursor) + '}'
+    else:
+        yield ']'
+
+
+def _project(product: dict, fields: list) -> dict:
+    """Оставляет в товаре только запрошенные поля (если поля не заданы - все поля)"""
+    if not fields:
+        return product
+    return {field: product[field] for field in fields if field in product}
+
+
+def _positive_int(value: [None, str], maximum: [None, int] = None, minimum: int = 0) -> [None, int]:
+    """Разбор целого не меньше minimum из параметра запроса (с ограничением сверху)"""
+    if value is None:
+        return None
+    value = int(value)
+    if value < minimum:
+        raise ValueError(value)
+    return value if maximum is None else min(value, maximum)
 
 
+def _encode_cursor(position: tuple) -> str:
+    """Курсор - позиция в индексе каталога, закодированная в строку для адресной строки"""
+    return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _decode_cursor(cursor: [None, str]) -> [None, tuple]:
+    if not cursor:
+        return None
+    try:
+        position = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError(cursor)
+    if not isinstance(position, list) or not 1 <= len(position) <= 2:
+        raise ValueError(cursor)
+    return tuple(position)
+
+
+@query_budget(2)
 def products_page_view(request, page):
     if request.method == "GET":
+        # Страница продукта строится по денормализованной карточке ProductCard:
+        # один запрос по индексу (slug_name или первичный ключ) без соединений и вычислений.
+        # Второй запрос - первая страница отзывов (если её нет в кэше)
         if isinstance(page, str):
             # Получение продукта по полю slug_name.
-            product = Product.objects.filter(slug_name=page)
-            # Создание запроса с дополнительными полями
-            # (поля сделаны так, чтобы минимизировать изменения в коде product.html)
-            product = product.annotate(
-                price_before=F("price"),
-                price_after=F("price_before") * (
-                            100 - F("discount__value")) / 100,
-                review=F("details__review_count"),
-                rating=F("details__rating_mean"),
-                sold_value=F("details__sold_value"),
-                weight_in_stock=F("details__quantity_in_stock"),
-            )
-            product = product.first()  # Получение первого элемента из QuerySet
-
+            product = ProductCard.objects.filter(slug_name=page).first()
+            if product is None:
+                return HttpResponseNotFound("Данного продукта нет в базе данных")
             return render(request, "store/product.html",
-                          context={"product": product})
+                          context={"product": product, **_reviews_context(product.pk)})
 
         elif isinstance(page, int):
             # Обрабатываем условие того, что пытаемся получить страницу товара по его id
-            data = DATABASE.get(str(page))  # Получаем какой странице соответствует данный id
+            product = get_object_or_404(ProductCard, pk=page)
+            return render(request, "store/product.html",
+                          context={"product": product, **_reviews_context(product.pk)})
+
+        return HttpResponse(status=404)
 
-            # Можно сделать и одни запросом при помощи метода get. Метод get возвращает только один объект, всегда.
-            # get не возвращает QuerySet, поэтому после get нельзя делать аннотации, фильтры, и т.д.
 
-            product = Product.objects.annotate(
-                price_before=F("price"),
-                price_after=F("price_before") * (
-                        100 - F("discount__value")) / 100,
-                review=F("details__review_count"),
-                rating=F("details__rating_mean"),
-                sold_value=F("details__sold_value"),
-                weight_in_stock=F("details__quantity_in_stock"),
-            ).get(id=page)
+@query_budget(1)
+def product_reviews_view(request, page):
+    """
+    Отзывы продукта (от новых к старым) с постраничной выдачей по ключу (created_at, id).
 
-            return render(request, "store/product.html",
-                          context={"product": product})
+    Параметры запроса:
+    - after - курсор из поля "next" предыдущей страницы;
+    - fragment=true - вернуть HTML фрагмент (store/reviews.html) для подгрузки на страницу продукта.
+
+    Ответ: {"results": [...], "next": курсор следующей страницы или null}.
+    Первая страница отдаётся из кэша без запросов к БД.
+    """
+    if request.method == "GET":
+        try:
+            after = _decode_review_cursor(request.GET.get("after"))
+        except ValueError:
+            return HttpResponseBadRequest("Неверный курсор")
+        reviews, next_position = review_page(page, after)
+        next_cursor = _encode_review_cursor(next_position)
+        if request.GET.get("fragment") in ('true', 'True'):
+            return render(request, "store/reviews.html",
+                          context={"product_id": page, "reviews": reviews, "reviews_next": next_cursor})
+        return JsonResponse({"results": reviews, "next": next_cursor}, json_dumps_params={'ensure_ascii': False})
+
+
+def _reviews_context(product_id: int) -> dict:
+    """Первая страница отзывов для шаблона страницы продукта"""
+    reviews, next_position = review_page(product_id)
+    next_cursor = _encode_review_cursor(next_position)
+    return {"reviews": reviews, "reviews_next": next_cursor}
 
-        return HttpResponse(status=404)
+
+def _encode_review_cursor(position: [None, tuple]) -> [None, str]:
+    """Курсор отзывов - пара (created_at в формате ISO, id)"""
+    if position is None:
+        return None
+    return _encode_cursor([position[0].isoformat(), position[1]])
+
+
+def _decode_review_cursor(cursor: [None, str]) -> [None, tuple]:
+    position = _decode_cursor(cursor)
+    if position is None:
+        return None
+    if len(position) != 2 or not isinstance(position[0], str) or type(position[1]) is not int:
+        raise ValueError(cursor)
+    return datetime.fromisoformat(position[0]), position[1]
 
 
 # def products_page_view(request, page):  # для решения последней доп. задачи
@@ -103,75 +236,183 @@ def products_page_view(request, page):
 #         return HttpResponse(status=404)
 
 
+# Поля карточки продукта, по которым разрешена сортировка в магазине
+SHOP_ORDERING_FIELDS = {'name', 'price_before', 'price_after', 'discount', 'rating', 'review', 'sold_value'}
+SHOP_PAGE_SIZE = 8  # Число товаров на странице магазина
+
+
+@query_budget(1)
 def shop_view(request):
+    """
+    Страница магазина с постраничной выдачей по ключу (keyset pagination).
+
+    Вместо OFFSET страница ищется условием "после/до последнего показанного товара" по паре
+    (значение поля сортировки, pk), поэтому любая страница, даже очень далёкая от начала,
+    стоит столько же, сколько первая (используются составные индексы ProductCard).
+    Параметры after и before - курсоры следующей и предыдущей страницы.
+    """
     if request.method == "GET":
-        products = Product.objects.all().annotate(
-            price_before=F("price"),
-            price_after=F("price_before")*(100-F("discount__value"))/100
-        )
+        # Список строится по денормализованным карточкам ProductCard, в которых уже посчитана
+        # итоговая цена и лежат скидка и картинка, поэтому шаблону не нужны дополнительные запросы
+        products = ProductCard.objects.all()
+        ordering_key = None
+        reverse = False
         # Обработка фильтрации из параметров запроса
         if category_key := request.GET.get("category"):  # Если существует category в адресной строке
-            if ordering_key := request.GET.get("ordering"):   # Если существует ordering в адресной строке
-                if request.GET.get("reverse") in ('true', 'True'):
-                    data = products.filter(category__name=category_key).order_by(f"-{ordering_key}")
-                else:
-                    data = products.filter(category__name=category_key).order_by(ordering_key)
-            else:
-                data = products.filter(category__name=category_key)
-        else:
-            data = products
-
-        # # Добавляем пагинацию
-        # page = request.GET.get('page', 1)
-        # paginator = Paginator(data, 5)  # Разбиваем на 5 элементов на странице
-        # try:
-        #     data = paginator.page(page)
-        # except PageNotAnInteger:
-        #     data = paginator.page(1)
-        # except EmptyPage:
-        #     data = paginator.page(paginator.num_pages)
-        #
+            products = products.filter(category=category_key)
+            if request.GET.get("ordering") in SHOP_ORDERING_FIELDS:   # Если существует ordering в адресной строке
+                ordering_key = request.GET.get("ordering")
+                reverse = request.GET.get("reverse") in ('true', 'True')
+
+        try:
+            after = _shop_cursor(_decode_cursor(request.GET.get("after")), ordering_key)
+            before = _shop_cursor(_decode_cursor(request.GET.get("before")), ordering_key)
+        except ValueError:
+            return HttpResponseBadRequest("Неверный курсор")
+
+        data, prev_cursor, next_cursor = _keyset_page(products, ordering_key, reverse, after, before)
+
         return render(request, 'store/shop.html',
                       context={"products": data,
-                               "category": category_key})
+                               "category": category_key,
+                               "prev_query": _page_query(request, "before", prev_cursor),
+                               "next_query": _page_query(request, "after", next_cursor)})
+
+
+def _shop_cursor(cursor: [None, tuple], ordering_key: [None, str]) -> [None, tuple]:
+    """
+    Курсор магазина (значение поля сортировки, pk) в типах полей карточки, чтобы значение
+    неподходящего типа не дошло до запроса к БД.
+
+    :raises ValueError: Курсор не подходит для сортировки.
+    """
+    if cursor is None:
+        return None
+    if len(cursor) != 2 or None in cursor:
+        raise ValueError(cursor)
+    value, pk = cursor
+    try:
+        pk = ProductCard._meta.pk.to_python(pk)
+        if ordering_key is not None:
+            value = ProductCard._meta.get_field(ordering_key).to_python(value)
+    except ValidationError as error:
+        raise ValueError(cursor) from error
+    return value, pk
+
+
+def _keyset_page(products, ordering_key: [None, str], reverse: bool,
+                 after: [None, tuple], before: [None, tuple]):
+    """
+    Страница товаров по ключу сортировки с pk в качестве второго ключа (для однозначного порядка).
+
+    :return: (товары страницы, курсор предыдущей страницы или None, курсор следующей страницы или None)
+    """
+    key = ordering_key or 'pk'
+    if key == 'discount':
+        # У товаров без скидки discount = NULL, а NULL нельзя сравнивать, поэтому считаем его нулём
+        products = products.annotate(sort_discount=Coalesce('discount', 0))
+        key = 'sort_discount'
+
+    backward = before is not None  # Идём к предыдущей странице - сортировка в обратную сторону
+    descending = reverse != backward
+    cursor = before if backward else after
+    if cursor is not None and key == 'pk':
+        cursor = (cursor[1], cursor[1])
+    if cursor is not None:
+        value, pk = cursor
+        if descending:
+            condition = Q(**{f"{key}__lt": value}) | Q(**{key: value, "pk__lt": pk})
+        else:
+            condition = Q(**{f"{key}__gt": value}) | Q(**{key: value, "pk__gt": pk})
+        products = products.filter(condition)
+
+    order = [f"-{key}", "-pk"] if descending else [key, "pk"]
+    if key == 'pk':
+        order = order[1:]
+    # Берём на один товар больше, чтобы понять, есть ли ещё страница в этом направлении
+    page = list(products.order_by(*order)[:SHOP_PAGE_SIZE + 1])
+    has_more = len(page) > SHOP_PAGE_SIZE
+    page = page[:SHOP_PAGE_SIZE]
+    if backward:
+        page.reverse()
+
+    def position(card):
+        return [str(getattr(card, key)), card.pk]
+
+    prev_cursor = next_cursor = None
+    if page:
+        if backward:
+            prev_cursor = position(page[0]) if has_more else None
+            next_cursor = position(page[-1])
+        else:
+            prev_cursor = position(page[0]) if after is not None else None
+            next_cursor = position(page[-1]) if has_more else None
+    return page, prev_cursor, next_cursor
+
+
+def _page_query(request, name: str, cursor: [None, list]) -> [None, str]:
+    """Параметры адресной строки для перехода на другую страницу (фильтры и сортировка сохраняются)"""
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query.pop("after", None)
+    query.pop("before", None)
+    query[name] = _encode_cursor(cursor)
+    return query.urlencode()
 
 
 def coupon_check_view(request, name_coupon):
-    # DATA_COUPON - база данных купонов: ключ - код купона (name_coupon); значение - словарь со значением скидки в процентах и
-    # значением действителен ли купон или нет
-    DATA_COUPON = {
-        "coupon": {
-            "value": 10,
-            "is_valid": True},
-        "coupon_old": {
-            "value": 20,
-            "is_valid": False},
-    }
-    if request.method == "GET":
-        # Проверьте, что купон есть в DATA_COUPON, если он есть, то верните JsonResponse в котором по ключу "discount"
-        # получают значение скидки в процентах, а по ключу "is_valid" понимают действителен ли купон или нет (True, False)
+    """
+    Проверка промокода. Промоакция ищется в индексе промоакций в памяти (promotion/services.py),
+    без запросов к БД.
 
-        # Если купона нет в базе, то верните HttpResponseNotFound("Неверный купон")
-        if name_coupon in DATA_COUPON:
-            coupon = DATA_COUPON[name_coupon]
-            return JsonResponse({"discount": coupon["value"], "is_valid": coupon["is_valid"]})
-        return HttpResponseNotFound("Неверный купон")
+    Ответ: {"discount": размер скидки (0, если промоакция без скидки), "is_percentage": скидка в процентах,
+    "is_valid": действует ли промоакция сейчас, "free_shipping": бесплатная доставка,
+    "buy_get": {"buy_quantity": ..., "get_quantity": ...} или null}.
+    Если промокода нет (или промоакция выключена, или закончилась), то HttpResponseNotFound("Неверный купон").
+    """
+    if request.method == "GET":
+        promotion = find_promotion(name_coupon)
+        if promotion is None:
+            return HttpResponseNotFound("Неверный купон")
+        discount = promotion["discount"] or {"value": 0, "is_percentage": True}
+        return JsonResponse({"discount": float(discount["value"]),
+                             "is_percentage": discount["is_percentage"],
+                             "is_valid": promotion["is_valid"],
+                             "free_shipping": promotion["free_shipping"],
+                             "buy_get": promotion["buy_get"]})
 
 
 def delivery_estimate_view(request):
-    # База данных по стоимости доставки. Ключ - Страна; Значение словарь с городами и ценами; Значение с ключом fix_price
-    # применяется если нет города в данной стране
-    DATA_PRICE = {
-        "Россия": {
-            "Москва": {"price": 80},
-            "Санкт-Петербург": {"price": 80},
-            "fix_price": 100,
-        },
-    }
+    """
+    Стоимость доставки корзины по тарифам доставки (delivery/services.py).
+
+    Адрес доставки:
+    - country, city (или state), code - страна, город (область) и почтовый индекс из параметров запроса;
+    - address - id адреса доставки (ShippingAddress) пользователя;
+    - без параметров - адрес доставки пользователя по умолчанию.
+    Вес заказа берётся из итогов корзины пользователя (кэшируются, см. cart_summary), поэтому
+    при заданном в запросе адресе и закэшированных итогах расчёт выполняется без запросов к БД.
+
+    Ответ: {"price": стоимость доставки, "weight": вес корзины, кг, "match": по чему выбран тариф}.
+    Если адреса или подходящего тарифа нет, то HttpResponseNotFound("Неверные данные").
+    """
     if request.method == "GET":
         data = request.GET
-        if country := DATA_PRICE.get(data.get('country')):
-            if city := country.get(data.get('city')):
-                return JsonResponse({"price": city["price"]})
-            return JsonResponse({"price": country["fix_price"]})
-        return HttpResponseNotFound("Неверные данные")
+        country, regions, postal_code = data.get('country'), [data.get('city'), data.get('state')], data.get('code')
+        if not country and request.user.is_authenticated:
+            addresses = ShippingAddress.objects.filter(customer=request.user)
+            if address_id := data.get('address'):
+                addresses = addresses.filter(pk=address_id) if address_id.isdigit() else addresses.none()
+            address = addresses.order_by('-is_default', '-pk').first()
+            if address is not None:
+                country, regions, postal_code = address.country, [address.city, address.state], address.postal_code
+        if not country:
+            return HttpResponseNotFound("Неверные данные")
+
+        weight = cart_summary(request.user)['weight'] if request.user.is_authenticated else 0
+        quote = quote_delivery(country, [region for region in regions if region], postal_code or '', weight)
+        if quote is None:
+            return HttpResponseNotFound("Неверные данные")
+        return JsonResponse({"price": float(quote["price"]), "weight": float(weight), "match": quote["match"]},
+                            json_dumps_params={'ensure_ascii': False})
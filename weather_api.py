@@ -1,4 +1,13 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+import httpx
 import requests
+import requests.adapters
+from asgiref.sync import sync_to_async
+from collections import OrderedDict
 from datetime import datetime
 
 DIRECTION_TRANSFORM = {
@@ -22,28 +31,493 @@ DIRECTION_TRANSFORM = {
 }
 
 
+class WeatherProviderError(Exception):
+    """Ошибка получения погоды: API недоступен, ответил ошибкой или данными в неожиданном формате"""
+
+
+class CircuitOpenError(WeatherProviderError):
+    """Запрос к API не отправлялся: автомат (CircuitBreaker) разомкнут"""
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для запросов к внешнему API.
+
+    - closed (замкнут): запросы идут в API. После failure_threshold ошибок подряд
+      (медленный ответ, дольше latency_threshold секунд, тоже считается ошибкой) размыкается.
+    - open (разомкнут): запросы сразу отклоняются (CircuitOpenError), без ожидания API.
+      Через recovery_timeout секунд переходит в half_open.
+    - half_open (полуоткрыт): пропускает не больше half_open_max_calls пробных запросов.
+      Успешный пробный запрос замыкает автомат, ошибка - снова размыкает.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30,
+                 latency_threshold: float = 2.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.latency_threshold = latency_threshold
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes = 0  # Пробных запросов в полуоткрытом состоянии, которые ещё выполняются
+        self._counters = dict.fromkeys(('successes', 'failures', 'slow_calls', 'rejected', 'opened'), 0)
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Можно ли отправить запрос. Если да, то по его итогу нужно вызвать record_success, record_failure
+        или release (запрос прерван без результата), иначе пробный запрос полуоткрытого автомата
+        останется занятым навсегда.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self._counters['rejected'] += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self._counters['rejected'] += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self, latency: float) -> None:
+        """Запрос выполнен за latency секунд (слишком медленный ответ считается ошибкой)"""
+        if latency > self.latency_threshold:
+            with self._lock:
+                self._counters['slow_calls'] += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self._counters['successes'] += 1
+            self._consecutive_failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._counters['failures'] += 1
+            self._consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self._counters['opened'] += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Разрешённый запрос прерван без результата (например, задача отменена): освобождает место пробного запроса"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def snapshot(self) -> dict:
+        """Состояние и счётчики для метрик"""
+        with self._lock:
+            retry_in = 0.0
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+            return {'state': self.state, 'consecutive_failures': self._consecutive_failures,
+                    'retry_in': round(retry_in, 3), **self._counters}
+
+
+class YandexWeatherProvider:
+    """
+    Провайдер погоды Яндекс.
+
+    Синхронные запросы (fetch) идут через одну requests.Session на процесс (соединения
+    с API переиспользуются, не нужно заново устанавливать TCP и TLS соединение на каждый
+    запрос), асинхронные (afetch) - через httpx.AsyncClient текущего цикла событий (цикл должен
+    жить весь процесс, как под ASGI сервером, см. acurrent_weather).
+    Таймауты не дают медленному ответу API занимать воркер бесконечно.
+    """
+
+    def __init__(self, token: str, url: str = "https://api.weather.yandex.ru/v2/forecast",
+                 timeout: tuple = (3.05, 5), pool_size: int = 10):
+        """
+        :param token: Ключ API.
+        :param url: Адрес API (можно подменить, например, на локальную заглушку).
+        :param timeout: Таймауты (на подключение, на чтение ответа) в секундах.
+        :param pool_size: Размер пула соединений.
+        """
+        self.url = url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.headers = {"X-Yandex-API-Key": token}
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Асинхронный клиент привязан к циклу событий, поэтому у каждого цикла свой
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def fetch(self, lat: float, lon: float) -> dict:
+        """
+        Запрос текущей погоды в точке. Возвращает словарь в формате current_weather.
+        При любой ошибке (сеть, таймаут, статус ответа, формат данных) - WeatherProviderError.
+        """
+        try:
+            response = self.session.get(self.url, params={"lat": lat, "lon": lon}, timeout=self.timeout)
+            response.raise_for_status()
+            return parse_yandex_weather(response.json())
+        except (requests.RequestException, ValueError) as error:
+            raise WeatherProviderError(f"Ошибка API погоды: {error!r}") from error
+
+    async def afetch(self, lat: float, lon: float) -> dict:
+        """Асинхронный аналог fetch: ожидание ответа API не занимает поток"""
+        try:
+            response = await self._async_client().get(self.url, params={"lat": lat, "lon": lon})
+            response.raise_for_status()
+            return parse_yandex_weather(response.json())
+        except (httpx.HTTPError, ValueError) as error:
+            raise WeatherProviderError(f"Ошибка API погоды: {error!r}") from error
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            connect, read = self.timeout
+            client = self._async_clients[loop] = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=self.pool_size * 10,
+                                    max_keepalive_connections=self.pool_size),
+            )
+        return client
+
+
+class FakeWeatherProvider:
+    """
+    Провайдер-заглушка для работы без сети (тесты, локальная разработка).
+    Можно задать задержку ответа и ошибку, которую нужно выбрасывать.
+    """
+
+    def __init__(self, delay: float = 0.0, error: [None, Exception] = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0  # Сколько раз провайдер был вызван (для проверки кэша)
+
+    def fetch(self, lat: float, lon: float) -> dict:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self._weather(lat, lon)
+
+    async def afetch(self, lat: float, lon: float) -> dict:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self._weather(lat, lon)
+
+    @staticmethod
+    def _weather(lat: float, lon: float) -> dict:
+        return {
+            'city': f"Точка {lat}, {lon}",
+            'time': datetime.now().strftime("%H:%M"),
+            'temp': 5,
+            'feels_like_temp': 2,
+            'pressure': 760,
+            'humidity': 80,
+            'wind_speed': 3.0,
+            'wind_gust': 6.0,
+            'wind_dir': DIRECTION_TRANSFORM['nw'],
+        }
+
+
+class WeatherService:
+    """
+    Кэширующий слой над провайдером погоды.
+
+    - Ответы кэшируются на ttl секунд по координатам, округлённым до precision знаков
+      (0.01 градуса - около 1 км), поэтому соседние запросы попадают в один ключ.
+    - Одновременные запросы одного ключа объединяются (single-flight): к провайдеру
+      уходит один запрос, остальные ждут его результат.
+    - Устаревшее значение (не старше ttl + stale_ttl) отдаётся сразу, а обновление
+      запускается в фоне (stale-while-revalidate), поэтому пользователь не ждёт API.
+
+    - Запросы к провайдеру идут через CircuitBreaker: если API недоступен или отвечает
+      слишком медленно, запросы отклоняются сразу, а пользователю отдаётся последнее
+      известное значение из кэша (даже старше ttl + stale_ttl) с признаком degraded.
+      Если значения в кэше нет, выбрасывается WeatherProviderError.
+
+    get - для синхронного кода (потоки), aget - для асинхронного (цикл событий).
+    Кэш у них общий.
+    """
+
+    def __init__(self, provider, ttl: float = 600, stale_ttl: float = 3600,
+                 precision: int = 2, max_entries: int = 10000,
+                 breaker: [None, CircuitBreaker] = None):
+        self.provider = provider
+        self.breaker = breaker or CircuitBreaker()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.precision = precision
+        self.max_entries = max_entries
+        self._cache = OrderedDict()  # ключ -> (время получения, данные), в порядке использования (LRU)
+        self._inflight = {}  # ключ -> threading.Event запроса, который сейчас выполняется
+        # цикл событий -> {ключ: asyncio.Task запроса, который сейчас выполняется}
+        self._async_inflight = weakref.WeakKeyDictionary()
+        self._counters = dict.fromkeys(('hits', 'stale_hits', 'misses', 'fallbacks'), 0)
+        self._lock = threading.Lock()
+
+    def key(self, lat, lon) -> tuple:
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def get(self, lat, lon) -> dict:
+        """
+        Текущая погода в точке (из кэша или от провайдера).
+
+        :param lat: Широта (число или строка).
+        :param lon: Долгота (число или строка).
+        :return: Словарь в формате current_weather.
+        """
+        key = self.key(lat, lon)
+        try:
+            return self._get(key)
+        except WeatherProviderError as error:
+            return self._fallback(key, error)
+
+    def _get(self, key: tuple) -> dict:
+        with self._lock:
+            data, fresh = self._lookup(key)
+            if data is not None:
+                if not fresh and key not in self._inflight:
+                    # Отдаём устаревшее значение, а обновляем в фоне
+                    self._inflight[key] = threading.Event()
+                    threading.Thread(target=self._refresh_quietly, args=(key,), daemon=True).start()
+                return data
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            # Такой же запрос уже выполняется - ждём его результат
+            event.wait()
+            with self._lock:
+                data, _ = self._lookup(key)
+            if data is not None:
+                return data
+            # Запрос-лидер завершился ошибкой - пробуем сами
+        return self._refresh(key)
+
+    async def aget(self, lat, lon) -> dict:
+        """
+        Асинхронный аналог get (провайдер должен поддерживать afetch).
+
+        :param lat: Широта (число или строка).
+        :param lon: Долгота (число или строка).
+        :return: Словарь в формате current_weather.
+        """
+        key = self.key(lat, lon)
+        try:
+            return await self._aget(key)
+        except WeatherProviderError as error:
+            return self._fallback(key, error)
+
+    async def _aget(self, key: tuple) -> dict:
+        with self._lock:
+            data, fresh = self._lookup(key)
+        inflight = self._async_inflight.setdefault(asyncio.get_running_loop(), {})
+        task = inflight.get(key)
+        if data is not None:
+            if not fresh and task is None:
+                task = inflight[key] = asyncio.create_task(self._arefresh(key, inflight))
+                task.add_done_callback(_ignore_provider_error)
+            return data
+        if task is None:
+            task = inflight[key] = asyncio.create_task(self._arefresh(key, inflight))
+        # shield: отмена одного ожидающего не отменяет общий запрос для остальных
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """Метрики: состояние автомата и счётчики кэша"""
+        with self._lock:
+            cache = {'entries': len(self._cache), **self._counters}
+        return {'breaker': self.breaker.snapshot(), 'cache': cache}
+
+    def _lookup(self, key: tuple) -> tuple:
+        """
+        Значение из кэша (вызывать под self._lock).
+
+        :return: (данные, свежие ли они). Если значения нет или оно старше ttl + stale_ttl, то (None, False).
+        """
+        cached = self._cache.get(key)
+        age = None if cached is None else time.monotonic() - cached[0]
+        if age is None or age >= self.ttl + self.stale_ttl:
+            self._counters['misses'] += 1
+            return None, False
+        self._cache.move_to_end(key)
+        self._counters['hits' if age < self.ttl else 'stale_hits'] += 1
+        return cached[1], age < self.ttl
+
+    def _fallback(self, key: tuple, error: WeatherProviderError) -> dict:
+        """Последнее известное значение (любой давности), когда провайдер недоступен"""
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                raise error
+            self._counters['fallbacks'] += 1
+        return {**cached[1], 'degraded': True}
+
+    def _store(self, key: tuple, data: dict) -> None:
+        with self._lock:
+            self._cache[key] = (time.monotonic(), data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _refresh(self, key: tuple) -> dict:
+        """Запрос к провайдеру (через автомат) и запись результата в кэш"""
+        try:
+            if not self.breaker.allow():
+                raise CircuitOpenError("API погоды временно недоступен")
+            started = time.monotonic()
+            try:
+                data = self.provider.fetch(*key)
+            except Exception:
+                self.breaker.record_failure()  # Любая ошибка провайдера, в том числе неожиданная
+                raise
+            except BaseException:
+                self.breaker.release()  # Запрос прерван (например, KeyboardInterrupt) - это не ошибка API
+                raise
+            self.breaker.record_success(time.monotonic() - started)
+            self._store(key, data)
+            return data
+        finally:
+            with self._lock:
+                event = self._inflight.pop(key, None)
+            if event is not None:
+                event.set()
+
+    def _refresh_quietly(self, key: tuple) -> None:
+        """Фоновое обновление: ошибку уже учёл автомат, а пользователь получил значение из кэша"""
+        try:
+            self._refresh(key)
+        except WeatherProviderError:
+            pass
+
+    async def _arefresh(self, key: tuple, inflight: dict) -> dict:
+        try:
+            if not self.breaker.allow():
+                raise CircuitOpenError("API погоды временно недоступен")
+            started = time.monotonic()
+            try:
+                data = await self.provider.afetch(*key)
+            except Exception:
+                self.breaker.record_failure()  # Любая ошибка провайдера, в том числе неожиданная
+                raise
+            except BaseException:
+                # Задача отменена (например, цикл событий закрывается) - это не ошибка API
+                self.breaker.release()
+                raise
+            self.breaker.record_success(time.monotonic() - started)
+            self._store(key, data)
+            return data
+        finally:
+            inflight.pop(key, None)
+
+
+def _ignore_provider_error(task: asyncio.Task) -> None:
+    """Фоновое асинхронное обновление: ошибку провайдера забираем, чтобы asyncio не писал о ней в лог"""
+    if not task.cancelled():
+        task.exception()
+
+
+def parse_yandex_weather(data: dict) -> dict:
+    """
+    Преобразование ответа API Яндекс.Погоды в формат current_weather.
+    Если в ответе нет нужных полей (например, API вернул ошибку) - WeatherProviderError.
+    """
+    try:
+        return {
+            'city': data['geo_object']['locality']['name'],
+            'time': datetime.fromtimestamp(data['fact']['uptime']).strftime("%H:%M"),
+            'temp': data['fact']['temp'],
+            'feels_like_temp': data['fact']['feels_like'],
+            'pressure': data['fact']['pressure_mm'],
+            'humidity': data['fact']['humidity'],
+            'wind_speed': data['fact']['wind_speed'],
+            'wind_gust': data['fact']['wind_gust'],
+            'wind_dir': DIRECTION_TRANSFORM.get(data['fact']['wind_dir']),
+        }
+    except (KeyError, TypeError, ValueError, OverflowError, OSError) as error:
+        raise WeatherProviderError(f"Неожиданный формат ответа API погоды: {error!r}") from error
+
+
+def make_provider():
+    """
+    Провайдер по переменной окружения WEATHER_PROVIDER:
+    'yandex' (по умолчанию) или 'fake' (без обращения к сети).
+    Адрес API Яндекса можно переопределить переменной WEATHER_API_URL.
+    """
+    if os.getenv('WEATHER_PROVIDER') == 'fake':
+        return FakeWeatherProvider()
+    token = os.getenv('YANDEX_WEATHER_TOKEN', '54d73608-c8dd-4c98-b18f-d9a5056525ab')
+    url = os.getenv('WEATHER_API_URL')
+    return YandexWeatherProvider(token, url) if url else YandexWeatherProvider(token)
+
+
+WEATHER_SERVICE = WeatherService(make_provider())
+
+
 def current_weather(lat, lon):
     """
-    Описание функции, входных и выходных переменных
-    """
-    token = '54d73608-c8dd-4c98-b18f-d9a5056525ab'
-    url = f"https://api.weather.yandex.ru/v2/forecast?lat={lat}&lon={lon}"
-    headers = {"X-Yandex-API-Key": f"{token}"}
-    response = requests.get(url, headers=headers)
-    data = response.json()
-
-    result = {
-        'city': data['geo_object']['locality']['name'],
-        'time': datetime.fromtimestamp(data['fact']['uptime']).strftime("%H:%M"),
-        'temp': data['fact']['temp'],
-        'feels_like_temp': data['fact']['feels_like'],
-        'pressure': data['fact']['pressure_mm'],
-        'humidity': data['fact']['humidity'],
-        'wind_speed': data['fact']['wind_speed'],
-        'wind_gust': data['fact']['wind_gust'],
-        'wind_dir': DIRECTION_TRANSFORM.get(data['fact']['wind_dir']),
-    }
-    return result
+    Текущая погода в точке с координатами lat, lon.
+    Данные берутся через кэширующий слой WEATHER_SERVICE (провайдер можно заменить,
+    например, на FakeWeatherProvider: WEATHER_SERVICE.provider = FakeWeatherProvider()).
+
+    :param lat: Широта.
+    :param lon: Долгота.
+    :return: Словарь с ключами city, time, temp, feels_like_temp, pressure, humidity,
+    wind_speed, wind_gust, wind_dir. Если API недоступен, то последнее известное значение
+    с ключом degraded = True, а если его нет - исключение WeatherProviderError.
+    """
+    return WEATHER_SERVICE.get(lat, lon)
+
+
+async def acurrent_weather(lat, lon, long_lived_loop: bool = True):
+    """
+    Асинхронный аналог current_weather (для асинхронных представлений).
+
+    :param long_lived_loop: Цикл событий живёт весь процесс (ASGI сервер). Под WSGI сервером
+    асинхронное представление выполняется через async_to_sync в новом цикле на каждый запрос:
+    асинхронный клиент, объединение запросов и фоновое обновление привязаны к циклу и пропадали бы
+    вместе с ним (клиент не закрывался бы, фоновое обновление отменялось бы). Поэтому с
+    long_lived_loop=False используется синхронный путь (общий пул соединений requests.Session,
+    объединение запросов и фоновое обновление в потоках) в отдельном потоке.
+    """
+    if not long_lived_loop:
+        return await sync_to_async(WEATHER_SERVICE.get, thread_sensitive=False)(lat, lon)
+    return await WEATHER_SERVICE.aget(lat, lon)
+
+
+async def acurrent_weather_many(points, concurrency: int = 10, long_lived_loop: bool = True) -> list:
+    """
+    Погода сразу в нескольких точках. Запросы к API выполняются одновременно,
+    но не больше concurrency за раз (чтобы не превысить лимиты API).
+
+    :param points: Список пар (lat, lon).
+    :param concurrency: Максимальное число одновременных запросов.
+    :param long_lived_loop: См. acurrent_weather.
+    :return: Список результатов в порядке points. Если для точки запрос завершился
+    ошибкой, то на её месте объект исключения.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(lat, lon):
+        async with semaphore:
+            return await acurrent_weather(lat, lon, long_lived_loop)
+
+    return await asyncio.gather(*(fetch(lat, lon) for lat, lon in points), return_exceptions=True)
 
 
 # def current_weather(lat, lon):
@@ -0,0 +1,100 @@
+"""
+Перенос избранного из JSON хранилища (wishlist.json и файлы пользователей в storage/wishlist)
+в модель WishlistItem.
+
+python manage.py import_wishlist_json [--legacy-file wishlist.json] [--directory storage/wishlist] [--dry-run]
+
+Команду можно запускать повторно: уже перенесённые позиции пропускаются.
+"""
+
+import json
+import os
+from urllib.parse import unquote
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from store.models import Product
+from wishlist.models import WishlistItem
+
+
+class Command(BaseCommand):
+    help = "Переносит избранное из wishlist.json и storage/wishlist в базу данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--legacy-file', default='wishlist.json',
+                            help="Общий файл вида {username: {'products': [...]}}")
+        parser.add_argument('--directory', default=os.path.join('storage', 'wishlist'),
+                            help="Папка с файлами избранного пользователей ({username}.json)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать, ничего не записывать")
+
+    def handle(self, *args, **options):
+        wishlists = self.read_wishlists(options['legacy_file'], options['directory'])
+        if not wishlists:
+            self.stdout.write("Данных избранного не найдено")
+            return
+
+        # Пользователи и продукты проверяются двумя запросами на все данные
+        users = dict(User.objects.filter(username__in=wishlists).values_list('username', 'id'))
+        product_ids = {str(product_id) for product_id in Product.objects.values_list('id', flat=True)}
+
+        items = []
+        skipped_products = 0
+        for username, products in wishlists.items():
+            user_id = users.get(username)
+            if user_id is None:
+                continue
+            for product_id in dict.fromkeys(map(str, products)):  # Без повторов, в исходном порядке
+                if product_id in product_ids:
+                    items.append(WishlistItem(user_id=user_id, product_id=int(product_id)))
+                else:
+                    skipped_products += 1
+
+        missing_users = sorted(set(wishlists) - set(users))
+        if missing_users:
+            self.stdout.write(f"Пропущены пользователи, которых нет в базе: {', '.join(missing_users)}")
+        if skipped_products:
+            self.stdout.write(f"Пропущено позиций с несуществующими продуктами: {skipped_products}")
+
+        if options['dry_run']:
+            self.stdout.write(f"Будет перенесено позиций (включая уже перенесённые): {len(items)}")
+            return
+
+        before = WishlistItem.objects.count()
+        with transaction.atomic():
+            # Уже перенесённые позиции (unique_wishlist_user_product) пропускаются
+            WishlistItem.objects.bulk_create(items, batch_size=options['batch_size'], ignore_conflicts=True)
+        created = WishlistItem.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f"Перенесено позиций: {created} (пользователей: {len(users)}, уже были в базе: {len(items) - created})"
+        ))
+
+    @staticmethod
+    def read_wishlists(legacy_file: str, directory: str) -> dict:
+        """
+        Чтение избранного всех пользователей.
+
+        :return: Словарь {username: [id продуктов]}. Файл пользователя в directory новее
+        записи в legacy_file (записи переносились в файлы при первом обращении), поэтому важнее.
+        """
+        wishlists = {}
+        if legacy_file and os.path.exists(legacy_file):
+            with open(legacy_file, encoding='utf-8') as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError as error:
+                    raise CommandError(f"Некорректный JSON в {legacy_file}: {error}")
+            for username, wishlist in data.items():
+                wishlists[username] = wishlist.get('products', [])
+
+        if directory and os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if not name.endswith('.json'):
+                    continue
+                with open(os.path.join(directory, name), encoding='utf-8') as f:
+                    try:
+                        wishlist = json.load(f)
+                    except json.JSONDecodeError:
+                        continue  # Недописанный файл (запись прервалась) - берём данные из legacy_file
+                wishlists[unquote(name[:-len('.json')])] = wishlist.get('products', [])
+        return wishlists
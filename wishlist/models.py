@@ -1,3 +1,24 @@
 from django.db import models
+from django.contrib.auth.models import User
+from store.models import Product
 
-# Create your models here.
+
+class WishlistItem(models.Model):
+    """Модель товара в избранном пользователя"""
+    user = models.ForeignKey(User,
+                             related_name='wishlist_items',
+                             on_delete=models.CASCADE)  # Ссылка на пользователя
+    product = models.ForeignKey(Product,
+                                related_name='wishlist_items',
+                                on_delete=models.CASCADE)  # Ссылка на продукт
+    created_at = models.DateTimeField(auto_now_add=True)  # Дата и время добавления в избранное
+
+    def __str__(self):
+        return f"{self.user.username} - {self.product.name}"
+
+    class Meta:
+        constraints = [
+            # Продукт в избранном пользователя не больше одного раза. Индекс этого ограничения
+            # используется и для выборки избранного пользователя (user - первое поле)
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_wishlist_user_product'),
+        ]
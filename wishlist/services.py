@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models import BigIntegerField, F
+from store.models import Product, ProductCard
+from .models import WishlistItem
+
+WISHLIST_BULK_MAX_PRODUCTS = 100  # Максимум продуктов в одном вызове apply_wishlist_operations
+
+
+class WishlistOperationError(ValueError):
+    """Некорректный пакет операций с избранным (ни одна операция не применяется)"""
+
+
+def add_products_to_wishlist(user, product_ids) -> int:
+    """
+    Добавляет продукты в избранное пользователя (одним INSERT, уже добавленные пропускаются).
+
+    :param user: Пользователь.
+    :param product_ids: id продуктов (числа или строки). Несуществующие id пропускаются.
+    :return: Сколько продуктов было добавлено (без учёта тех, что уже были в избранном).
+    """
+    product_ids = _existing_product_ids(product_ids)
+    if not product_ids:
+        return 0
+    already = set(WishlistItem.objects.filter(user=user, product_id__in=product_ids)
+                  .values_list('product_id', flat=True))
+    items = [WishlistItem(user=user, product_id=product_id) for product_id in product_ids
+             if product_id not in already]
+    # ignore_conflicts: тот же продукт может добавить параллельный запрос, уникальность гарантирует БД
+    WishlistItem.objects.bulk_create(items, ignore_conflicts=True)
+    return len(items)
+
+
+def remove_products_from_wishlist(user, product_ids) -> int:
+    """
+    Удаляет продукты из избранного пользователя одним DELETE.
+
+    :param user: Пользователь.
+    :param product_ids: id продуктов (числа или строки).
+    :return: Сколько продуктов было удалено.
+    """
+    product_ids = _parse_ids(product_ids)
+    if not product_ids:
+        return 0
+    deleted, _ = WishlistItem.objects.filter(user=user, product_id__in=product_ids).delete()
+    return deleted
+
+
+def apply_wishlist_operations(user, add=(), remove=()) -> list:
+    """
+    Добавляет и удаляет продукты избранного в одной транзакции: либо все операции, либо ни одной.
+    Все id продуктов проверяются одним запросом.
+
+    :param user: Пользователь.
+    :param add: id продуктов для добавления.
+    :param remove: id продуктов для удаления (удаление применяется после добавления).
+    :return: id продуктов в избранном после изменения (см. wishlist_product_ids).
+    :raises WishlistOperationError: Некорректные id или несуществующие продукты.
+    """
+    if not isinstance(add, (list, tuple)) or not isinstance(remove, (list, tuple)):
+        raise WishlistOperationError("Ожидаются списки id продуктов")
+    if len(add) + len(remove) > WISHLIST_BULK_MAX_PRODUCTS:
+        raise WishlistOperationError(f"Не больше {WISHLIST_BULK_MAX_PRODUCTS} продуктов за раз")
+    try:
+        add_ids = list(dict.fromkeys(int(product_id) for product_id in add))
+        remove_ids = list(dict.fromkeys(int(product_id) for product_id in remove))
+    except (TypeError, ValueError):
+        raise WishlistOperationError("id продуктов должны быть числами") from None
+    product_ids = {*add_ids, *remove_ids}
+    # Числа вне диапазона первичного ключа драйвер БД не примет (OverflowError)
+    if any(not 0 < product_id <= BigIntegerField.MAX_BIGINT for product_id in product_ids):
+        raise WishlistOperationError("Некорректные id продуктов")
+    unknown = product_ids - set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+    if unknown:
+        raise WishlistOperationError(f"Продуктов не существует: {', '.join(map(str, sorted(unknown)))}")
+
+    with transaction.atomic():
+        if add_ids:
+            WishlistItem.objects.bulk_create([WishlistItem(user=user, product_id=product_id) for product_id in add_ids],
+                                             ignore_conflicts=True)
+        if remove_ids:
+            WishlistItem.objects.filter(user=user, product_id__in=remove_ids).delete()
+    return wishlist_product_ids(user)
+
+
+def wishlist_product_ids(user) -> list:
+    """id продуктов в избранном пользователя (строками, в порядке добавления)"""
+    return [str(product_id) for product_id in
+            WishlistItem.objects.filter(user=user).order_by('created_at', 'id')
+            .values_list('product_id', flat=True)]
+
+
+def wishlist_cards(user):
+    """
+    Карточки продуктов (с ценами и скидкой) из избранного пользователя в порядке добавления.
+    Один запрос: карточки соединяются с позициями избранного (JOIN).
+    """
+    return (ProductCard.objects
+            .filter(product__wishlist_items__user=user)
+            .annotate(added_at=F('product__wishlist_items__created_at'))
+            .order_by('added_at', 'pk'))
+
+
+def _existing_product_ids(product_ids) -> list:
+    """Существующие id продуктов из переданных (одним запросом), без повторов, в исходном порядке"""
+    product_ids = _parse_ids(product_ids)
+    existing = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+    return [product_id for product_id in product_ids if product_id in existing]
+
+
+def _parse_ids(product_ids) -> list:
+    """Приведение id к числам без повторов. Значения, которые не являются числами, пропускаются"""
+    result = {}
+    for product_id in product_ids:
+        try:
+            result[int(product_id)] = None
+        except (TypeError, ValueError):
+            continue
+    return list(result)
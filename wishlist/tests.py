@@ -1,3 +1,34 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from logic.query_budget import assert_view_within_budget
+from store.models import ProductCard
+from store.tests import TEST_CACHES, create_products
+from .models import WishlistItem
+from .views import wishlist_view
 
-# Create your tests here.
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTest(TestCase):
+    """Избранное укладывается в объявленный бюджет SQL запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='password')
+        WishlistItem.objects.bulk_create([WishlistItem(user=cls.user, product=product)
+                                          for product in create_products(5)])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_wishlist_view(self):
+        response = assert_view_within_budget(self.client, '/wishlist/', wishlist_view)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['products']), 5)
+
+    def test_wishlist_view_without_image(self):
+        ProductCard.objects.update(image='')  # Картинка продукта необязательна
+        response = self.client.get('/wishlist/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'background-image:url(')
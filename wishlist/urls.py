@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import wishlist_view, wishlist_add_json, wishlist_del_json, wishlist_del_view, wishlist_json
+from .views import wishlist_view, wishlist_add_json, wishlist_del_json, wishlist_del_view, wishlist_json, \
+    wishlist_bulk_json
 
 app_name = 'wishlist'
 
@@ -8,5 +9,6 @@ urlpatterns = [
     path('api/add/<str:id_product>', wishlist_add_json),
     path('api/del/<str:id_product>', wishlist_del_json),
     path('api/', wishlist_json),
+    path('api/bulk/', wishlist_bulk_json),
     path('del/<str:id_product>', wishlist_del_view, name="wishlist_del_view"),
 ]
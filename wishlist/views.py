@@ -1,29 +1,25 @@
 from django.shortcuts import render, redirect
-from logic.services import view_in_wishlist, add_to_wishlist, remove_from_wishlist
-from store.models import DATABASE
-from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
+from logic.query_budget import query_budget
 from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import require_POST
+from .services import add_products_to_wishlist, remove_products_from_wishlist, wishlist_product_ids, wishlist_cards
+from .services import apply_wishlist_operations, WishlistOperationError
+import json
 
 
 @login_required(login_url='login:login_view')
+@query_budget(1)
 def wishlist_view(request):
     if request.method == "GET":
-        current_user = get_user(request).username
-        data = view_in_wishlist(request).get(current_user)
-
-        products = []  # Список продуктов
-        for product_id in data['products']:
-            product = DATABASE.get(product_id)
-            products.append(product)
-
+        # Пользователь уже загружен login_required, продукты с ценами - одним запросом
+        products = wishlist_cards(request.user)
         return render(request, 'wishlist/wishlist.html', context={"products": products})
 
 
 def wishlist_add_json(request, id_product):
     if request.method == "GET":
-        result = add_to_wishlist(request, id_product)
-        if result:
+        if request.user.is_authenticated and add_products_to_wishlist(request.user, [id_product]):
             return JsonResponse({"answer": "Продукт успешно добавлен в избранное"},
                                 json_dumps_params={'ensure_ascii': False})
 
@@ -34,8 +30,7 @@ def wishlist_add_json(request, id_product):
 
 def wishlist_del_json(request, id_product):
     if request.method == "GET":
-        result = remove_from_wishlist(request, id_product)
-        if result:
+        if request.user.is_authenticated and remove_products_from_wishlist(request.user, [id_product]):
             return JsonResponse({"answer": "Продукт успешно удалён из корзины"},
                                 json_dumps_params={'ensure_ascii': False})
 
@@ -46,20 +41,40 @@ def wishlist_del_json(request, id_product):
 
 def wishlist_json(request):
     if request.method == "GET":
-        current_user = get_user(request).username
-        data = view_in_wishlist(request).get(current_user)
-        if data:
-            return JsonResponse(data,
+        if request.user.is_authenticated:
+            return JsonResponse({'products': wishlist_product_ids(request.user)},
                                 json_dumps_params={'ensure_ascii': False})
         return JsonResponse({"answer": "Пользователь не авторизирован"},
                             json_dumps_params={'ensure_ascii': False},
                             status=404)
 
 
+@require_POST
+def wishlist_bulk_json(request):
+    """
+    Пакетное изменение избранного одним запросом (одна транзакция).
+    POST /wishlist/api/bulk/ с телом {"add": [1, 2], "remove": [3]}
+    В ответе id продуктов в избранном после изменения: {"products": [...]}.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"answer": "Пользователь не авторизирован"}, status=401,
+                            json_dumps_params={'ensure_ascii': False})
+    try:
+        data = json.loads(request.body)
+    except ValueError:  # JSONDecodeError или тело не в UTF-8
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({"answer": "Некорректный JSON"}, status=400, json_dumps_params={'ensure_ascii': False})
+    try:
+        products = apply_wishlist_operations(request.user, data.get('add', []), data.get('remove', []))
+    except WishlistOperationError as error:
+        return JsonResponse({"answer": str(error)}, status=400, json_dumps_params={'ensure_ascii': False})
+    return JsonResponse({'products': products}, json_dumps_params={'ensure_ascii': False})
+
+
 def wishlist_del_view(request, id_product):
     if request.method == "GET":
-        result = remove_from_wishlist(request, id_product)
-        if result:
+        if request.user.is_authenticated and remove_products_from_wishlist(request.user, [id_product]):
             return redirect("wishlist:wishlist_view")
 
         return HttpResponse("Неудачное удаление из корзины", status=404)